@@ -0,0 +1,298 @@
+"""Cohort-level learning analytics computed with NumPy over every user, set and term."""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import daily_challenge
+import history
+from flashcards import USER_DATA_FILE, load_user_data
+
+ACCURACY_BUCKETS = 5  # Accuracy distributions are counted in 20% wide buckets
+ACTIVITY_DAYS = daily_challenge.HISTORY_DAYS  # Days of activity used for churn prediction
+RECENT_DAYS = 7  # Activity in the last week is compared with the three weeks before it
+INACTIVE_DAYS = 14  # Days without answers after which a user counts as fully inactive
+CHURN_THRESHOLD = 0.5  # Users at or above this churn risk are flagged
+
+def _intern(ids, name):
+    """Return the id for a name, adding it to the id map if it is new."""
+    index = ids.get(name)
+    if index is None:
+        index = ids[name] = len(ids)
+    return index
+
+def load_counters(user_data, today=None):
+    """Flatten the user data into NumPy arrays of per-term and per-set counters.
+
+    Terms are matched across users by their lowercase text, so the same term in different sets is
+    counted together in the hardest-terms report. Daily challenge records become an activity matrix
+    with one row per user and one column per day ago.
+    """
+    today = (today or datetime.date.today()).toordinal()
+    usernames = list(user_data)
+    categories = {}
+    terms = {}
+    set_names = []
+    set_user = []
+    set_category = []
+    term_set = []
+    term_id = []
+    term_correct = []
+    term_total = []
+    last_days = np.full(len(usernames), -1, dtype=np.int64)
+    rings = np.zeros((len(usernames), ACTIVITY_DAYS), dtype=np.int64)
+
+    # Building the arrays is the only per-term Python loop; every report below is vectorized
+    for user_index, username in enumerate(usernames):
+        user = user_data[username]
+        for set_name, flashcard_set in user["flashcard_sets"].items():
+            set_index = len(set_names)
+            set_names.append(set_name)
+            set_user.append(user_index)
+            set_category.append(_intern(categories, flashcard_set.get("category") or "Uncategorized"))
+            for term, counters in flashcard_set["terms"].items():
+                term_set.append(set_index)
+                term_id.append(_intern(terms, term.lower()))
+                term_correct.append(counters["correct"])
+                term_total.append(counters["total"])
+        record = user.get("daily_challenge")
+        if record is not None and record["last_day"] is not None and len(record["counts"]) == ACTIVITY_DAYS:
+            last_days[user_index] = record["last_day"]
+            rings[user_index] = record["counts"]
+
+    # Unroll the ring buffers: column d holds the correct answers d days ago
+    days = today - np.arange(ACTIVITY_DAYS)
+    valid = (days[None, :] <= last_days[:, None]) & (days[None, :] > last_days[:, None] - ACTIVITY_DAYS)
+    activity = np.where(valid, np.take_along_axis(rings, np.broadcast_to(days % ACTIVITY_DAYS, rings.shape), axis=1), 0)
+
+    term_set = np.array(term_set, dtype=np.int64)
+    term_correct = np.array(term_correct, dtype=np.int64)
+    term_total = np.array(term_total, dtype=np.int64)
+    set_count = len(set_names)
+    return {
+        "usernames": usernames,
+        "categories": list(categories),
+        "terms": list(terms),
+        "set_names": set_names,
+        "set_user": np.array(set_user, dtype=np.int64),
+        "set_category": np.array(set_category, dtype=np.int64),
+        "set_terms": np.bincount(term_set, minlength=set_count),
+        "set_correct": np.bincount(term_set, weights=term_correct, minlength=set_count).astype(np.int64),
+        "set_total": np.bincount(term_set, weights=term_total, minlength=set_count).astype(np.int64),
+        "term_set": term_set,
+        "term_id": np.array(term_id, dtype=np.int64),
+        "term_correct": term_correct,
+        "term_total": term_total,
+        "activity": activity,
+    }
+
+def load_history_activity(counters, directory=history.HISTORY_DIR, now=None):
+    """Return a users x days matrix of logged answers, or None when there is no history.
+
+    Segments are read one at a time, so memory stays bounded by the matrix and one segment.
+    """
+    if not history.segment_files(directory):
+        return None
+    now = now if now is not None else time.time()
+    user_ids = {username: index for index, username in enumerate(counters["usernames"])}
+    activity = np.zeros((len(user_ids), ACTIVITY_DAYS), dtype=np.int64)
+    for names, columns in history.iter_segments(directory):
+        # Map the segment's own user numbers to rows; users no longer in the store map to -1
+        lookup = np.array([user_ids.get(name, -1) for name in names["user"]], dtype=np.int64)
+        users = lookup[np.frombuffer(columns["user"], dtype=np.uint32)]
+        days_ago = ((now - np.frombuffer(columns["timestamp"], dtype=np.float64)) // 86400).astype(np.int64)
+        keep = (users >= 0) & (days_ago >= 0) & (days_ago < ACTIVITY_DAYS)
+        np.add.at(activity, (users[keep], days_ago[keep]), 1)
+    return activity
+
+def _accuracy(correct, total):
+    """Return accuracy percentages, with 0 where nothing was attempted."""
+    return np.divide(correct * 100.0, total, out=np.zeros(len(total)), where=total > 0)
+
+def _bucket_counts(groups, accuracy, group_count):
+    """Count the values of each group in ACCURACY_BUCKETS equal-width accuracy buckets."""
+    buckets = np.minimum((accuracy // (100 / ACCURACY_BUCKETS)).astype(np.int64), ACCURACY_BUCKETS - 1)
+    return np.bincount(groups * ACCURACY_BUCKETS + buckets, minlength=group_count * ACCURACY_BUCKETS).reshape(group_count, ACCURACY_BUCKETS)
+
+def _bucket_labels():
+    width = 100 // ACCURACY_BUCKETS
+    return [f"accuracy_{start}_{start + width}" for start in range(0, 100, width)]
+
+def set_report(counters):
+    """One row per set: counters, accuracy and how its attempted terms spread over accuracy buckets."""
+    term_accuracy = _accuracy(counters["term_correct"], counters["term_total"])
+    attempted = counters["term_total"] > 0
+    set_count = len(counters["set_names"])
+    buckets = _bucket_counts(counters["term_set"][attempted], term_accuracy[attempted], set_count)
+    accuracy = _accuracy(counters["set_correct"], counters["set_total"])
+    labels = _bucket_labels()
+    usernames = counters["usernames"]
+    categories = counters["categories"]
+    rows = []
+    for index, (user, category, terms, correct, total, percentage, bucket_row) in enumerate(zip(
+        counters["set_user"].tolist(), counters["set_category"].tolist(), counters["set_terms"].tolist(),
+        counters["set_correct"].tolist(), counters["set_total"].tolist(), np.round(accuracy, 2).tolist(), buckets.tolist(),
+    )):
+        row = {"username": usernames[user], "set": counters["set_names"][index], "category": categories[category], "terms": terms, "correct": correct, "total": total, "accuracy": percentage}
+        row.update(zip(labels, bucket_row))
+        rows.append(row)
+    return rows
+
+def category_report(counters):
+    """One row per category: totals, accuracy percentiles of its sets and a set accuracy histogram."""
+    category_count = len(counters["categories"])
+    attempted = counters["set_total"] > 0
+    accuracy = _accuracy(counters["set_correct"], counters["set_total"])
+    sets = np.bincount(counters["set_category"], minlength=category_count)
+    correct = np.bincount(counters["set_category"], weights=counters["set_correct"], minlength=category_count)
+    total = np.bincount(counters["set_category"], weights=counters["set_total"], minlength=category_count)
+    buckets = _bucket_counts(counters["set_category"][attempted], accuracy[attempted], category_count)
+
+    # Percentiles per category: sort by (category, accuracy) once and index into each group
+    categories = counters["set_category"][attempted]
+    order = np.lexsort((accuracy[attempted], categories))
+    sorted_accuracy = np.append(accuracy[attempted][order], 0.0)  # Sentinel so empty categories index safely
+    counts = np.bincount(categories, minlength=category_count)
+    starts = np.cumsum(counts) - counts
+    percentiles = {}
+    for name, fraction in (("p25", 0.25), ("median", 0.5), ("p75", 0.75)):
+        positions = starts + np.floor(fraction * np.maximum(counts - 1, 0)).astype(np.int64)
+        percentiles[name] = np.where(counts > 0, sorted_accuracy[positions], 0.0)
+
+    labels = _bucket_labels()
+    rows = []
+    for index, category in enumerate(counters["categories"]):
+        row = {
+            "category": category,
+            "sets": int(sets[index]),
+            "attempted_sets": int(counts[index]),
+            "correct": int(correct[index]),
+            "total": int(total[index]),
+            "accuracy": round(float(correct[index] * 100 / total[index]) if total[index] else 0.0, 2),
+            "p25": round(float(percentiles["p25"][index]), 2),
+            "median": round(float(percentiles["median"][index]), 2),
+            "p75": round(float(percentiles["p75"][index]), 2),
+        }
+        row.update(zip(labels, buckets[index].tolist()))
+        rows.append(row)
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    return rows
+
+def hardest_terms_report(counters, limit=100, min_attempts=5):
+    """The terms most often missed across all users, with smoothed accuracy so rare terms do not dominate."""
+    term_count = len(counters["terms"])
+    correct = np.bincount(counters["term_id"], weights=counters["term_correct"], minlength=term_count)
+    total = np.bincount(counters["term_id"], weights=counters["term_total"], minlength=term_count)
+    sets = np.bincount(counters["term_id"][counters["term_total"] > 0], minlength=term_count)
+    smoothed = (correct + 1) / (total + 2)  # Laplace smoothing
+    candidates = np.flatnonzero(total >= min_attempts)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(smoothed[candidates], limit)[:limit]]
+    candidates = candidates[np.argsort(smoothed[candidates], kind="stable")]
+    return [
+        {"term": counters["terms"][index], "sets": int(sets[index]), "correct": int(correct[index]), "total": int(total[index]), "accuracy": round(float(correct[index] * 100 / total[index]), 2), "smoothed_accuracy": round(float(smoothed[index] * 100), 2)}
+        for index in candidates.tolist()
+    ]
+
+def churn_report(counters, activity=None, threshold=CHURN_THRESHOLD):
+    """Users likely to stop studying, ranked by churn risk.
+
+    Risk mixes how long a user has been inactive (60%) with how much their activity in the last
+    week dropped compared with the three weeks before it (40%). Activity comes from the answer
+    history when given, otherwise from the daily challenge counters.
+    """
+    activity = counters["activity"] if activity is None else activity
+    user_count = len(counters["usernames"])
+    active = activity > 0
+    days_since = np.where(active.any(axis=1), active.argmax(axis=1), ACTIVITY_DAYS)
+    recent = activity[:, :RECENT_DAYS].sum(axis=1) / RECENT_DAYS
+    previous = activity[:, RECENT_DAYS:RECENT_DAYS * 4].sum(axis=1) / (RECENT_DAYS * 3)
+    # Users with no earlier activity cannot decline; they are judged on inactivity alone
+    decline = np.clip(1 - np.divide(recent, previous, out=np.ones(user_count), where=previous > 0), 0, 1) * (previous > 0)
+    inactivity = np.minimum(days_since / INACTIVE_DAYS, 1.0)
+    risk = 0.6 * inactivity + 0.4 * decline
+
+    set_counts = np.bincount(counters["set_user"], minlength=user_count)
+    correct = np.bincount(counters["set_user"], weights=counters["set_correct"], minlength=user_count)
+    total = np.bincount(counters["set_user"], weights=counters["set_total"], minlength=user_count)
+    accuracy = _accuracy(correct, total)
+
+    flagged = np.flatnonzero(risk >= threshold)
+    flagged = flagged[np.argsort(-risk[flagged], kind="stable")]
+    return [
+        {
+            "username": counters["usernames"][index],
+            "churn_risk": round(float(risk[index]), 3),
+            "days_since_active": int(days_since[index]) if days_since[index] < ACTIVITY_DAYS else None,
+            "recent_daily_answers": round(float(recent[index]), 2),
+            "previous_daily_answers": round(float(previous[index]), 2),
+            "sets": int(set_counts[index]),
+            "total": int(total[index]),
+            "accuracy": round(float(accuracy[index]), 2),
+        }
+        for index in flagged.tolist()
+    ]
+
+def write_report(rows, file_name):
+    """Write report rows to a .csv or .json file."""
+    if file_name.endswith(".csv"):
+        with open(file_name, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(rows, file, indent=4)
+
+def run_reports(user_data, history_dir=history.HISTORY_DIR, limit=100):
+    """Build every report and return (reports, seconds spent on each step)."""
+    timings = {}
+    start = time.perf_counter()
+    counters = load_counters(user_data)
+    timings["load_counters"] = time.perf_counter() - start
+    start = time.perf_counter()
+    activity = load_history_activity(counters, history_dir)
+    timings["load_history"] = time.perf_counter() - start
+
+    reports = {}
+    for name, build in (
+        ("sets", lambda: set_report(counters)),
+        ("categories", lambda: category_report(counters)),
+        ("hardest_terms", lambda: hardest_terms_report(counters, limit)),
+        ("churn", lambda: churn_report(counters, activity)),
+    ):
+        start = time.perf_counter()
+        reports[name] = build()
+        timings[name] = time.perf_counter() - start
+    return reports, timings
+
+def main(argv=None):
+    """Write the analytics reports for a user store from the command line."""
+    parser = argparse.ArgumentParser(description="Learning analytics over every user, set and term.")
+    parser.add_argument("--data", default=USER_DATA_FILE, help="User data file to analyse")
+    parser.add_argument("--history", default=history.HISTORY_DIR, help="Answer history directory (used for churn when present)")
+    parser.add_argument("--output-dir", default="reports", help="Directory to write the reports to")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv", help="Report file format")
+    parser.add_argument("--top", type=int, default=100, help="Number of hardest terms to report")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    user_data = load_user_data(args.data)
+    load_seconds = time.perf_counter() - start
+    reports, timings = run_reports(user_data, args.history, args.top)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, rows in reports.items():
+        file_name = os.path.join(args.output_dir, f"{name}.{args.format}")
+        write_report(rows, file_name)
+        print(f"{file_name}: {len(rows)} rows")
+    print(f"Loaded the store in {load_seconds:.2f}s; " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""Local asyncio HTTP/JSON API for study sessions."""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import time
+
+import engine
+import flashcards
+import generate_data
+import history
+import passwords
+
+SESSION_TYPES = {
+    "game": engine.GameSession,
+    "quiz": engine.QuizSession,
+    "fill_in_the_blank": engine.FillInTheBlankSession,
+    "revision": engine.RevisionSession,
+}
+
+TOKEN_TTL = 24 * 3600  # Seconds a login token may go unused before it expires
+SESSION_TTL = 2 * 3600  # Seconds a study session may go unused before it is dropped
+MAX_TOKENS = 100000  # Least recently used tokens and sessions are dropped beyond these counts
+MAX_SESSIONS = 10000
+SAVE_DELAY = 5.0  # Seconds a finished session waits for others to share its save
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+class ApiError(Exception):
+    """An error that is sent back to the client as a JSON message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def text_field(data, name, default):
+    """Return a string field of a request body, or raise a 400 error if it is not a string."""
+    value = data.get(name, default)
+    if value is not None and not isinstance(value, str):
+        raise ApiError(400, f"{name} must be a string.")
+    return value
+
+class FlashcardServer:
+    """Serves login, sets, study sessions and the leaderboard over HTTP/JSON."""
+
+    def __init__(self, file_name=flashcards.USER_DATA_FILE, workers=None, history_dir=history.HISTORY_DIR):
+        self.file_name = file_name
+        self.answer_log = history.AnswerLog(history_dir)
+        self.user_data = flashcards.load_user_data(file_name)
+        # Both tables are only touched on the event loop, least recently used first; entries end with their last use
+        self.tokens = collections.OrderedDict()  # token -> [username, last used]
+        self.sessions = collections.OrderedDict()  # session id -> [username, set name, session, last used]
+        self.user_locks = {}  # username -> lock guarding that user's counters
+        self.save_lock = threading.Lock()
+        self.save_task = None  # Pending delayed save, if any
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.server = None
+        # Unknown usernames are checked against this, so a failed login takes as long either way
+        self.dummy_password = flashcards.hash_password(secrets.token_hex(16))
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the port actually used (useful with port 0)."""
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and save any unsaved progress."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.save_task is not None:
+            self.save_task.cancel()
+        await self.run_blocking(self.save)
+        await self.run_blocking(self.answer_log.flush)
+        self.executor.shutdown(wait=True)
+
+    async def run_blocking(self, func, *args):
+        """Run CPU-bound or blocking work on the executor so the event loop stays free."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def save(self):
+        """Write the user data to disk, encoding each user while holding that user's lock.
+
+        Answers keep changing other users' counters (and adding rating and review fields) while the
+        store is written, so no user is encoded while another thread is changing them.
+        """
+        with self.save_lock:
+            encoded = []
+            for username in list(self.user_data):
+                with self.user_lock(username):
+                    encoded.append((username, json.dumps(self.user_data[username])))
+            flashcards.save_user_stream(encoded, self.file_name, encoded=True)
+
+    def schedule_save(self):
+        """Save the store within SAVE_DELAY seconds, so sessions finishing close together share one write."""
+        if self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.get_running_loop().create_task(self._delayed_save())
+
+    async def _delayed_save(self):
+        await asyncio.sleep(SAVE_DELAY)
+        await self.run_blocking(self.save)
+
+    def user_lock(self, username):
+        return self.user_locks.setdefault(username, threading.Lock())
+
+    @staticmethod
+    def expire(table, ttl, limit):
+        """Drop entries unused for `ttl` seconds, and the least recently used ones beyond `limit`."""
+        cutoff = time.monotonic() - ttl
+        while table and (len(table) > limit or next(iter(table.values()))[-1] < cutoff):
+            table.popitem(last=False)
+
+    @staticmethod
+    def touch(table, key):
+        """Mark an entry as just used and return it."""
+        entry = table[key]
+        entry[-1] = time.monotonic()
+        table.move_to_end(key)
+        return entry
+
+    async def handle_client(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in {b"\r\n", b"\n", b""}:
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.dispatch(method, path, headers, body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, headers, body):
+        """Route one request and return (status, JSON payload)."""
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ApiError(400, "The request body must be a JSON object.")
+            parts = [part for part in path.split("?")[0].split("/") if part]
+            if parts == ["login"] and method == "POST":
+                return 200, await self.login(data)
+            username = self.authenticate(headers)
+            if parts == ["sets"] and method == "GET":
+                return 200, self.list_sets(username)
+            if parts == ["sessions"] and method == "POST":
+                return 200, await self.start_session(username, data)
+            if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "answer" and method == "POST":
+                return 200, await self.submit_answer(username, parts[1], data)
+            if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "finish" and method == "POST":
+                return 200, await self.finish_session(username, parts[1])
+            if parts == ["leaderboard"] and method == "GET":
+                return 200, await self.run_blocking(flashcards.build_leaderboard, self.user_data)
+            raise ApiError(404, f"No endpoint for {method} {path}.")
+        except ApiError as error:
+            return error.status, {"error": error.message}
+        except json.JSONDecodeError:
+            return 400, {"error": "The request body is not valid JSON."}
+        except Exception as error:  # Answer instead of dropping the connection
+            return 500, {"error": f"Internal error: {type(error).__name__}."}
+
+    def authenticate(self, headers):
+        """Return the username for the request's bearer token."""
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        self.expire(self.tokens, TOKEN_TTL, MAX_TOKENS)
+        if token not in self.tokens:
+            raise ApiError(401, "Please log in first.")
+        return self.touch(self.tokens, token)[0]
+
+    async def login(self, data):
+        username = text_field(data, "username", "")
+        password = text_field(data, "password", "")
+        known = username in self.user_data
+        stored_password = self.user_data[username]["password"] if known else self.dummy_password
+        if not await self.run_blocking(flashcards.verify_password, stored_password, password) or not known:
+            raise ApiError(401, "Invalid username or password.")
+        # The stronger hash is saved with the next save instead of rewriting the store on every login
+        await self.run_blocking(self._upgrade_password, username, password)
+        token = secrets.token_hex(16)
+        self.tokens[token] = [username, time.monotonic()]
+        self.expire(self.tokens, TOKEN_TTL, MAX_TOKENS)
+        return {"token": token, "username": username}
+
+    def _upgrade_password(self, username, password):
+        with self.user_lock(username):
+            passwords.upgrade_password(self.user_data[username], password)
+
+    def list_sets(self, username):
+        return [
+            {
+                "name": set_name,
+                "category": flashcard_set.get("category", "Uncategorized"),
+                "terms": len(flashcard_set["terms"]),
+                "stats": flashcard_set["stats"],
+            }
+            for set_name, flashcard_set in self.user_data[username]["flashcard_sets"].items()
+        ]
+
+    async def start_session(self, username, data):
+        set_name = text_field(data, "set_name", None)
+        mode = text_field(data, "mode", "game")
+        set_name, session, card = await self.run_blocking(self._start_session_locked, username, set_name, mode, data)
+        session_id = secrets.token_hex(8)
+        self.sessions[session_id] = [username, set_name, session, time.monotonic()]
+        self.expire(self.sessions, SESSION_TTL, MAX_SESSIONS)
+        return {"session_id": session_id, "card": card}
+
+    def _start_session_locked(self, username, set_name, mode, data):
+        with self.user_lock(username):  # Sessions may cache indexes on the set while a save encodes it
+            return self._start_session(username, set_name, mode, data)
+
+    def _start_session(self, username, set_name, mode, data):
+        flashcard_sets = self.user_data[username]["flashcard_sets"]
+        if mode == "review":
+            # Cross-set review draws from every set, so it takes a length and an order instead of a set
+            order = text_field(data, "order", "misses")
+            if order not in engine.REVIEW_ORDERS:
+                raise ApiError(400, f"Unknown order '{order}'. Choose one of: {', '.join(engine.REVIEW_ORDERS)}.")
+            limit = data.get("limit", engine.REVIEW_LENGTH)
+            if not isinstance(limit, int) or limit < 1:
+                raise ApiError(400, "limit must be a positive integer.")
+            set_name = None
+            on_answer = self.answer_log.recorder(username, None, mode)
+            session = engine.ReviewSession(flashcard_sets, limit, order, user=self.user_data[username], on_answer=on_answer)
+        else:
+            if set_name not in flashcard_sets:
+                raise ApiError(404, f"No flashcard set named '{set_name}' found.")
+            if mode not in SESSION_TYPES:
+                raise ApiError(400, f"Unknown mode '{mode}'. Choose one of: {', '.join(SESSION_TYPES)}, review.")
+            on_answer = self.answer_log.recorder(username, set_name, mode)
+            session = SESSION_TYPES[mode](flashcard_sets[set_name], user=self.user_data[username], on_answer=on_answer)
+        return set_name, session, session.next_card()
+
+    def get_session(self, username, session_id):
+        self.expire(self.sessions, SESSION_TTL, MAX_SESSIONS)
+        if session_id not in self.sessions or self.sessions[session_id][0] != username:
+            raise ApiError(404, f"No session '{session_id}' found.")
+        return self.touch(self.sessions, session_id)[2]
+
+    def _submit(self, username, session, answer):
+        with self.user_lock(username):
+            if session.next_card() is None:
+                raise ApiError(400, "This session has no cards left. Finish it to see your score.")
+            result = session.submit(answer)
+            return {"result": result, "card": session.next_card()}
+
+    async def submit_answer(self, username, session_id, data):
+        session = self.get_session(username, session_id)
+        return await self.run_blocking(self._submit, username, session, str(data.get("answer", "")))
+
+    async def finish_session(self, username, session_id):
+        session = self.get_session(username, session_id)
+        del self.sessions[session_id]
+        summary = await self.run_blocking(self._finish, username, session)
+        self.schedule_save()
+        return summary
+
+    def _finish(self, username, session):
+        with self.user_lock(username):
+            return session.finish()
+
+class ApiClient:
+    """Minimal keep-alive HTTP/JSON client for talking to a local FlashcardServer."""
+
+    def __init__(self, host="127.0.0.1", port=8080):
+        self.host = host
+        self.port = port
+        self.token = None
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None):
+        """Send one request and return (status, decoded JSON)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(headers.encode("latin-1") + b"\r\n" + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in {b"\r\n", b"\n", b""}:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def login(self, username, password):
+        status, data = await self.request("POST", "/login", {"username": username, "password": password})
+        if status == 200:
+            self.token = data["token"]
+        return status, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+async def run_benchmark(clients=50, answers=100, terms=50):
+    """Measure answer-submission throughput with many concurrent clients against a local server."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_name = os.path.join(work_dir, flashcards.USER_DATA_FILE)
+        generate_data.write_user_data(file_name, clients, mean_sets=1, mean_terms=terms, uniform=True)
+        server = FlashcardServer(file_name, history_dir=os.path.join(work_dir, history.HISTORY_DIR))
+        port = await server.start(port=0)
+        latencies = []
+
+        async def student(index):
+            client = ApiClient(port=port)
+            await client.login(f"user{index}", f"password{index}")
+            _, sets = await client.request("GET", "/sets")
+            submitted = 0
+            while submitted < answers:
+                _, started = await client.request("POST", "/sessions", {"set_name": sets[0]["name"], "mode": "game"})
+                card = started["card"]
+                while card is not None and submitted < answers:
+                    start = time.perf_counter()
+                    _, reply = await client.request("POST", f"/sessions/{started['session_id']}/answer", {"answer": "a function used to store data"})
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    card = reply["card"]
+                    submitted += 1
+                await client.request("POST", f"/sessions/{started['session_id']}/finish")
+            await client.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(student(index) for index in range(clients)))
+        elapsed = time.perf_counter() - start
+        await server.stop()
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "answers": len(latencies),
+        "seconds": elapsed,
+        "answers_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "p99_ms": latencies[int(len(latencies) * 0.99)],
+    }
+
+async def serve(host, port, file_name):
+    """Run the server until interrupted."""
+    server = FlashcardServer(file_name)
+    port = await server.start(host, port)
+    print(f"Serving the flashcard API on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main(argv=None):
+    """Run the API server or its throughput benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON API for the flashcard program.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--data", default=flashcards.USER_DATA_FILE, help="User data file to serve")
+    parser.add_argument("--benchmark", action="store_true", help="Measure concurrent answer throughput instead of serving")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients for --benchmark")
+    parser.add_argument("--answers", type=int, default=100, help="Answers per client for --benchmark")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = asyncio.run(run_benchmark(args.clients, args.answers))
+        print(f"{result['answers']} answers from {result['clients']} clients in {result['seconds']:.2f}s")
+        print(f"Throughput: {result['answers_per_second']:.0f} answers/s")
+        print(f"Latency: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+        return 0
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.data))
+    except KeyboardInterrupt:
+        print("Server stopped. Progress has been saved.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
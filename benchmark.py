@@ -0,0 +1,159 @@
+"""Benchmark suite for the hot paths of the flashcard program."""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import engine
+import flashcards
+import generate_data
+
+# Preset scales: (users, sets per user, terms per set, words per definition)
+SCALES = {
+    "small": (20, 5, 20, 8),
+    "medium": (200, 10, 50, 12),
+    "large": (1000, 20, 100, 16),
+}
+
+def time_call(func, repeat):
+    """Run a function several times and return its timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Hide the program's own messages
+            func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(timings), "mean_ms": sum(timings) / len(timings), "repeat": repeat}
+
+def run_benchmarks(users, sets_per_user, terms_per_set, definition_words, repeat=5, seed=0):
+    """Time every hot path against a generated store and return the results."""
+    random.seed(seed)
+    user_data = generate_data.build_user_data(users, seed, sets_per_user, terms_per_set, definition_words, uniform=True)
+    flashcard_sets = user_data["user0"]["flashcard_sets"]
+    flashcard_set = next(iter(flashcard_sets.values()))
+    terms = list(flashcard_set["terms"].keys())
+    results = {}
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            data_file = os.path.join(work_dir, flashcards.USER_DATA_FILE)
+            results["save_user_data"] = time_call(lambda: flashcards.save_user_data(user_data, data_file), repeat)
+            results["save_user_data"]["bytes"] = os.path.getsize(data_file)
+            results["load_user_data"] = time_call(lambda: flashcards.load_user_data(data_file), repeat)
+
+            # Grade a realistic mix of exact, slightly wrong and unrelated answers
+            answers = []
+            for term in terms:
+                definition = flashcard_set["terms"][term]["definition"]
+                words = definition.split()
+                random.shuffle(words)
+                answers.append((definition, definition))
+                answers.append((" ".join(words), definition))
+                answers.append(("I do not know", definition))
+
+            def grade_all():
+                for user_answer, correct_answer in answers:
+                    engine.calculate_similarity(user_answer, correct_answer)
+
+            results["calculate_similarity"] = time_call(grade_all, repeat)
+            results["calculate_similarity"]["per_answer_ms"] = results["calculate_similarity"]["min_ms"] / len(answers)
+
+            results["prioritize_terms"] = time_call(lambda: engine.prioritize_terms(flashcard_set), repeat)
+
+            def generate_all_options():
+                for term in terms:
+                    engine.generate_quiz_options(flashcard_set, terms, flashcard_set["terms"][term]["definition"])
+
+            results["generate_quiz_options"] = time_call(generate_all_options, repeat)
+            results["search_terms"] = time_call(lambda: flashcards.search_terms(flashcard_set, random.choice(generate_data.WORDS)), repeat)
+            results["build_leaderboard"] = time_call(lambda: flashcards.build_leaderboard(user_data), repeat)
+            results["calculate_achievements"] = time_call(lambda: flashcards.calculate_achievements(flashcard_sets), repeat)
+
+            flashcard_set["name"] = "benchmark"
+            results["export_json"] = time_call(lambda: flashcards.export_flashcard_set(flashcard_set, "json"), repeat)
+            results["import_json"] = time_call(lambda: flashcards.import_flashcard_set("benchmark.json"), repeat)
+            results["export_csv"] = time_call(lambda: flashcards.export_flashcard_set(flashcard_set, "csv"), repeat)
+            results["import_csv"] = time_call(lambda: flashcards.import_flashcard_set("benchmark.csv"), repeat)
+        finally:
+            os.chdir(original_dir)
+
+    return {
+        "config": {
+            "users": users,
+            "sets_per_user": sets_per_user,
+            "terms_per_set": terms_per_set,
+            "definition_words": definition_words,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    """Return a list of benchmarks that got slower than the baseline by more than the tolerance."""
+    regressions = []
+    for name, result in report["results"].items():
+        if name not in baseline.get("results", {}):
+            continue
+        old = baseline["results"][name]["min_ms"]
+        new = result["min_ms"]
+        if old > 0 and new > old * (1 + tolerance):
+            regressions.append({"benchmark": name, "baseline_ms": old, "current_ms": new, "change": new / old - 1})
+    return regressions
+
+def main(argv=None):
+    """Run the benchmark suite from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark the flashcard program's hot paths.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Preset data size")
+    parser.add_argument("--users", type=int, help="Number of users (overrides --scale)")
+    parser.add_argument("--sets", type=int, help="Flashcard sets per user (overrides --scale)")
+    parser.add_argument("--terms", type=int, help="Terms per set (overrides --scale)")
+    parser.add_argument("--definition-words", type=int, help="Words per definition (overrides --scale)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    users, sets_per_user, terms_per_set, definition_words = SCALES[args.scale]
+    report = run_benchmarks(
+        args.users or users,
+        args.sets or sets_per_user,
+        args.terms or terms_per_set,
+        args.definition_words or definition_words,
+        args.repeat,
+        args.seed,
+    )
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4)
+
+    print(f"{'Benchmark':<25} {'Min (ms)':<12} {'Mean (ms)':<12}")
+    for name, result in report["results"].items():
+        print(f"{name:<25} {result['min_ms']:<12.3f} {result['mean_ms']:<12.3f}")
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions compared to the baseline:")
+            for regression in regressions:
+                print(f"- {regression['benchmark']}: {regression['baseline_ms']:.3f} ms -> {regression['current_ms']:.3f} ms ({regression['change'] * 100:+.1f}%)")
+            return 1
+        print("\nNo regressions compared to the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Category -> sets secondary index with rolled-up per-category statistics."""
+
+UNCATEGORIZED = "Uncategorized"
+
+def category_key(category):
+    """Return the case-insensitive key for a category name."""
+    return (category or UNCATEGORIZED).strip().casefold() or UNCATEGORIZED.casefold()
+
+class CategoryIndex:
+    """Keeps the sets of each category and their summed terms, correct answers and attempts.
+
+    Each set's last counted contribution is remembered, so adding, removing or refreshing a set
+    only applies the difference and never rescans the other sets.
+    """
+
+    def __init__(self, flashcard_sets=None):
+        self.categories = {}  # key -> {"name", "sets": {set name: None}, "terms", "correct", "total"}
+        self.contributions = {}  # set name -> (key, terms, correct, total)
+        for set_name, flashcard_set in (flashcard_sets or {}).items():
+            self.add_set(set_name, flashcard_set)
+
+    def add_set(self, set_name, flashcard_set):
+        """Count a new (created or imported) set; re-counts it if it is already indexed."""
+        self.remove_set(set_name)
+        category = (flashcard_set.get("category") or UNCATEGORIZED).strip() or UNCATEGORIZED
+        key = category_key(category)
+        entry = self.categories.get(key)
+        if entry is None:
+            # The first spelling seen is the one shown; "math" and "Math" share an entry
+            entry = self.categories[key] = {"name": category, "sets": {}, "terms": 0, "correct": 0, "total": 0}
+        contribution = (key, len(flashcard_set["terms"]), flashcard_set["stats"]["correct"], flashcard_set["stats"]["total"])
+        entry["sets"][set_name] = None
+        entry["terms"] += contribution[1]
+        entry["correct"] += contribution[2]
+        entry["total"] += contribution[3]
+        self.contributions[set_name] = contribution
+
+    def remove_set(self, set_name):
+        """Stop counting a deleted set."""
+        contribution = self.contributions.pop(set_name, None)
+        if contribution is None:
+            return
+        key, terms, correct, total = contribution
+        entry = self.categories[key]
+        del entry["sets"][set_name]
+        entry["terms"] -= terms
+        entry["correct"] -= correct
+        entry["total"] -= total
+        if not entry["sets"]:
+            del self.categories[key]
+
+    def refresh_set(self, set_name, flashcard_set):
+        """Apply a set's changed counters (after grading or editing) to its category totals."""
+        self.add_set(set_name, flashcard_set)
+
+    def names(self):
+        """Return the category names, sorted case-insensitively."""
+        return [self.categories[key]["name"] for key in sorted(self.categories)]
+
+    def find(self, category):
+        """Return the indexed name for a category typed in any case, or None."""
+        entry = self.categories.get(category_key(category))
+        return entry["name"] if entry is not None else None
+
+    def sets_in(self, category):
+        """Return the names of the sets in a category (any case)."""
+        entry = self.categories.get(category_key(category))
+        return list(entry["sets"]) if entry is not None else []
+
+    def stats(self, category):
+        """Return a category's sets, terms, correct answers, attempts and accuracy."""
+        entry = self.categories.get(category_key(category))
+        if entry is None:
+            return {"name": category, "sets": 0, "terms": 0, "correct": 0, "total": 0, "percentage": 0.0}
+        return {
+            "name": entry["name"],
+            "sets": len(entry["sets"]),
+            "terms": entry["terms"],
+            "correct": entry["correct"],
+            "total": entry["total"],
+            "percentage": entry["correct"] / entry["total"] * 100 if entry["total"] else 0.0,
+        }
@@ -0,0 +1,78 @@
+"""Persistent daily challenge counters and streaks stored in a per-user ring buffer."""
+import datetime
+
+DAILY_GOAL = 10  # Correct answers needed to complete a day's challenge
+HISTORY_DAYS = 64  # Days of history kept in the ring buffer
+
+def get_record(user):
+    """Return the user's daily challenge record, creating it on first use.
+
+    The record holds one correct-answer count per day in a ring buffer: the count for a day
+    lives at counts[day.toordinal() % len(counts)], and "last_day" is the newest day written.
+    """
+    record = user.get("daily_challenge")
+    if record is None:
+        record = user["daily_challenge"] = {"goal": DAILY_GOAL, "last_day": None, "counts": [0] * HISTORY_DAYS}
+    return record
+
+def _advance(record, day_number):
+    """Move the ring buffer forward to a day, clearing the slots of the days skipped."""
+    last_day = record["last_day"]
+    if last_day is None:
+        record["last_day"] = day_number
+        return
+    counts = record["counts"]
+    for skipped in range(last_day + 1, min(day_number, last_day + len(counts)) + 1):
+        counts[skipped % len(counts)] = 0
+    if day_number > last_day:
+        record["last_day"] = day_number
+
+def record_correct_answers(user, count=1, day=None):
+    """Add correct answers to a day's count (today by default)."""
+    day_number = (day or datetime.date.today()).toordinal()
+    record = get_record(user)
+    _advance(record, day_number)
+    if day_number > record["last_day"] - len(record["counts"]):  # Ignore days older than the history
+        record["counts"][day_number % len(record["counts"])] += count
+
+def get_count(user, day=None):
+    """Return the number of correct answers on a day (today by default)."""
+    day_number = (day or datetime.date.today()).toordinal()
+    record = get_record(user)
+    last_day = record["last_day"]
+    if last_day is None or day_number > last_day or day_number <= last_day - len(record["counts"]):
+        return 0
+    return record["counts"][day_number % len(record["counts"])]
+
+def get_history(user, days=7, day=None):
+    """Return (date, correct answers) pairs for the last `days` days, oldest first."""
+    day = day or datetime.date.today()
+    days = min(days, len(get_record(user)["counts"]))
+    return [(day - datetime.timedelta(days=offset), get_count(user, day - datetime.timedelta(days=offset))) for offset in range(days - 1, -1, -1)]
+
+def calculate_streak(user, day=None):
+    """Return how many days in a row the goal was reached, counting back from today.
+
+    An unfinished today does not break the streak; it just is not counted yet.
+    """
+    day = day or datetime.date.today()
+    record = get_record(user)
+    streak = 0
+    offset = 0 if get_count(user, day) >= record["goal"] else 1
+    while offset < len(record["counts"]) and get_count(user, day - datetime.timedelta(days=offset)) >= record["goal"]:
+        streak += 1
+        offset += 1
+    return streak
+
+def get_challenge(user, day=None):
+    """Return today's challenge: date, goal, progress, completed and streak."""
+    day = day or datetime.date.today()
+    record = get_record(user)
+    progress = get_count(user, day)
+    return {
+        "date": day.isoformat(),
+        "goal": record["goal"],
+        "progress": progress,
+        "completed": progress >= record["goal"],
+        "streak": calculate_streak(user, day),
+    }
@@ -0,0 +1,141 @@
+"""Near-duplicate term detection with MinHash signatures and locality-sensitive hashing."""
+import argparse
+import random
+import re
+import sys
+import zlib
+
+import numpy as np
+
+from analytics import write_report
+from flashcards import import_flashcard_set, load_user_data, USER_DATA_FILE
+
+NUM_PERMUTATIONS = 128  # MinHash values per term
+BANDS = 32  # LSH bands of NUM_PERMUTATIONS // BANDS rows; terms sharing any band are compared
+SHINGLE_SIZE = 5  # Characters per shingle
+DUPLICATE_THRESHOLD = 0.6  # Estimated Jaccard similarity at which two terms count as duplicates
+PRIME = (1 << 31) - 1  # Keeps a * hash + b inside 64 bits
+
+_rng = random.Random(0)  # Fixed permutations, so signatures and reports are reproducible
+_A = np.array([_rng.randrange(1, PRIME) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+_B = np.array([_rng.randrange(0, PRIME) for _ in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+
+def shingles(term, definition):
+    """Return the character shingles of a term and its definition, ignoring case and punctuation."""
+    text = " ".join(re.findall(r"[^\W_]+", f"{term} {definition}".lower()))
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+
+def signature(shingle_set):
+    """Return the MinHash signature of a set of shingles."""
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) & 0x7FFFFFFF for shingle in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    return ((np.outer(_A, hashes) + _B[:, None]) % PRIME).min(axis=1)
+
+def find_duplicate_groups(entries, threshold=DUPLICATE_THRESHOLD):
+    """Group near-duplicate entries (dicts with "term" and "definition").
+
+    Returns a list of groups; each group is a list of (entry index, estimated similarity to the
+    group's first entry). Every entry is hashed into BANDS buckets and only compared with the first
+    entry already in each bucket, so the work grows linearly with the number of entries.
+    """
+    signatures = np.array([signature(shingles(entry["term"], entry["definition"])) for entry in entries]).reshape(len(entries), NUM_PERMUTATIONS)
+    rows = NUM_PERMUTATIONS // BANDS
+    parents = list(range(len(entries)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    for band in range(BANDS):
+        buckets = {}
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for index in range(len(entries)):
+            key = band_values[index].tobytes()
+            first = buckets.setdefault(key, index)
+            if first != index and find(first) != find(index):
+                if np.count_nonzero(signatures[first] == signatures[index]) / NUM_PERMUTATIONS >= threshold:
+                    parents[find(index)] = find(first)
+
+    groups = {}
+    for index in range(len(entries)):
+        groups.setdefault(find(index), []).append(index)
+    result = []
+    for members in groups.values():
+        if len(members) > 1:
+            first = members[0]
+            result.append([(index, float(np.count_nonzero(signatures[first] == signatures[index]) / NUM_PERMUTATIONS)) for index in members])
+    return result
+
+def dedup_report(flashcard_set, library=None, set_name="(imported)", threshold=DUPLICATE_THRESHOLD):
+    """Report near-duplicates inside a set and against a library of existing sets.
+
+    Only groups that include a term of `flashcard_set` are reported. Each row names the group, the
+    term's set, whether it is kept, and its similarity to the group's kept term. A library term is
+    kept when the group has one; otherwise the set's first term in the group is.
+    """
+    entries = []
+    for library_set_name, library_set in (library or {}).items():
+        entries.extend({"set": library_set_name, "term": term, "definition": data["definition"], "source": "library"} for term, data in library_set["terms"].items())
+    entries.extend({"set": set_name, "term": term, "definition": data["definition"], "source": "import"} for term, data in flashcard_set["terms"].items())
+
+    rows = []
+    for group_number, group in enumerate(find_duplicate_groups(entries, threshold), 1):
+        members = [entries[index] for index, _ in group]
+        if all(member["source"] == "library" for member in members):
+            continue
+        # Library entries come first in `entries`, so a group's first member is a library term if it has one
+        for position, ((index, similarity), member) in enumerate(zip(group, members)):
+            rows.append({
+                "group": group_number,
+                "source": member["source"],
+                "set": member["set"],
+                "term": member["term"],
+                "definition": member["definition"],
+                "similarity": round(similarity, 3),
+                "action": "keep" if position == 0 else "merge",
+                "kept_set": members[0]["set"],
+                "kept_term": members[0]["term"],
+            })
+    return rows
+
+def merge_duplicates(flashcard_set, report):
+    """Remove the set's terms marked "merge" in a report and return how many were removed.
+
+    Counters of a removed term are added to the kept term when that term is in the same set.
+    """
+    removed = 0
+    for row in report:
+        if row["action"] != "merge" or row["source"] != "import" or row["term"] not in flashcard_set["terms"]:
+            continue
+        data = flashcard_set["terms"].pop(row["term"])
+        kept = flashcard_set["terms"].get(row["kept_term"]) if row["kept_set"] == row["set"] else None
+        if kept is not None:
+            kept["correct"] += data["correct"]
+            kept["total"] += data["total"]
+        removed += 1
+    return removed
+
+def main(argv=None):
+    """Report near-duplicate terms in a deck file, optionally against a user's library."""
+    parser = argparse.ArgumentParser(description="Find near-duplicate terms in a flashcard set file.")
+    parser.add_argument("file", help="Flashcard set to check (.json or .csv, as accepted by the import menu)")
+    parser.add_argument("--user", help="Also compare against this user's existing sets")
+    parser.add_argument("--data", default=USER_DATA_FILE, help="User data file holding the library")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="Estimated similarity at which terms are duplicates")
+    parser.add_argument("--output", default="duplicates.csv", help="Report file (.csv or .json)")
+    args = parser.parse_args(argv)
+
+    flashcard_set = import_flashcard_set(args.file)
+    if not flashcard_set:
+        return 1
+    library = load_user_data(args.data)[args.user]["flashcard_sets"] if args.user else None
+    report = dedup_report(flashcard_set, library, threshold=args.threshold)
+    write_report(report, args.output)
+    print(f"{sum(row['action'] == 'merge' for row in report)} near-duplicate terms in {len({row['group'] for row in report})} groups written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""UI-free study sessions shared by the command-line and Streamlit front ends."""
+import abc
+import datetime
+import difflib
+import heapq
+import itertools
+import random
+import time
+
+import daily_challenge
+import metrics
+import rating
+import text_index
+
+# Grading thresholds used by every front end
+CORRECT_THRESHOLD = 0.7
+ALMOST_THRESHOLD = 0.4
+# Keyword overlap scores lower than character similarity for the same answer
+KEYWORD_CORRECT_THRESHOLD = 0.6
+KEYWORD_ALMOST_THRESHOLD = 0.3
+
+GRADING_MODES = {"similarity": "Character similarity", text_index.KEYWORD_GRADING: "Keyword overlap"}
+
+# Cross-set review orders, and the days until a reviewed term is due again by its Leitner box
+REVIEW_ORDERS = {"misses": "Most missed first", "due": "Most overdue first"}
+REVIEW_INTERVALS = (1, 2, 4, 8, 16, 32)
+REVIEW_LENGTH = 20
+
+@metrics.timed("flashcards_grading_ms", "Time spent grading one answer")
+def calculate_similarity(user_answer, correct_answer):
+    """Return how closely an answer matches the correct definition (0.0 to 1.0)."""
+    similarity = difflib.SequenceMatcher(None, user_answer.lower(), correct_answer.lower()).ratio()
+    metrics.observe("flashcards_answer_similarity", similarity, metrics.SIMILARITY_BUCKETS, "Similarity of graded answers")
+    return similarity
+
+def prioritize_terms(flash_cards, skill=None):
+    """Order terms so the ones the user misses most often come first.
+
+    With a skill rating, terms are ordered by the modelled chance of a correct answer, lowest first.
+    """
+    if skill is not None:
+        terms = flash_cards["terms"]
+        return sorted(
+            terms,
+            key=lambda term: (
+                rating.predict(skill, terms[term].get("difficulty", rating.DEFAULT_DIFFICULTY)),
+                terms[term]["correct"] - terms[term]["total"],
+            ),
+        )
+    return sorted(
+        flash_cards["terms"].keys(),
+        key=lambda term: (
+            flash_cards["terms"][term]["total"] - flash_cards["terms"][term]["correct"]
+        ),
+        reverse=True,
+    )
+
+def generate_quiz_options(flash_cards, terms, correct_answer, num_options=4, rng=random, correct_position=None):
+    """Generate shuffled multiple-choice options that include the correct answer.
+
+    `rng` makes the options reproducible (a seeded random.Random), and `correct_position` puts the
+    correct answer at that index instead of wherever the shuffle leaves it.
+    """
+    options = [correct_answer]
+    attempts = 0
+    while len(options) < num_options:
+        random_term = rng.choice(terms)
+        random_definition = flash_cards["terms"][random_term]["definition"]
+        if random_definition not in options:
+            options.append(random_definition)
+        attempts += 1
+        if attempts > 4 * len(terms):
+            # Too few unique definitions to keep sampling; take whatever is left
+            for term in terms:
+                definition = flash_cards["terms"][term]["definition"]
+                if len(options) < num_options and definition not in options:
+                    options.append(definition)
+            break
+    rng.shuffle(options)
+    if correct_position is not None:
+        position = correct_position % len(options)
+        current = options.index(correct_answer)
+        options[position], options[current] = options[current], options[position]
+    return options
+
+def record_result(flash_cards, term, correct):
+    """Add one graded answer to a term's counters and the set's stats."""
+    flash_cards["terms"][term]["total"] += 1
+    flash_cards["stats"]["total"] += 1
+    if correct:
+        flash_cards["terms"][term]["correct"] += 1
+        flash_cards["stats"]["correct"] += 1
+    flash_cards["stats"]["percentage"] = (flash_cards["stats"]["correct"] / flash_cards["stats"]["total"]) * 100
+
+@metrics.timed("flashcards_grading_ms", "Time spent grading one answer", {"grading": "keywords"})
+def calculate_keyword_similarity(user_answer, keywords):
+    """Return the keyword overlap between an answer and a definition's keyword vector (0.0 to 1.0)."""
+    similarity = text_index.keyword_similarity(user_answer, keywords)
+    metrics.observe("flashcards_answer_similarity", similarity, metrics.SIMILARITY_BUCKETS, "Similarity of graded answers")
+    return similarity
+
+def grade_definition(user_answer, correct_answer, keywords=None):
+    """Grade a typed definition against the correct one and return a verdict.
+
+    Pass the term's keyword vector (from text_index.get_keyword_vector) to grade by keyword overlap.
+    """
+    if keywords is not None:
+        similarity = calculate_keyword_similarity(user_answer, keywords)
+        correct_threshold, almost_threshold = KEYWORD_CORRECT_THRESHOLD, KEYWORD_ALMOST_THRESHOLD
+    else:
+        similarity = calculate_similarity(user_answer, correct_answer)
+        correct_threshold, almost_threshold = CORRECT_THRESHOLD, ALMOST_THRESHOLD
+    if similarity > correct_threshold:
+        verdict = "correct"
+    elif similarity > almost_threshold:
+        verdict = "almost"
+    else:
+        verdict = "incorrect"
+    return {
+        "verdict": verdict,
+        "correct": verdict == "correct",
+        "similarity": similarity,
+        "correct_answer": correct_answer,
+        "hint": correct_answer[:len(correct_answer) // 2],
+    }
+
+def grade_answer(flash_cards, term, user_answer, record=True):
+    """Grade a typed definition for a term with the set's grading mode; records it by default."""
+    result = grade_definition(user_answer, flash_cards["terms"][term]["definition"], text_index.get_keyword_vector(flash_cards, term))
+    result["term"] = term
+    if record:
+        record_result(flash_cards, term, result["correct"])
+    return result
+
+def miss_ratio(term_data):
+    """Return the smoothed share of a term's answers that were wrong; unseen terms count as 0.5."""
+    return (term_data["total"] - term_data["correct"] + 1) / (term_data["total"] + 2)
+
+def review_key(term_data, order="misses"):
+    """Return a term's review priority; smaller keys are reviewed first.
+
+    "due" orders by the day a term is next due (terms never reviewed are due at once), then by
+    miss ratio. "misses" orders by miss ratio alone.
+    """
+    if order == "due":
+        return (term_data.get("due", 0), -miss_ratio(term_data))
+    return (-miss_ratio(term_data),)
+
+def review_stream(set_name, flashcard_set, limit, order="misses"):
+    """Yield (key, set name, term) for a set's `limit` highest-priority terms, best first.
+
+    The set is scanned once with a heap of at most `limit` entries, so it is never sorted or copied.
+    """
+    best = heapq.nsmallest(limit, ((review_key(data, order), term) for term, data in flashcard_set["terms"].items()))
+    for key, term in best:
+        yield key, set_name, term
+
+def review_queue(flashcard_sets, limit=REVIEW_LENGTH, order="misses"):
+    """Lazily merge every set's review stream and return an iterator over the best `limit` cards.
+
+    Each stream holds at most `limit` candidates and the merge heap one entry per set, so memory
+    grows with the session length and the number of sets, not with the number of terms.
+    """
+    streams = [review_stream(set_name, flashcard_set, limit, order) for set_name, flashcard_set in flashcard_sets.items() if flashcard_set["terms"]]
+    return itertools.islice(heapq.merge(*streams), limit)
+
+def schedule_review(term_data, correct, today=None):
+    """Move a reviewed term up one Leitner box (back to the first on a miss) and set when it is due."""
+    today = today if today is not None else datetime.date.today().toordinal()
+    box = min(term_data.get("box", 0) + 1, len(REVIEW_INTERVALS) - 1) if correct else 0
+    term_data["box"] = box
+    term_data["due"] = today + REVIEW_INTERVALS[box]
+
+class StudySession(abc.ABC):
+    """A study session over one flashcard set: next_card(), submit(answer), finish()."""
+
+    mode = "study"
+    rated = True  # Whether answers update the user's skill and the terms' difficulty ratings
+
+    def __init__(self, flash_cards, terms=None, user=None, on_answer=None):
+        self.flash_cards = flash_cards
+        self.user = user  # When given, correct answers count toward the user's daily challenge
+        self.on_answer = on_answer  # Called with every verdict, e.g. to log the answer history
+        self.terms = list(terms) if terms is not None else self.order_terms()
+        self.position = 0
+        self.score = 0
+        self.answered = 0
+        self.current = None
+        self.shown_at = None
+        self.finished = False
+
+    def order_terms(self):
+        """Return the order in which the terms are shown."""
+        terms = list(self.flash_cards["terms"].keys())
+        random.shuffle(terms)
+        return terms
+
+    @property
+    def total_questions(self):
+        return len(self.terms)
+
+    def make_card(self, term):
+        """Return what the front end should show for a term."""
+        return {"term": term, "number": self.position + 1, "total": len(self.terms)}
+
+    def next_card(self):
+        """Return the next card to show, or None when the session is over."""
+        if self.finished:
+            return None
+        if self.current is not None:
+            return self.current  # The current card has not been answered yet
+        if self.position >= len(self.terms):
+            return None
+        self.current = self.make_card(self.terms[self.position])
+        self.shown_at = time.perf_counter()
+        return self.current
+
+    @abc.abstractmethod
+    def grade(self, card, answer):
+        """Return the verdict for an answer to a card."""
+
+    def submit(self, answer):
+        """Grade an answer to the current card and move on to the next one."""
+        if self.current is None:
+            raise ValueError("No card is waiting for an answer. Call next_card() first.")
+        verdict = self.grade(self.current, answer)
+        verdict["response_ms"] = (time.perf_counter() - self.shown_at) * 1000
+        self.answered += 1
+        if self.rated and self.user is not None and verdict["verdict"] != "invalid":
+            rating.update(self.user, self.flash_cards["terms"][verdict["term"]], verdict["correct"])
+        if verdict["correct"]:
+            self.score += 1
+            if self.user is not None:
+                daily_challenge.record_correct_answers(self.user)
+        if self.on_answer is not None:
+            self.on_answer(verdict)
+        self.position += 1
+        self.current = None
+        return verdict
+
+    def finish(self):
+        """End the session and return a summary."""
+        self.finished = True
+        self.current = None
+        return {
+            "mode": self.mode,
+            "score": self.score,
+            "answered": self.answered,
+            "total_questions": self.total_questions,
+        }
+
+class GameSession(StudySession):
+    """Type the definition for each term; the terms missed most often come first."""
+
+    mode = "game"
+
+    def order_terms(self):
+        return prioritize_terms(self.flash_cards, rating.get_skill(self.user))
+
+    def grade(self, card, answer):
+        return grade_answer(self.flash_cards, card["term"], answer)
+
+class QuizSession(StudySession):
+    """Pick the right definition out of several options."""
+
+    mode = "quiz"
+    rated = False  # Quiz answers do not move the term's counters, which size its rating steps
+
+    def make_card(self, term):
+        card = super().make_card(term)
+        card["options"] = generate_quiz_options(self.flash_cards, self.terms, self.flash_cards["terms"][term]["definition"])
+        return card
+
+    def grade(self, card, answer):
+        correct_answer = self.flash_cards["terms"][card["term"]]["definition"]
+        answer = str(answer).strip()
+        if not (answer.isdigit() and 1 <= int(answer) <= len(card["options"])):
+            verdict = "invalid"
+        elif card["options"][int(answer) - 1] == correct_answer:
+            verdict = "correct"
+        else:
+            verdict = "incorrect"
+        return {"term": card["term"], "verdict": verdict, "correct": verdict == "correct", "correct_answer": correct_answer}
+
+class FillInTheBlankSession(StudySession):
+    """Fill in a meaningful word that has been blanked out of the definition."""
+
+    mode = "fill_in_the_blank"
+    rated = False  # Like the quiz, blanks leave the counters (and so the rating steps) alone
+
+    def __init__(self, flash_cards, terms=None, user=None, on_answer=None):
+        # Rank blanks across the user's whole library when we know the user
+        library = user["flashcard_sets"].values() if user is not None and "flashcard_sets" in user else None
+        self.blank_index = text_index.get_blank_index(flash_cards, library)
+        super().__init__(flash_cards, terms, user, on_answer)
+        # Definitions too short to blank are left out up front, so they do not count as questions
+        self.terms = [term for term in self.terms if self.blank_index[term]["blanks"]]
+
+    def make_card(self, term):
+        card = super().make_card(term)
+        definition = self.flash_cards["terms"][term]["definition"]
+        # Pick one of the highest-IDF words so the same card does not always blank the same word
+        start, end, word = random.choice(self.blank_index[term]["blanks"][:3])
+        self._blank_word = word
+        card["prompt"] = definition[:start] + "____" + definition[end:]
+        return card
+
+    def grade(self, card, answer):
+        correct = " ".join(text_index.tokenize(answer)) == self._blank_word
+        return {"term": card["term"], "verdict": "correct" if correct else "incorrect", "correct": correct, "correct_answer": self._blank_word}
+
+class RevisionSession(StudySession):
+    """Review definitions without affecting any stats."""
+
+    mode = "revision"
+    rated = False
+
+    def grade(self, card, answer):
+        return {"term": card["term"], "verdict": "revealed", "correct": False, "correct_answer": self.flash_cards["terms"][card["term"]]["definition"]}
+
+class ReviewSession(StudySession):
+    """Type the definitions of the weakest (or most overdue) cards across all of a user's sets.
+
+    Cards are pulled from review_queue() one at a time, and each answer is recorded on the set the
+    card came from. Every card carries its set name under "set".
+    """
+
+    mode = "review"
+
+    def __init__(self, flashcard_sets, limit=REVIEW_LENGTH, order="misses", user=None, on_answer=None):
+        self.flashcard_sets = flashcard_sets
+        self.order = order
+        self.queue = review_queue(flashcard_sets, limit, order)
+        self.length = min(limit, sum(len(flashcard_set["terms"]) for flashcard_set in flashcard_sets.values()))
+        self.reviewed_sets = set()  # Names of the sets whose counters changed
+        super().__init__(None, [], user, on_answer)
+
+    @property
+    def total_questions(self):
+        return self.length
+
+    def next_card(self):
+        if self.finished:
+            return None
+        if self.current is not None:
+            return self.current
+        for _, set_name, term in self.queue:
+            flashcard_set = self.flashcard_sets.get(set_name)
+            if flashcard_set is not None and term in flashcard_set["terms"]:  # Skip cards deleted since the queue was built
+                self.flash_cards = flashcard_set
+                self.current = {"term": term, "set": set_name, "number": self.position + 1, "total": self.length}
+                self.shown_at = time.perf_counter()
+                return self.current
+        return None
+
+    def grade(self, card, answer):
+        result = grade_answer(self.flash_cards, card["term"], answer)
+        schedule_review(self.flash_cards["terms"][card["term"]], result["correct"])
+        result["set"] = card["set"]
+        self.reviewed_sets.add(card["set"])
+        return result
@@ -0,0 +1,213 @@
+"""Printable multiple-choice exam variants and answer keys, built from the quiz options on a process pool."""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import html
+import io
+import os
+import random
+import sys
+import time
+
+import engine
+
+NUM_OPTIONS = 4
+LETTERS = "ABCDEFGHIJ"
+CHUNK_VARIANTS = 20  # Variants sent to a worker at a time
+FORMATS = ("csv", "html")
+
+HTML_HEADER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; }}
+section {{ page-break-after: always; }}
+li {{ margin-bottom: 0.6em; }}
+ol.options {{ list-style-type: upper-alpha; }}
+</style>
+</head>
+<body>
+"""
+HTML_FOOTER = "</body>\n</html>\n"
+
+_exam_set = None  # The set's terms, sent to each worker process once
+_exam_terms = None
+
+def _init_worker(flashcard_set):
+    global _exam_set, _exam_terms
+    _exam_set = flashcard_set
+    _exam_terms = list(flashcard_set["terms"])
+
+def build_variant(flashcard_set, terms, number, questions, seed, num_options=NUM_OPTIONS):
+    """Return one exam variant as [(term, options, answer index)].
+
+    The variant depends only on the seed and its number, so every variant can be rebuilt on its own.
+    Each answer position is used for the same number of questions (give or take one), and the
+    options come from engine.generate_quiz_options, so no definition appears twice in a question.
+    """
+    rng = random.Random(f"{seed}:{number}")
+    positions = [index % num_options for index in range(questions)]
+    rng.shuffle(positions)
+    variant = []
+    for term, position in zip(rng.sample(terms, questions), positions):
+        correct_answer = flashcard_set["terms"][term]["definition"]
+        options = engine.generate_quiz_options(flashcard_set, terms, correct_answer, num_options, rng, position)
+        variant.append((term, options, options.index(correct_answer)))
+    return variant
+
+def _render_chunk(numbers, questions, seed, num_options, formats, title):
+    """Worker: build a run of variants and render them; returns {output name: text} and answer position counts."""
+    outputs = {name: io.StringIO() for name in ("questions_csv", "key_csv", "exam_html", "key_html")}
+    question_writer = csv.writer(outputs["questions_csv"], lineterminator="\n")
+    key_writer = csv.writer(outputs["key_csv"], lineterminator="\n")
+    position_counts = [0] * num_options
+    for number in numbers:
+        variant = build_variant(_exam_set, _exam_terms, number, questions, seed, num_options)
+        if "html" in formats:
+            outputs["exam_html"].write(f"<section>\n<h1>{html.escape(title)} (variant {number})</h1>\n<ol>\n")
+            outputs["key_html"].write(f"<section>\n<h1>Answer key: variant {number}</h1>\n<ol>\n")
+        for question, (term, options, answer) in enumerate(variant, 1):
+            position_counts[answer] += 1
+            if "csv" in formats:
+                question_writer.writerow([number, question, term, *options])
+                key_writer.writerow([number, question, LETTERS[answer], term])
+            if "html" in formats:
+                items = "".join(f"<li>{html.escape(option)}</li>" for option in options)
+                outputs["exam_html"].write(f"<li>{html.escape(term)}<ol class=\"options\">{items}</ol></li>\n")
+                outputs["key_html"].write(f"<li>{LETTERS[answer]} ({html.escape(term)})</li>\n")
+        if "html" in formats:
+            outputs["exam_html"].write("</ol>\n</section>\n")
+            outputs["key_html"].write("</ol>\n</section>\n")
+    return {name: output.getvalue() for name, output in outputs.items()}, position_counts
+
+def output_files(output_dir, formats):
+    """Return {output name: file path} for the requested formats."""
+    files = {}
+    if "csv" in formats:
+        files["questions_csv"] = os.path.join(output_dir, "exam_questions.csv")
+        files["key_csv"] = os.path.join(output_dir, "exam_answer_key.csv")
+    if "html" in formats:
+        files["exam_html"] = os.path.join(output_dir, "exam.html")
+        files["key_html"] = os.path.join(output_dir, "exam_answer_key.html")
+    return files
+
+def generate_exams(flashcard_set, variants, questions, output_dir, seed=0, num_options=NUM_OPTIONS, formats=FORMATS,
+                   title="Exam", workers=None, chunk_variants=CHUNK_VARIANTS):
+    """Write `variants` exam variants of `questions` questions and their answer keys; returns the files written
+    and how many answers fall in each position.
+
+    Runs of variants are built and rendered on a process pool, with at most two runs per worker in
+    flight, and written to the files in order as they come back. The output is the same for any
+    number of workers. Raises ValueError if the set is too small for the exam.
+    """
+    terms = flashcard_set["terms"]
+    if questions > len(terms):
+        raise ValueError(f"The set has {len(terms)} terms, fewer than the {questions} questions asked for.")
+    if len({term_data["definition"] for term_data in terms.values()}) < num_options:
+        raise ValueError(f"The set needs at least {num_options} different definitions for {num_options} options per question.")
+    exam_set = {"terms": {term: {"definition": term_data["definition"]} for term, term_data in terms.items()}}
+    files = output_files(output_dir, formats)
+    os.makedirs(output_dir, exist_ok=True)
+    handles = {name: open(file_name, "w", newline="", encoding="utf-8") for name, file_name in files.items()}
+    position_counts = [0] * num_options
+    try:
+        if "csv" in formats:
+            csv.writer(handles["questions_csv"], lineterminator="\n").writerow(["Variant", "Question", "Term", *LETTERS[:num_options]])
+            csv.writer(handles["key_csv"], lineterminator="\n").writerow(["Variant", "Question", "Answer", "Term"])
+        if "html" in formats:
+            handles["exam_html"].write(HTML_HEADER.format(title=html.escape(title)))
+            handles["key_html"].write(HTML_HEADER.format(title=html.escape(f"{title} answer keys")))
+
+        def write(result):
+            texts, counts = result
+            for name, handle in handles.items():
+                handle.write(texts[name])
+            for position, count in enumerate(counts):
+                position_counts[position] += count
+
+        chunks = [range(start, min(start + chunk_variants, variants + 1)) for start in range(1, variants + 1, chunk_variants)]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            _init_worker(exam_set)
+            for numbers in chunks:
+                write(_render_chunk(numbers, questions, seed, num_options, formats, title))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(exam_set,)) as executor:
+                pending = collections.deque()
+                for numbers in chunks:
+                    pending.append(executor.submit(_render_chunk, numbers, questions, seed, num_options, formats, title))
+                    while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        if "html" in formats:
+            handles["exam_html"].write(HTML_FOOTER)
+            handles["key_html"].write(HTML_FOOTER)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return list(files.values()), position_counts
+
+def run_benchmark(variants=500, questions=200, terms=2000, workers=None, seed=0):
+    """Generate exams from a synthetic set on one process and on the pool, and report both times."""
+    import tempfile
+    import generate_data
+
+    flashcard_set = generate_data.generate_flashcard_set(random.Random(f"{seed}:exam"), terms, 12)
+    results = {"variants": variants, "questions": questions, "workers": workers or os.cpu_count() or 1}
+    with tempfile.TemporaryDirectory() as directory:
+        contents = []
+        for name, worker_count in (("serial", 1), ("parallel", workers)):
+            output_dir = os.path.join(directory, name)
+            start = time.perf_counter()
+            files, position_counts = generate_exams(flashcard_set, variants, questions, output_dir, seed, workers=worker_count)
+            results[f"{name}_seconds"] = round(time.perf_counter() - start, 2)
+            contents.append([open(file_name, "rb").read() for file_name in files])
+        results["megabytes"] = round(sum(len(content) for content in contents[1]) / 1e6, 1)
+    results["identical"] = contents[0] == contents[1]
+    results["position_counts"] = position_counts
+    return results
+
+def main(argv=None):
+    """Generate exam variants for one user's set from the command line, or benchmark the generator."""
+    parser = argparse.ArgumentParser(description="Generate printable multiple-choice exam variants and answer keys.")
+    parser.add_argument("--data", help="User data file (default: the program's store)")
+    parser.add_argument("--user", help="Owner of the flashcard set")
+    parser.add_argument("--set", dest="set_name", help="Flashcard set to build the exams from")
+    parser.add_argument("--variants", type=int, default=30, help="Number of different exams")
+    parser.add_argument("--questions", type=int, default=20, help="Questions per exam")
+    parser.add_argument("--seed", type=int, default=0, help="Same seed, same exams")
+    parser.add_argument("--format", choices=("csv", "html", "both"), default="both", help="Output format")
+    parser.add_argument("--output", default="exams", help="Directory to write the exams to")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--benchmark", action="store_true", help="Time 500 variants of a 200-question exam and exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_benchmark(workers=args.workers)
+        print(f"{result['variants']} variants x {result['questions']} questions ({result['megabytes']} MB): "
+              f"1 process {result['serial_seconds']} s, {result['workers']} workers {result['parallel_seconds']} s; "
+              f"identical output: {result['identical']}; answers per position: {result['position_counts']}")
+        return 0
+    if not args.user or not args.set_name:
+        parser.error("give --user and --set, or --benchmark")
+    from flashcards import USER_DATA_FILE, load_user_data  # Imported here because flashcards imports this module
+    user_data = load_user_data(args.data or USER_DATA_FILE)
+    flashcard_set = user_data.get(args.user, {}).get("flashcard_sets", {}).get(args.set_name)
+    if flashcard_set is None:
+        parser.error(f"user '{args.user}' has no flashcard set named '{args.set_name}'")
+    formats = FORMATS if args.format == "both" else (args.format,)
+    start = time.perf_counter()
+    try:
+        files, _ = generate_exams(flashcard_set, args.variants, args.questions, args.output, args.seed, formats=formats, title=args.set_name, workers=args.workers)
+    except ValueError as error:
+        print(error)
+        return 1
+    print(f"Wrote {args.variants} variants in {time.perf_counter() - start:.1f} s: {', '.join(files)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,169 @@
-import random
-import difflib
 import json
 import os
 import gzip
-import hashlib
-import msvcrt  # Import for custom password masking with asterisks
+import stat  # Import for keeping the store's permissions on save
+import random  # Import for new exam seeds
+import re  # Import for the streaming store reader
+import tempfile  # Import for atomic saves
+import threading  # Import for reading the umask only on the main thread
+import getpass  # Fallback password prompt on systems without msvcrt
 import csv  # Import for CSV handling
-import datetime  # Import for tracking daily challenges
+import daily_challenge  # Import for tracking daily challenges
+import engine  # Import for the UI-free study sessions
+import exams  # Import for printable exam variants
+import history  # Import for the answer history log
+import text_index  # Import for keyword grading vectors
+import fuzzy  # Import for typo-tolerant name lookup
+from categories import CategoryIndex  # Import for the category index (main_menu uses "categories" as a local name)
+import metrics  # Import for optional timing and counter instrumentation
+import passwords  # Import for salted, calibrated password hashing
+import profiling  # Import for the opt-in --profile mode
+import rating  # Import for calibrated skill levels
+import versions  # Import for set versions and rollback
+import argparse  # Import for command-line options
+
+try:
+    import msvcrt  # Import for custom password masking with asterisks
+except ImportError:  # msvcrt only exists on Windows
+    msvcrt = None
+
+USER_DATA_FILE = "user_data.json.gz"
+_umask = None  # Read on the first save of a new store; see default_file_mode()
+LOCAL_SET_KEYS = text_index.CACHE_KEYS + (versions.VERSION_KEY,)  # Left out of exports: rebuilt, or only meaningful to the owner
 
 def hash_password(password):
-    """Hash a password using SHA-256."""
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+    """Hash a password with salted PBKDF2 at a cost calibrated to this computer."""
+    return passwords.hash_password(password)
 
 def verify_password(stored_password, provided_password):
-    """Verify a provided password against the stored hashed password."""
-    return stored_password == hash_password(provided_password)
+    """Verify a provided password against the stored hashed password (salted or legacy SHA-256)."""
+    return passwords.verify_password(stored_password, provided_password)
 
-def load_user_data():
+@metrics.timed("flashcards_load_user_data_ms", "Time spent loading user data")
+def load_user_data(file_name=USER_DATA_FILE):
     """Load user data from a compressed JSON file."""
-    if os.path.exists("user_data.json.gz"):
-        with gzip.open("user_data.json.gz", "rt", encoding="utf-8") as file:
+    if os.path.exists(file_name):
+        if metrics.ENABLED:
+            metrics.increment("flashcards_user_data_bytes_read_total", os.path.getsize(file_name), "Compressed bytes of user data loaded")
+        with gzip.open(file_name, "rt", encoding="utf-8") as file:
             return json.load(file)
     return {}
 
-def save_user_data(user_data):
+def default_file_mode():
+    """Return the permissions a newly created store should get from the process umask.
+
+    The umask is read once, from /proc where it is available. Elsewhere it can only be read by
+    setting it, which would briefly change it for every thread, so that is only done on the main
+    thread; other threads assume the usual 022.
+    """
+    global _umask
+    if _umask is None:
+        try:
+            with open("/proc/self/status", "r", encoding="utf-8") as file:
+                _umask = next((int(line.split()[1], 8) for line in file if line.startswith("Umask:")), None)
+        except OSError:
+            pass
+    if _umask is None:
+        if threading.current_thread() is not threading.main_thread():
+            return 0o666 & ~0o022
+        _umask = os.umask(0o077)  # Briefly stricter, never looser, than any sensible umask
+        os.umask(_umask)
+    return 0o666 & ~_umask
+
+def replace_store(temp_file_name, file_name):
+    """Move a finished temporary file over the store, keeping the store's permissions.
+
+    mkstemp creates files readable only by their owner, so the old file's mode (or the mode a new
+    file would get from the umask) is copied first.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(file_name).st_mode)
+    except FileNotFoundError:
+        mode = default_file_mode()
+    os.chmod(temp_file_name, mode)
+    os.replace(temp_file_name, file_name)
+
+@metrics.timed("flashcards_save_user_data_ms", "Time spent saving user data")
+def save_user_data(user_data, file_name=USER_DATA_FILE):
     """Save user data to a compressed JSON file."""
-    with gzip.open("user_data.json.gz", "wt", encoding="utf-8") as file:
-        json.dump(user_data, file, indent=4)
-
+    # Write to a temporary file first so readers never see a half-written store
+    file_descriptor, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name)))
+    try:
+        with os.fdopen(file_descriptor, "wb") as raw_file, gzip.open(raw_file, "wt", encoding="utf-8") as file:
+            json.dump(user_data, file, indent=4)
+        replace_store(temp_file_name, file_name)
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
+    if metrics.ENABLED:
+        metrics.increment("flashcards_user_data_bytes_written_total", os.path.getsize(file_name), "Compressed bytes of user data saved")
+
+def iter_user_data(file_name=USER_DATA_FILE, chunk_size=1 << 16):
+    """Yield (username, user) pairs from a compressed JSON store one user at a time.
+
+    Only the user being decoded is kept in memory, so stores larger than memory can be read.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[ \t\n\r]*")
+    separator = re.compile(r"[ \t\n\r]*:[ \t\n\r]*")
+    with gzip.open(file_name, "rt", encoding="utf-8") as file:
+        buffer = file.read(chunk_size)
+        position = 0
+        while True:
+            position = whitespace.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] in "{,":
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "}":
+                return
+            try:
+                username, end = decoder.raw_decode(buffer, position)
+                colon = separator.match(buffer, end)
+                if colon is None:
+                    raise json.JSONDecodeError("Expecting ':' delimiter", buffer, end)
+                user, end = decoder.raw_decode(buffer, colon.end())
+            except json.JSONDecodeError:
+                # The next user does not fit in the buffer yet; read more, doubling for very large users
+                more = file.read(max(chunk_size, len(buffer) - position))
+                if not more:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+            yield username, user
+            position = end
+            if position >= chunk_size:
+                buffer = buffer[position:]
+                position = 0
+
+def save_user_stream(users, file_name=USER_DATA_FILE, compresslevel=6, encoded=False):
+    """Save (username, user) pairs to a compressed JSON store one user at a time; returns the count.
+
+    With encoded=True each user is already JSON text. Bulk tools write whole stores, so a lower
+    compression level than gzip's default of 9 is used.
+    """
+    file_descriptor, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name)))
+    count = 0
+    try:
+        with os.fdopen(file_descriptor, "wb") as raw_file, gzip.open(raw_file, "wt", compresslevel=compresslevel, encoding="utf-8") as file:
+            file.write("{")
+            for username, user in users:
+                file.write(f"{',' if count else ''}\n{json.dumps(username)}: {user if encoded else json.dumps(user)}")
+                count += 1
+            file.write("\n}\n")
+        replace_store(temp_file_name, file_name)
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
+    return count
+
+@profiling.unprofiled
 def input_password(prompt="Enter your password: "):
     """Custom password input function that displays asterisks."""
+    if msvcrt is None:
+        return getpass.getpass(prompt)
     print(prompt, end="", flush=True)
     password = ""
     while True:
@@ -53,9 +187,9 @@ def login():
     user_data = load_user_data()
     print("Welcome to the Flash Card Program!")
     while True:
-        username = input("Enter your username (or type 'new' to create an account): ").strip()
+        username = profiling.read_input("Enter your username (or type 'new' to create an account): ").strip()
         if username.lower() == "new":
-            new_username = input("Enter a new username: ").strip()
+            new_username = profiling.read_input("Enter a new username: ").strip()
             if new_username in user_data:
                 print("This username already exists. Please try again.")
             else:
@@ -72,6 +206,8 @@ def login():
             password = input_password("Enter your password: ").strip()
             stored_hashed_password = user_data[username]["password"]
             if verify_password(stored_hashed_password, password):
+                if passwords.upgrade_password(user_data[username], password):
+                    save_user_data(user_data)  # Replace an old or cheaper hash now that the password is known
                 print(f"Welcome back, {username}!")
                 return username, user_data
             else:
@@ -79,57 +215,54 @@ def login():
         else:
             print("Username not found. Please try again or type 'new' to create an account.")
 
-def flash_card_game(flash_cards):
-    """Play a flashcard game with shuffled terms and prioritize terms the user struggles with."""
+@profiling.profiled()
+@metrics.timed("flashcards_session_ms", "Length of study sessions", {"mode": "game"})
+def flash_card_game(flash_cards, user=None, on_answer=None):
+    """Play a flashcard game with shuffled terms and prioritize terms the user struggles with.
+
+    Returns the number of correct answers. Passing the user counts them toward the daily challenge,
+    and on_answer is called with every graded answer.
+    """
     print("Welcome to the Flash Card Game!")
     print("You will be shown a term, and you need to guess its definition.")
     print("Type 'exit' to quit the game.\n")
 
     # Prioritize terms the user struggles with
-    terms = sorted(
-        flash_cards["terms"].keys(),
-        key=lambda term: (
-            flash_cards["terms"][term]["total"] - flash_cards["terms"][term]["correct"]
-        ),
-        reverse=True,
-    )
+    session = engine.GameSession(flash_cards, user=user, on_answer=on_answer)
 
-    score = 0
-    total_questions = len(terms)
-
-    for term in terms:
-        print(f"Term: {term}")
-        user_answer = input("Your definition: ").strip()
+    while True:
+        card = session.next_card()
+        if card is None:
+            break
+        print(f"Term: {card['term']}")
+        user_answer = profiling.read_input("Your definition: ").strip()
 
         if user_answer.lower() == "exit":
             print("Thanks for playing! Returning to the main menu...\n")
             break
 
-        correct_answer = flash_cards["terms"][term]["definition"]
-        similarity = difflib.SequenceMatcher(None, user_answer.lower(), correct_answer.lower()).ratio()
-
-        flash_cards["terms"][term]["total"] += 1
-        flash_cards["stats"]["total"] += 1
-        if similarity > 0.7:
+        result = session.submit(user_answer)
+        if result["verdict"] == "correct":
             print("Correct!\n")
-            score += 1
-            flash_cards["terms"][term]["correct"] += 1
-            flash_cards["stats"]["correct"] += 1
-        elif similarity > 0.4:
-            print(f"Almost correct! Here's a hint: {correct_answer[:len(correct_answer)//2]}...\n")
+        elif result["verdict"] == "almost":
+            print(f"Almost correct! Here's a hint: {result['hint']}...\n")
         else:
-            print(f"Incorrect. The correct definition is: {correct_answer}\n")
-
-    if flash_cards["stats"]["total"] > 0:  # Avoid division by zero
-        flash_cards["stats"]["percentage"] = (flash_cards["stats"]["correct"] / flash_cards["stats"]["total"]) * 100
-    else:
-        flash_cards["stats"]["percentage"] = 0.0
+            print(f"Incorrect. The correct definition is: {result['correct_answer']}\n")
 
-    print(f"You answered {score} out of {total_questions} questions correctly!")
+    summary = session.finish()
+    print(f"You answered {summary['score']} out of {summary['total_questions']} questions correctly!")
     print("You've gone through all the flash cards. Great job!")
+    return summary["score"]
+
+def calculate_user_level(flashcard_sets, user=None):
+    """Calculate the user's level based on their overall performance.
+
+    A rated user's level comes from their skill rating, which accounts for how hard their terms are.
+    """
+    skill = rating.get_skill(user)
+    if skill is not None:
+        return rating.skill_level(skill)
 
-def calculate_user_level(flashcard_sets):
-    """Calculate the user's level based on their overall performance."""
     total_correct = 0
     total_attempts = 0
 
@@ -150,6 +283,7 @@ def calculate_user_level(flashcard_sets):
     else:
         return "Expert"
 
+@profiling.profiled()
 def track_progress(flashcard_set):
     """Display progress for a specific flashcard set."""
     total_terms = len(flashcard_set["terms"])
@@ -172,49 +306,262 @@ def track_progress(flashcard_set):
             print(f"- {term}: {data['correct']}/{data['total']} correct")
     print()
 
-def edit_flashcard_set(flashcard_set):
-    """Edit terms and definitions in a flashcard set."""
+def choose_name(name, names, name_index, kind="flashcard set"):
+    """Return the name if it exists; otherwise offer the closest matches and return the one picked."""
+    if name in names:
+        return name
+    suggestions = name_index.suggest(name)
+    if not suggestions:
+        return name
+    print(f"No {kind} named '{name}' found. Did you mean:")
+    for i, suggestion in enumerate(suggestions, 1):
+        print(f"{i}. {suggestion}")
+    pick = profiling.read_input(f"Enter a number to use that {kind}, or press Enter to cancel: ").strip()
+    if pick.isdigit() and 1 <= int(pick) <= len(suggestions):
+        return suggestions[int(pick) - 1]
+    return name
+
+@profiling.profiled()
+def edit_flashcard_set(flashcard_set, set_history=None):
+    """Edit terms and definitions in a flashcard set, saving a version before and after when `set_history` is given."""
+    term_index = fuzzy.NameIndex(flashcard_set["terms"])  # Suggests terms when one is mistyped
+    changed = set()  # Terms edited since the last version, so the next snapshot only visits them
+    if set_history is not None:
+        set_history.snapshot(flashcard_set, "Before editing")
     while True:
         print("\nEdit Flashcard Set:")
         print("1. Add a new term")
         print("2. Edit an existing term")
         print("3. Delete a term")
-        print("4. Return to the main menu")
-        choice = input("Enter your choice (1/2/3/4): ").strip()
+        print(f"4. Change grading mode (currently: {engine.GRADING_MODES[flashcard_set.get('grading', 'similarity')]})")
+        print("5. Bulk edit (paste or load term<TAB>definition lines)")
+        print("6. View versions, compare them or roll back")
+        print("7. Return to the main menu")
+        choice = profiling.read_input("Enter your choice (1/2/3/4/5/6/7): ").strip()
 
         if choice == "1":
-            term = input("Enter the new term: ").strip()
+            term = profiling.read_input("Enter the new term: ").strip()
             if term in flashcard_set["terms"]:
                 print(f"The term '{term}' already exists. Please choose a different term.")
             else:
-                definition = input(f"Enter the definition for '{term}': ").strip()
+                definition = profiling.read_input(f"Enter the definition for '{term}': ").strip()
                 flashcard_set["terms"][term] = {"definition": definition, "correct": 0, "total": 0}
+                term_index.add(term)
+                changed.add(term)
+                text_index.update_keyword_index(flashcard_set)
                 print(f"Added: {term} -> {definition}")
 
         elif choice == "2":
-            term = input("Enter the term you want to edit: ").strip()
+            term = choose_name(profiling.read_input("Enter the term you want to edit: ").strip(), flashcard_set["terms"], term_index, "term")
             if term in flashcard_set["terms"]:
-                new_definition = input(f"Enter the new definition for '{term}': ").strip()
+                new_definition = profiling.read_input(f"Enter the new definition for '{term}': ").strip()
                 flashcard_set["terms"][term]["definition"] = new_definition
+                changed.add(term)
+                text_index.update_keyword_index(flashcard_set)
                 print(f"Updated: {term} -> {new_definition}")
             else:
                 print(f"The term '{term}' does not exist in this flashcard set.")
 
         elif choice == "3":
-            term = input("Enter the term you want to delete: ").strip()
+            term = choose_name(profiling.read_input("Enter the term you want to delete: ").strip(), flashcard_set["terms"], term_index, "term")
             if term in flashcard_set["terms"]:
                 del flashcard_set["terms"][term]
+                term_index.remove(term)
+                changed.add(term)
+                text_index.update_keyword_index(flashcard_set)
                 print(f"The term '{term}' has been deleted.")
             else:
                 print(f"The term '{term}' does not exist in this flashcard set.")
 
         elif choice == "4":
+            print("Grading modes:")
+            print("1. Character similarity (best for short definitions)")
+            print("2. Keyword overlap (accepts reworded answers to long definitions)")
+            mode_choice = profiling.read_input("Enter your choice (1/2): ").strip()
+            if mode_choice in {"1", "2"}:
+                flashcard_set["grading"] = "similarity" if mode_choice == "1" else text_index.KEYWORD_GRADING
+                text_index.update_keyword_index(flashcard_set)
+                print(f"Grading mode set to: {engine.GRADING_MODES[flashcard_set['grading']]}")
+            else:
+                print("Invalid choice. The grading mode was not changed.")
+
+        elif choice == "5":
+            if set_history is not None:
+                set_history.snapshot(flashcard_set, "Edited", changed)
+                changed.clear()
+            touched = bulk_edit(flashcard_set)
+            if touched:
+                term_index = fuzzy.NameIndex(flashcard_set["terms"])
+                if set_history is not None:
+                    set_history.snapshot(flashcard_set, "Bulk edit", touched)
+
+        elif choice == "6":
+            if set_history is None:
+                print("Versions are not kept for this flashcard set.")
+            else:
+                set_history.snapshot(flashcard_set, "Edited", changed)
+                changed.clear()
+                if manage_versions(flashcard_set, set_history):
+                    term_index = fuzzy.NameIndex(flashcard_set["terms"])
+                    text_index.update_keyword_index(flashcard_set)
+
+        elif choice == "7":
+            if set_history is not None:
+                set_history.snapshot(flashcard_set, "Edited", changed)
             print("Returning to the main menu...\n")
             break
 
         else:
-            print("Invalid choice. Please enter 1, 2, 3, or 4.\n")
+            print("Invalid choice. Please enter 1, 2, 3, 4, 5, 6, or 7.\n")
+
+def parse_bulk_terms(text):
+    """Parse "term<TAB>definition" lines into ({term: definition}, problems); a repeated term keeps its last definition."""
+    new_terms = {}
+    problems = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        term, separator, definition = line.partition("\t")
+        term = term.strip()
+        if not separator or not term:
+            problems.append(f"Line {number}: expected a term, a tab and a definition")
+            continue
+        if term in new_terms:
+            problems.append(f"Line {number}: '{term}' appears again; this definition is used")
+        new_terms[term] = definition.strip()
+    return new_terms, problems
+
+def diff_bulk_terms(flashcard_set, new_terms):
+    """Compare parsed terms with a set in one pass over each.
+
+    Returns {"added": {term: definition}, "changed": {term: (old, new)}, "removed": [terms], "unchanged": count}.
+    """
+    terms = flashcard_set["terms"]
+    added = {}
+    changed = {}
+    unchanged = 0
+    for term, definition in new_terms.items():
+        term_data = terms.get(term)
+        if term_data is None:
+            added[term] = definition
+        elif term_data["definition"] != definition:
+            changed[term] = (term_data["definition"], definition)
+        else:
+            unchanged += 1
+    removed = [term for term in terms if term not in new_terms]
+    return {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+
+def apply_bulk_edit(flashcard_set, changes, remove=True):
+    """Apply a diff_bulk_terms() result to a set; returns the terms it touched.
+
+    Terms that stay keep their counters, so only added terms start from zero. Removed terms are
+    only deleted when `remove` is True.
+    """
+    terms = flashcard_set["terms"]
+    for term, definition in changes["added"].items():
+        terms[term] = {"definition": definition, "correct": 0, "total": 0}
+    for term, (_, definition) in changes["changed"].items():
+        terms[term]["definition"] = definition
+    touched = list(changes["added"]) + list(changes["changed"])
+    if remove:
+        for term in changes["removed"]:
+            del terms[term]
+        touched += changes["removed"]
+    if touched:
+        text_index.update_keyword_index(flashcard_set)
+    return touched
+
+def bulk_edit(flashcard_set):
+    """Add and update a set's terms from pasted or loaded "term<TAB>definition" lines after previewing the changes.
+
+    Terms missing from the lines are kept unless the user confirms removing them.
+    """
+    file_name = profiling.read_input("Enter a file of term<TAB>definition lines, or press Enter to paste them: ").strip()
+    if file_name:
+        try:
+            with open(file_name, "r", encoding="utf-8") as file:
+                text = file.read()
+        except OSError as error:
+            print(f"Could not read '{file_name}': {error.strerror}.")
+            return []
+    else:
+        print("Paste one term<TAB>definition per line, then enter an empty line:")
+        lines = []
+        while True:
+            line = profiling.read_input()
+            if not line.strip():
+                break
+            lines.append(line)
+        text = "\n".join(lines)
+
+    new_terms, problems = parse_bulk_terms(text)
+    for problem in problems[:10]:
+        print(problem)
+    if len(problems) > 10:
+        print(f"...and {len(problems) - 10} more problems.")
+    if not new_terms:
+        print("No terms found. The flashcard set was not changed.")
+        return []
+    changes = diff_bulk_terms(flashcard_set, new_terms)
+    print(f"\nAdded: {len(changes['added'])}, changed: {len(changes['changed'])}, removed: {len(changes['removed'])}, unchanged: {changes['unchanged']}")
+    for term, definition in list(changes["added"].items())[:10]:
+        print(f"+ {term} -> {definition}")
+    for term, (old_definition, new_definition) in list(changes["changed"].items())[:10]:
+        print(f"~ {term}: {old_definition} -> {new_definition}")
+    for term in changes["removed"][:10]:
+        print(f"- {term}")
+    if not (changes["added"] or changes["changed"] or changes["removed"]):
+        print("The flashcard set already matches these terms.")
+        return []
+    if profiling.read_input("Apply these changes? (y/n): ").strip().lower() != "y":
+        print("The flashcard set was not changed.")
+        return []
+    remove = bool(changes["removed"]) and profiling.read_input(f"Also remove the {len(changes['removed'])} terms that are not in the list? (y/n): ").strip().lower() == "y"
+    touched = apply_bulk_edit(flashcard_set, changes, remove)
+    print(f"Updated {len(touched)} terms.")
+    return touched
+
+def manage_versions(flashcard_set, set_history):
+    """List a set's saved versions, compare two of them, or roll the set back; returns True after a rollback."""
+    rolled_back = False
+    while True:
+        print("\nSaved Versions:")
+        for version in set_history.versions:
+            print(f"- Version {version['number']} ({version['time'].replace('T', ' ')}): {version['label']}, "
+                  f"{version['terms']} terms (+{version['added']} added, {version['changed']} changed, -{version['removed']} removed)")
+        print(f"Versions older than {versions.KEEP_DAYS} days are removed once there are more than {versions.KEEP_VERSIONS}.")
+        print("1. Compare two versions")
+        print("2. Roll back to a version")
+        print("3. Return to editing")
+        choice = profiling.read_input("Enter your choice (1/2/3): ").strip()
+
+        if choice in {"1", "2"}:
+            try:
+                number = int(profiling.read_input("Enter the version number: " if choice == "2" else "Enter the older version number: ").strip())
+                other = int(profiling.read_input("Enter the newer version number: ").strip()) if choice == "1" else None
+            except ValueError:
+                print("Please enter a version number.")
+                continue
+            if set_history.find(number) is None or (other is not None and set_history.find(other) is None):
+                print("No such version. Please pick one from the list.")
+                continue
+            if choice == "1":
+                summary = set_history.diff(number, other)
+            elif profiling.read_input(f"Roll back to version {number}? Your current terms are kept as a version (y/n): ").strip().lower() == "y":
+                summary = set_history.rollback(flashcard_set, number)
+                rolled_back = True
+            else:
+                continue
+            for kind, terms in summary.items():
+                print(f"{kind.capitalize()}: {len(terms)}" + (f" ({', '.join(terms[:10])}{', ...' if len(terms) > 10 else ''})" if terms else ""))
+
+        elif choice == "3":
+            return rolled_back
 
+        else:
+            print("Invalid choice. Please enter 1, 2, or 3.\n")
+
+@profiling.profiled()
 def manage_account(username, user_data):
     """Allow the user to view, edit, or delete their account."""
     while True:
@@ -223,11 +570,11 @@ def manage_account(username, user_data):
         print("2. Edit account details")
         print("3. Delete account")
         print("4. Return to the main menu")
-        choice = input("Enter your choice (1/2/3/4): ").strip()
+        choice = profiling.read_input("Enter your choice (1/2/3/4): ").strip()
 
         if choice == "1":
             flashcard_sets = user_data[username]["flashcard_sets"]
-            user_level = calculate_user_level(flashcard_sets)
+            user_level = calculate_user_level(flashcard_sets, user_data[username])
             achievements = calculate_achievements(flashcard_sets)
             print(f"\nAccount Details for '{username}':")
             print(f"- Level: {user_level}")
@@ -244,10 +591,10 @@ def manage_account(username, user_data):
             print("\nEdit Account Details:")
             print("1. Change username")
             print("2. Change password")
-            edit_choice = input("Enter your choice (1/2): ").strip()
+            edit_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if edit_choice == "1":
-                new_username = input("Enter your new username: ").strip()
+                new_username = profiling.read_input("Enter your new username: ").strip()
                 if new_username in user_data:
                     print("This username is already taken. Please try again.")
                 else:
@@ -266,9 +613,9 @@ def manage_account(username, user_data):
                 print("Invalid choice. Please enter 1 or 2.\n")
 
         elif choice == "3":
-            confirm = input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
+            confirm = profiling.read_input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
             if confirm == "yes":
-                final_confirm = input("Type your username to confirm account deletion: ").strip()
+                final_confirm = profiling.read_input("Type your username to confirm account deletion: ").strip()
                 if final_confirm == username:
                     del user_data[username]
                     save_user_data(user_data)
@@ -292,11 +639,11 @@ def manage_account(username, user_data):
         print("2. Edit account details")
         print("3. Delete account")
         print("4. Return to the main menu")
-        choice = input("Enter your choice (1/2/3/4): ").strip()
+        choice = profiling.read_input("Enter your choice (1/2/3/4): ").strip()
 
         if choice == "1":
             flashcard_sets = user_data[username]["flashcard_sets"]
-            user_level = calculate_user_level(flashcard_sets)
+            user_level = calculate_user_level(flashcard_sets, user_data[username])
             achievements = calculate_achievements(flashcard_sets)
             print(f"\nAccount Details for '{username}':")
             print(f"- Level: {user_level}")
@@ -313,10 +660,10 @@ def manage_account(username, user_data):
             print("\nEdit Account Details:")
             print("1. Change username")
             print("2. Change password")
-            edit_choice = input("Enter your choice (1/2): ").strip()
+            edit_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if edit_choice == "1":
-                new_username = input("Enter your new username: ").strip()
+                new_username = profiling.read_input("Enter your new username: ").strip()
                 if new_username in user_data:
                     print("This username is already taken. Please try again.")
                 else:
@@ -335,7 +682,7 @@ def manage_account(username, user_data):
                 print("Invalid choice. Please enter 1 or 2.\n")
 
         elif choice == "3":
-            confirm = input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
+            confirm = profiling.read_input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
             if confirm == "yes":
                 del user_data[username]
                 save_user_data(user_data)
@@ -383,7 +730,7 @@ def calculate_achievements(flashcard_sets):
         print("2. Edit account details")
         print("3. Delete account")
         print("4. Return to the main menu")
-        choice = input("Enter your choice (1/2/3/4): ").strip()
+        choice = profiling.read_input("Enter your choice (1/2/3/4): ").strip()
 
         if choice == "1":
             flashcard_sets = user_data[username]["flashcard_sets"]
@@ -400,10 +747,10 @@ def calculate_achievements(flashcard_sets):
             print("\nEdit Account Details:")
             print("1. Change username")
             print("2. Change password")
-            edit_choice = input("Enter your choice (1/2): ").strip()
+            edit_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if edit_choice == "1":
-                new_username = input("Enter your new username: ").strip()
+                new_username = profiling.read_input("Enter your new username: ").strip()
                 if new_username in user_data:
                     print("This username is already taken. Please try again.")
                 else:
@@ -422,7 +769,7 @@ def calculate_achievements(flashcard_sets):
                 print("Invalid choice. Please enter 1 or 2.\n")
 
         elif choice == "3":
-            confirm = input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
+            confirm = profiling.read_input("Are you sure you want to delete your account? This action cannot be undone (yes/no): ").strip().lower()
             if confirm == "yes":
                 del user_data[username]
                 save_user_data(user_data)
@@ -438,13 +785,14 @@ def calculate_achievements(flashcard_sets):
         else:
             print("Invalid choice. Please enter 1, 2, 3, or 4.\n")
 
+@profiling.profiled()
 def export_flashcard_set(flashcard_set, file_format="json"):
     """Export a flashcard set to a JSON or CSV file."""
     set_name = flashcard_set.get("name", "flashcard_set")
     if file_format.lower() == "json":
         file_name = f"{set_name}.json"
         with open(file_name, "w", encoding="utf-8") as file:
-            json.dump(flashcard_set, file, indent=4)
+            json.dump({key: value for key, value in flashcard_set.items() if key not in LOCAL_SET_KEYS}, file, indent=4)
         print(f"Flashcard set exported as {file_name}")
     elif file_format.lower() == "csv":
         file_name = f"{set_name}.csv"
@@ -457,11 +805,19 @@ def export_flashcard_set(flashcard_set, file_format="json"):
     else:
         print("Unsupported file format. Please choose 'json' or 'csv'.")
 
+def strip_local_keys(flashcard_set):
+    """Remove cached indexes and the version marker from an imported set; they are rebuilt for its new owner."""
+    for key in LOCAL_SET_KEYS:
+        flashcard_set.pop(key, None)
+    return flashcard_set
+
+@profiling.profiled()
 def import_flashcard_set(file_name):
     """Import a flashcard set from a JSON or CSV file."""
     if file_name.endswith(".json"):
         with open(file_name, "r", encoding="utf-8") as file:
             flashcard_set = json.load(file)
+        strip_local_keys(flashcard_set)
         print(f"Flashcard set imported from {file_name}")
         return flashcard_set
     elif file_name.endswith(".csv"):
@@ -480,111 +836,190 @@ def import_flashcard_set(file_name):
         print("Unsupported file format. Please provide a '.json' or '.csv' file.")
         return None
 
-def manage_flashcard_import_export(flashcard_sets):
-    """Allow users to import or export flashcard sets."""
+def check_imported_duplicates(imported_set, set_name, flashcard_sets):
+    """Report near-duplicate terms in an imported set and offer to merge them."""
+    try:
+        import dedup  # Needs NumPy; imported here because dedup itself imports this module
+    except ImportError:
+        print("Install NumPy to check imported sets for near-duplicate terms.")
+        return
+    report = dedup.dedup_report(imported_set, flashcard_sets, set_name)
+    duplicates = [row for row in report if row["action"] == "merge" and row["source"] == "import"]
+    if not duplicates:
+        return
+    print(f"\nFound {len(duplicates)} near-duplicate terms:")
+    for row in duplicates[:10]:
+        print(f"- '{row['term']}' looks like '{row['kept_term']}' in '{row['kept_set']}' ({row['similarity']:.0%} similar)")
+    if len(duplicates) > 10:
+        print(f"... and {len(duplicates) - 10} more.")
+    if profiling.read_input("Export the full report? (y/n): ").strip().lower() == "y":
+        file_name = f"{set_name}_duplicates.csv"
+        dedup.write_report(report, file_name)
+        print(f"Duplicate report exported as {file_name}")
+    if profiling.read_input("Merge the duplicates (keep one copy of each term)? (y/n): ").strip().lower() == "y":
+        print(f"Merged {dedup.merge_duplicates(imported_set, report)} duplicate terms.")
+
+def manage_flashcard_import_export(flashcard_sets, set_index=None, category_index=None, username=None):
+    """Allow users to import or export flashcard sets; imports start a version history when `username` is given."""
+    if set_index is None:
+        set_index = fuzzy.NameIndex(flashcard_sets)
+    if category_index is None:
+        category_index = CategoryIndex(flashcard_sets)
     while True:
         print("\nImport/Export Flashcard Sets:")
         print("1. Export a flashcard set")
         print("2. Import a flashcard set")
-        print("3. Return to the main menu")
-        choice = input("Enter your choice (1/2/3): ").strip()
+        print("3. Generate printable exam variants from a flashcard set")
+        print("4. Return to the main menu")
+        choice = profiling.read_input("Enter your choice (1/2/3/4): ").strip()
 
         if choice == "1":
-            set_name = input("Enter the name of the flashcard set to export: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set to export: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                file_format = input("Enter the file format (json/csv): ").strip().lower()
+                file_format = profiling.read_input("Enter the file format (json/csv): ").strip().lower()
                 export_flashcard_set(flashcard_sets[set_name], file_format)
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "2":
-            file_name = input("Enter the file name to import (with extension): ").strip()
+            file_name = profiling.read_input("Enter the file name to import (with extension): ").strip()
             imported_set = import_flashcard_set(file_name)
             if imported_set:
-                set_name = input("Enter a name for the imported flashcard set: ").strip()
+                set_name = profiling.read_input("Enter a name for the imported flashcard set: ").strip()
                 if set_name in flashcard_sets:
                     print(f"A flashcard set named '{set_name}' already exists. Please choose a different name.")
                 else:
+                    check_imported_duplicates(imported_set, set_name, flashcard_sets)
+                    text_index.update_keyword_index(imported_set)
                     flashcard_sets[set_name] = imported_set
+                    if username is not None:
+                        versions.SetHistory(username, set_name).snapshot(imported_set, "Imported")
+                    set_index.add(set_name)
+                    category_index.add_set(set_name, imported_set)
                     print(f"Flashcard set '{set_name}' imported successfully!")
 
         elif choice == "3":
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set to build exams from: ").strip(), flashcard_sets, set_index)
+            if set_name in flashcard_sets:
+                generate_exam_variants(flashcard_sets[set_name], set_name)
+            else:
+                print(f"No flashcard set named '{set_name}' found. Please try again.")
+
+        elif choice == "4":
             print("Returning to the main menu...\n")
             break
 
         else:
-            print("Invalid choice. Please enter 1, 2, or 3.\n")
-
-def generate_daily_challenge():
-    """Generate a daily challenge for the user."""
-    today = datetime.date.today()
-    challenge = {
-        "date": today.isoformat(),
-        "goal": 10,  # Example goal: Answer 10 questions correctly
-        "progress": 0,  # Track progress toward the goal
-        "completed": False
-    }
-    return challenge
-
-def update_daily_challenge(challenge, correct_answers):
-    """Update the progress of the daily challenge."""
-    if correct_answers is None:  # Ensure correct_answers is not None
-        correct_answers = 0
+            print("Invalid choice. Please enter 1, 2, 3, or 4.\n")
 
+def generate_exam_variants(flashcard_set, set_name):
+    """Ask for the exam size and write the variants and answer keys as CSV and HTML files."""
+    try:
+        variants = int(profiling.read_input("How many different exams (variants)? ").strip())
+        questions = int(profiling.read_input(f"How many questions per exam (at most {len(flashcard_set['terms'])})? ").strip())
+        seed_text = profiling.read_input("Enter a seed to reproduce earlier exams, or press Enter for a new one: ").strip()
+        seed = int(seed_text) if seed_text else random.randrange(1_000_000)
+    except ValueError:
+        print("Please enter whole numbers.")
+        return
+    if variants < 1 or questions < 1:
+        print("Please ask for at least one exam with at least one question.")
+        return
+    output_dir = f"{set_name}_exams"
+    try:
+        files, _ = exams.generate_exams(flashcard_set, variants, questions, output_dir, seed, title=set_name)
+    except ValueError as error:
+        print(error)
+        return
+    print(f"Wrote {variants} exams with seed {seed}:")
+    for file_name in files:
+        print(f"- {file_name}")
+
+def generate_daily_challenge(user):
+    """Return today's daily challenge for the user from their saved daily counters."""
+    return daily_challenge.get_challenge(user)
+
+def update_daily_challenge(challenge, user):
+    """Report progress toward the daily challenge after a study session."""
     if challenge["completed"]:
         print("Today's challenge is already completed!")
-        return challenge
+        return generate_daily_challenge(user)
 
-    challenge["progress"] += correct_answers
-    if challenge["progress"] >= challenge["goal"]:
-        challenge["completed"] = True
+    challenge = generate_daily_challenge(user)
+    if challenge["completed"]:
         print(f"Congratulations! You completed today's challenge: Answer {challenge['goal']} questions correctly!")
+        print(f"Current streak: {challenge['streak']} day(s)")
     else:
         print(f"Daily Challenge Progress: {challenge['progress']}/{challenge['goal']} correct answers.")
     return challenge
 
-def display_daily_challenge(challenge):
-    """Display the current daily challenge."""
+def display_daily_challenge(challenge, user):
+    """Display the current daily challenge, streak and recent history."""
     print("\nDaily Challenge:")
     print(f"- Goal: Answer {challenge['goal']} questions correctly")
     print(f"- Progress: {challenge['progress']}/{challenge['goal']}")
-    print(f"- Completed: {'Yes' if challenge['completed'] else 'No'}\n")
+    print(f"- Completed: {'Yes' if challenge['completed'] else 'No'}")
+    print(f"- Current streak: {challenge['streak']} day(s)")
+    print("- Last 7 days:")
+    for day, count in daily_challenge.get_history(user, 7):
+        print(f"  - {day.isoformat()}: {count} correct{' (goal reached)' if count >= challenge['goal'] else ''}")
+    print()
 
-def calculate_leaderboard(user_data):
-    """Calculate and display a leaderboard ranking users by their levels and scores."""
+@metrics.timed("flashcards_leaderboard_build_ms", "Time spent building the leaderboard")
+def build_leaderboard(user_data):
+    """Build a leaderboard ranking users by their levels and scores."""
     leaderboard = []
 
     for username, data in user_data.items():
         flashcard_sets = data.get("flashcard_sets", {})
         total_correct = sum(flashcard_sets[set_name]["stats"]["correct"] for set_name in flashcard_sets)
         total_attempts = sum(flashcard_sets[set_name]["stats"]["total"] for set_name in flashcard_sets)
-        level = calculate_user_level(flashcard_sets)
+        level = calculate_user_level(flashcard_sets, data)
         accuracy = (total_correct / total_attempts * 100) if total_attempts > 0 else 0
+        skill = rating.estimate_skill(data, total_correct, total_attempts)
         leaderboard.append({
             "username": username,
             "level": level,
+            "skill": round(skill, 2) if skill is not None else None,
             "total_correct": total_correct,
             "total_attempts": total_attempts,
             "accuracy": accuracy
         })
 
-    # Sort leaderboard by level and total_correct in descending order
-    leaderboard.sort(key=lambda x: (x["level"], x["total_correct"]), reverse=True)
+    leaderboard.sort(key=leaderboard_key, reverse=True)
+    return leaderboard
+
+def leaderboard_key(entry):
+    """Sort key for leaderboard entries: skill (users with no answers last), then correct answers."""
+    return (entry["skill"] is not None, entry["skill"] or 0.0, entry["total_correct"])
+
+@profiling.profiled()
+def calculate_leaderboard(user_data):
+    """Calculate and display a leaderboard ranking users by their levels and scores."""
+    leaderboard = build_leaderboard(user_data)
 
     print("\nLeaderboard:")
-    print(f"{'Rank':<5} {'Username':<15} {'Level':<12} {'Correct':<10} {'Attempts':<10} {'Accuracy (%)':<12}")
+    print(f"{'Rank':<5} {'Username':<15} {'Level':<12} {'Skill':<7} {'Correct':<10} {'Attempts':<10} {'Accuracy (%)':<12}")
     for rank, entry in enumerate(leaderboard, start=1):
-        print(f"{rank:<5} {entry['username']:<15} {entry['level']:<12} {entry['total_correct']:<10} {entry['total_attempts']:<10} {entry['accuracy']:<12.2f}")
+        skill = f"{entry['skill']:.2f}" if entry["skill"] is not None else "-"
+        print(f"{rank:<5} {entry['username']:<15} {entry['level']:<12} {skill:<7} {entry['total_correct']:<10} {entry['total_attempts']:<10} {entry['accuracy']:<12.2f}")
     print()
     
-def search_flashcard_set(flashcard_set):
-    """Search for terms or definitions in a flashcard set."""
-    query = input("Enter a term or definition to search for: ").strip().lower()
+def search_terms(flashcard_set, query):
+    """Return (term, definition) pairs whose term or definition contains the query."""
+    query = query.lower()
     results = []
 
     for term, data in flashcard_set["terms"].items():
         if query in term.lower() or query in data["definition"].lower():
             results.append((term, data["definition"]))
+    return results
+
+@profiling.profiled()
+def search_flashcard_set(flashcard_set):
+    """Search for terms or definitions in a flashcard set."""
+    query = profiling.read_input("Enter a term or definition to search for: ").strip().lower()
+    results = search_terms(flashcard_set, query)
 
     if results:
         print("\nSearch Results:")
@@ -593,120 +1028,148 @@ def search_flashcard_set(flashcard_set):
     else:
         print("No matching terms or definitions found.")
 
-def revision_mode(flash_cards):
+@profiling.profiled()
+@metrics.timed("flashcards_session_ms", "Length of study sessions", {"mode": "review"})
+def review_mode(flashcard_sets, user=None, on_answer=None):
+    """Review the weakest or most overdue cards from all flashcard sets in one session.
+
+    Returns the names of the sets whose cards were answered.
+    """
+    print("Welcome to Review Mode!")
+    print("You will be shown terms from all of your flashcard sets, and you need to guess their definitions.")
+    order = "due" if profiling.read_input("Review the most missed cards (1) or the most overdue cards (2)? ").strip() == "2" else "misses"
+    length = profiling.read_input(f"How many cards? (default {engine.REVIEW_LENGTH}): ").strip()
+    length = int(length) if length.isdigit() and int(length) > 0 else engine.REVIEW_LENGTH
+    print("Type 'exit' to quit review mode.\n")
+
+    session = engine.ReviewSession(flashcard_sets, length, order, user=user, on_answer=on_answer)
+
+    while True:
+        card = session.next_card()
+        if card is None:
+            break
+        print(f"Term: {card['term']} (from '{card['set']}')")
+        user_answer = profiling.read_input("Your definition: ").strip()
+
+        if user_answer.lower() == "exit":
+            print("Exiting Review Mode...\n")
+            break
+
+        result = session.submit(user_answer)
+        if result["verdict"] == "correct":
+            print("Correct!\n")
+        elif result["verdict"] == "almost":
+            print(f"Almost correct! Here's a hint: {result['hint']}...\n")
+        else:
+            print(f"Incorrect. The correct definition is: {result['correct_answer']}\n")
+
+    summary = session.finish()
+    print(f"You answered {summary['score']} out of {summary['answered']} review questions correctly!")
+    return session.reviewed_sets
+
+@profiling.profiled()
+def revision_mode(flash_cards, on_answer=None):
     """Allow users to review flashcards without affecting their stats."""
     print("Welcome to Revision Mode!")
     print("You will be shown a term, and you can review its definition.")
     print("Type 'exit' to quit revision mode.\n")
 
-    terms = list(flash_cards["terms"].keys())
-    random.shuffle(terms)
+    session = engine.RevisionSession(flash_cards, on_answer=on_answer)
 
-    for term in terms:
-        print(f"Term: {term}")
-        user_input = input("Press Enter to reveal the definition or type 'exit' to quit: ").strip()
+    while True:
+        card = session.next_card()
+        if card is None:
+            break
+        print(f"Term: {card['term']}")
+        user_input = profiling.read_input("Press Enter to reveal the definition or type 'exit' to quit: ").strip()
 
         if user_input.lower() == "exit":
             print("Exiting Revision Mode...\n")
             break
 
-        print(f"Definition: {flash_cards['terms'][term]['definition']}\n")
+        result = session.submit(user_input)
+        print(f"Definition: {result['correct_answer']}\n")
+    session.finish()
 
-def quiz_mode(flash_cards):
+@profiling.profiled()
+@metrics.timed("flashcards_session_ms", "Length of study sessions", {"mode": "quiz"})
+def quiz_mode(flash_cards, user=None, on_answer=None):
     """Allow users to take a multiple-choice quiz based on their flashcards."""
     print("Welcome to Quiz Mode!")
     print("You will be shown a term and four possible definitions.")
     print("Type the number corresponding to your answer or 'exit' to quit the quiz.\n")
 
-    terms = list(flash_cards["terms"].keys())
-    random.shuffle(terms)
+    session = engine.QuizSession(flash_cards, user=user, on_answer=on_answer)
 
-    score = 0
-    total_questions = len(terms)
-
-    for term in terms:
-        print(f"Term: {term}")
-        correct_answer = flash_cards["terms"][term]["definition"]
-
-        # Generate multiple-choice options
-        options = [correct_answer]
-        while len(options) < 4:
-            random_term = random.choice(terms)
-            random_definition = flash_cards["terms"][random_term]["definition"]
-            if random_definition not in options:
-                options.append(random_definition)
-        random.shuffle(options)
+    while True:
+        card = session.next_card()
+        if card is None:
+            break
+        print(f"Term: {card['term']}")
 
         # Display options
-        for i, option in enumerate(options, 1):
+        for i, option in enumerate(card["options"], 1):
             print(f"{i}. {option}")
 
         # Get user input
-        user_input = input("Your choice (1/2/3/4 or 'exit'): ").strip()
+        user_input = profiling.read_input("Your choice (1/2/3/4 or 'exit'): ").strip()
         if user_input.lower() == "exit":
             print("Exiting Quiz Mode...\n")
             break
 
         # Check the answer
-        if user_input.isdigit() and 1 <= int(user_input) <= 4:
-            selected_option = options[int(user_input) - 1]
-            if selected_option == correct_answer:
-                print("Correct!\n")
-                score += 1
-            else:
-                print(f"Incorrect. The correct answer was: {correct_answer}\n")
+        result = session.submit(user_input)
+        if result["verdict"] == "correct":
+            print("Correct!\n")
+        elif result["verdict"] == "incorrect":
+            print(f"Incorrect. The correct answer was: {result['correct_answer']}\n")
         else:
             print("Invalid input. Please enter a number between 1 and 4 or 'exit'.\n")
 
-    print(f"Quiz completed! You answered {score} out of {total_questions} questions correctly.\n")
+    summary = session.finish()
+    print(f"Quiz completed! You answered {summary['score']} out of {summary['total_questions']} questions correctly.\n")
+    return summary["score"]
 
-def fill_in_the_blank_mode(flash_cards):
+@profiling.profiled()
+@metrics.timed("flashcards_session_ms", "Length of study sessions", {"mode": "fill_in_the_blank"})
+def fill_in_the_blank_mode(flash_cards, user=None, on_answer=None):
     """Allow users to guess missing words in definitions."""
     print("Welcome to Fill in the Blank Mode!")
     print("You will be shown a term and a definition with missing words, and you need to fill in the blanks.")
     print("Type 'exit' to quit this mode.\n")
 
-    terms = list(flash_cards["terms"].keys())
-    random.shuffle(terms)
-
-    score = 0
-    total_questions = len(terms)
+    session = engine.FillInTheBlankSession(flash_cards, user=user, on_answer=on_answer)
 
-    for term in terms:
-        definition = flash_cards["terms"][term]["definition"]
-        words = definition.split()
-        if len(words) < 3:
-            # Skip definitions that are too short to create blanks
-            continue
-
-        # Randomly select a word to blank out
-        blank_index = random.randint(0, len(words) - 1)
-        blanked_definition = words[:]
-        blanked_definition[blank_index] = "____"
-        print(f"Term: {term}")
-        print(f"Definition: {' '.join(blanked_definition)}")
+    while True:
+        card = session.next_card()
+        if card is None:
+            break
+        print(f"Term: {card['term']}")
+        print(f"Definition: {card['prompt']}")
 
-        user_input = input("Fill in the blank: ").strip()
+        user_input = profiling.read_input("Fill in the blank: ").strip()
         if user_input.lower() == "exit":
             print("Exiting Fill in the Blank Mode...\n")
             break
 
-        correct_word = words[blank_index]
-        if user_input.lower() == correct_word.lower():
+        result = session.submit(user_input)
+        if result["correct"]:
             print("Correct!\n")
-            score += 1
         else:
-            print(f"Incorrect. The correct word was: {correct_word}\n")
+            print(f"Incorrect. The correct word was: {result['correct_answer']}\n")
 
-    print(f"Fill in the Blank Mode completed! You answered {score} out of {total_questions} questions correctly.\n")
+    summary = session.finish()
+    print(f"Fill in the Blank Mode completed! You answered {summary['score']} out of {summary['total_questions']} questions correctly.\n")
+    return summary["score"]
     
 def main_menu():
     """Main menu for the flashcard program."""
     username, user_data = login()
     flashcard_sets = user_data[username]["flashcard_sets"]
 
-    # Generate a daily challenge when the program starts
-    daily_challenge = generate_daily_challenge()
+    # Load today's daily challenge when the program starts
+    challenge = generate_daily_challenge(user_data[username])
+    answer_log = history.AnswerLog()  # Buffered answers are written out when the program exits
 
     if "Python (default)" not in flashcard_sets:
         flashcard_sets["Python (default)"] = {
@@ -721,8 +1184,11 @@ def main_menu():
         }
         save_user_data(user_data)  # Save the default flashcard set
 
+    set_index = fuzzy.NameIndex(flashcard_sets)  # Suggests set names when one is mistyped
+    category_index = CategoryIndex(flashcard_sets)  # Sets and totals per category
+
     while True:
-        user_level = calculate_user_level(flashcard_sets)
+        user_level = calculate_user_level(flashcard_sets, user_data[username])
         print(f"\nMain Menu (Logged in as: {username} - Level: {user_level}):")
         print("1. Create a new flashcard set")
         print("2. View available flashcard sets")
@@ -738,41 +1204,44 @@ def main_menu():
         print("12. Revision Mode")
         print("13. Quiz Mode")
         print("14. Fill in the Blank Mode")  # Added option for Fill in the Blank Mode
-        print("15. Save and Exit")
-        choice = input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11/12/13/14/15): ").strip()
+        print("15. Review Mode (weakest cards from all sets)")
+        print("16. Save and Exit")
+        choice = profiling.read_input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11/12/13/14/15/16): ").strip()
 
         if choice == "1":
-            set_name = input("Enter a name for your new flashcard set: ").strip()
+            set_name = profiling.read_input("Enter a name for your new flashcard set: ").strip()
             if set_name in flashcard_sets:
                 print(f"A flashcard set named '{set_name}' already exists. Please choose a different name.")
             else:
-                category = input("Enter a category for this flashcard set (e.g., Math, Science, History): ").strip()
+                category = profiling.read_input("Enter a category for this flashcard set (e.g., Math, Science, History): ").strip()
                 flashcard_sets[set_name] = {
                     "category": category,
                     "terms": {},
                     "stats": {"correct": 0, "total": 0, "percentage": 0.0}
                 }
+                set_index.add(set_name)
                 save_user_data(user_data)  # Save after creating a new flashcard set
                 print(f"Flashcard set '{set_name}' created successfully under the category '{category}'!")
 
                 while True:
-                    term = input("Enter a term (or type 'done' to finish adding terms): ").strip()
+                    term = profiling.read_input("Enter a term (or type 'done' to finish adding terms): ").strip()
                     if term.lower() == "done":
                         print(f"Finished adding terms to '{set_name}'.")
                         break
                     if term in flashcard_sets[set_name]["terms"]:
                         print(f"The term '{term}' already exists. Please enter a different term.")
                     else:
-                        definition = input(f"Enter the definition for '{term}': ").strip()
+                        definition = profiling.read_input(f"Enter the definition for '{term}': ").strip()
                         flashcard_sets[set_name]["terms"][term] = {"definition": definition, "correct": 0, "total": 0}
                         save_user_data(user_data)  # Save after adding a term
                         print(f"Added: {term} -> {definition}")
+                category_index.add_set(set_name, flashcard_sets[set_name])
 
         elif choice == "2":
             print("\nView Flashcard Sets:")
             print("1. View all flashcard sets")
             print("2. View flashcard sets by category")
-            view_choice = input("Enter your choice (1/2): ").strip()
+            view_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if view_choice == "1":
                 print("\nAvailable Flashcard Sets:")
@@ -785,46 +1254,52 @@ def main_menu():
                 print()
 
             elif view_choice == "2":
-                categories = set(flash_cards.get("category", "Uncategorized") for flash_cards in flashcard_sets.values())
                 print("\nAvailable Categories:")
-                for category in categories:
-                    print(f"- {category}")
-                selected_category = input("Enter the category you want to view: ").strip()
+                for category in category_index.names():
+                    category_stats = category_index.stats(category)
+                    print(f"- {category} ({category_stats['sets']} sets, {category_stats['terms']} terms)")
+                selected_category = profiling.read_input("Enter the category you want to view: ").strip()
 
+                # Categories match in any case, and only the sets in the category are visited
+                selected_category = category_index.find(selected_category) or selected_category
                 print(f"\nFlashcard Sets in Category '{selected_category}':")
-                for set_name, flash_cards in flashcard_sets.items():
-                    if flash_cards.get("category", "Uncategorized") == selected_category:
-                        correct = flash_cards["stats"]["correct"]
-                        total = flash_cards["stats"]["total"]
-                        percentage = flash_cards["stats"]["percentage"]
-                        print(f"- {set_name}: {correct}/{total} correct ({percentage:.2f}%)")
+                for set_name in category_index.sets_in(selected_category):
+                    flash_cards = flashcard_sets[set_name]
+                    correct = flash_cards["stats"]["correct"]
+                    total = flash_cards["stats"]["total"]
+                    percentage = flash_cards["stats"]["percentage"]
+                    print(f"- {set_name}: {correct}/{total} correct ({percentage:.2f}%)")
                 print()
             else:
                 print("Invalid choice. Returning to the main menu.\n")
 
         elif choice == "3":
-            set_name = input("Enter the name of the flashcard set you want to play with: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to play with: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                score = flash_card_game(flashcard_sets[set_name])  # Capture the score from the game
-                daily_challenge = update_daily_challenge(daily_challenge, score)  # Update daily challenge progress
+                flash_card_game(flashcard_sets[set_name], user_data[username], answer_log.recorder(username, set_name, "game"))  # Correct answers count toward the daily challenge
+                category_index.refresh_set(set_name, flashcard_sets[set_name])
+                challenge = update_daily_challenge(challenge, user_data[username])  # Report daily challenge progress
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "4":
-            set_name = input("Enter the name of the flashcard set you want to edit: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to edit: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                edit_flashcard_set(flashcard_sets[set_name])
+                edit_flashcard_set(flashcard_sets[set_name], versions.SetHistory(username, set_name))
+                category_index.refresh_set(set_name, flashcard_sets[set_name])
                 save_user_data(user_data)  # Save after editing a flashcard set
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "5":
-            set_name = input("Enter the name of the flashcard set you want to delete: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to delete: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
                 if set_name == "Python (default)":
                     print("The default flashcard set cannot be deleted.")
                 else:
                     del flashcard_sets[set_name]
+                    set_index.remove(set_name)
+                    category_index.remove_set(set_name)
                     save_user_data(user_data)  # Save after deleting a flashcard set
                     print(f"Flashcard set '{set_name}' deleted successfully!")
             else:
@@ -837,7 +1312,8 @@ def main_menu():
             print("\nView Progress:")
             print("1. View progress for all flashcard sets")
             print("2. View progress for a specific flashcard set")
-            progress_choice = input("Enter your choice (1/2): ").strip()
+            print("3. View progress for a category")
+            progress_choice = profiling.read_input("Enter your choice (1/2/3): ").strip()
 
             if progress_choice == "1":
                 print("\nProgress for All Flashcard Sets:")
@@ -846,50 +1322,72 @@ def main_menu():
                     track_progress(flash_cards)
 
             elif progress_choice == "2":
-                set_name = input("Enter the name of the flashcard set: ").strip()
+                set_name = choose_name(profiling.read_input("Enter the name of the flashcard set: ").strip(), flashcard_sets, set_index)
                 if set_name in flashcard_sets:
                     print(f"\nProgress for Flashcard Set: {set_name}")
                     track_progress(flashcard_sets[set_name])
                 else:
                     print(f"No flashcard set named '{set_name}' found. Please try again.")
+
+            elif progress_choice == "3":
+                category_stats = category_index.stats(profiling.read_input("Enter the category: ").strip())
+                if category_stats["sets"]:
+                    print(f"\nProgress for Category: {category_stats['name']}")
+                    print(f"- Flashcard sets: {category_stats['sets']}")
+                    print(f"- Total terms: {category_stats['terms']}")
+                    print(f"- Total attempts: {category_stats['total']}")
+                    print(f"- Correct answers: {category_stats['correct']}")
+                    print(f"- Accuracy: {category_stats['percentage']:.2f}%\n")
+                else:
+                    print(f"No category named '{category_stats['name']}' found. Please try again.")
             else:
                 print("Invalid choice. Returning to the main menu.\n")
 
         elif choice == "8":
-            manage_flashcard_import_export(flashcard_sets)
+            manage_flashcard_import_export(flashcard_sets, set_index, category_index, username)
 
         elif choice == "9":
-            display_daily_challenge(daily_challenge)  # Display the daily challenge
+            challenge = generate_daily_challenge(user_data[username])
+            display_daily_challenge(challenge, user_data[username])  # Display the daily challenge
 
         elif choice == "10":
             calculate_leaderboard(load_user_data())  # Display the leaderboard
 
         elif choice == "11":
-            set_name = input("Enter the name of the flashcard set you want to search in: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to search in: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
                 search_flashcard_set(flashcard_sets[set_name])  # Call the search function
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "12":
-            set_name = input("Enter the name of the flashcard set you want to review: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to review: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                revision_mode(flashcard_sets[set_name])  # Call the revision mode function
+                revision_mode(flashcard_sets[set_name], answer_log.recorder(username, set_name, "revision"))  # Call the revision mode function
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
         elif choice == "13":
-            set_name = input("Enter the name of the flashcard set you want to quiz with: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to quiz with: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                quiz_mode(flashcard_sets[set_name])  # Call the quiz mode function
+                quiz_mode(flashcard_sets[set_name], user_data[username], answer_log.recorder(username, set_name, "quiz"))  # Call the quiz mode function
+                category_index.refresh_set(set_name, flashcard_sets[set_name])
+                challenge = update_daily_challenge(challenge, user_data[username])
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
         elif choice == "14":
-            set_name = input("Enter the name of the flashcard set you want to use for Fill in the Blank Mode: ").strip()
+            set_name = choose_name(profiling.read_input("Enter the name of the flashcard set you want to use for Fill in the Blank Mode: ").strip(), flashcard_sets, set_index)
             if set_name in flashcard_sets:
-                fill_in_the_blank_mode(flashcard_sets[set_name])  # Call the Fill in the Blank Mode function
+                fill_in_the_blank_mode(flashcard_sets[set_name], user_data[username], answer_log.recorder(username, set_name, "fill_in_the_blank"))  # Call the Fill in the Blank Mode function
+                category_index.refresh_set(set_name, flashcard_sets[set_name])
+                challenge = update_daily_challenge(challenge, user_data[username])
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
         elif choice == "15":
+            reviewed_sets = review_mode(flashcard_sets, user_data[username], answer_log.recorder(username, None, "review"))
+            for set_name in reviewed_sets:
+                category_index.refresh_set(set_name, flashcard_sets[set_name])
+            challenge = update_daily_challenge(challenge, user_data[username])
+        elif choice == "16":
             user_data[username]["flashcard_sets"] = flashcard_sets
             save_user_data(user_data)
             print("Your progress has been saved. Goodbye!")
@@ -931,14 +1429,14 @@ def main_menu():
         print("9. View Daily Challenge")
         print("10. View Leaderboard")
         print("11. Save and Exit")
-        choice = input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11): ").strip()
+        choice = profiling.read_input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11): ").strip()
 
         if choice == "1":
-            set_name = input("Enter a name for your new flashcard set: ").strip()
+            set_name = profiling.read_input("Enter a name for your new flashcard set: ").strip()
             if set_name in flashcard_sets:
                 print(f"A flashcard set named '{set_name}' already exists. Please choose a different name.")
             else:
-                category = input("Enter a category for this flashcard set (e.g., Math, Science, History): ").strip()
+                category = profiling.read_input("Enter a category for this flashcard set (e.g., Math, Science, History): ").strip()
                 flashcard_sets[set_name] = {
                     "category": category,
                     "terms": {},
@@ -948,14 +1446,14 @@ def main_menu():
                 print(f"Flashcard set '{set_name}' created successfully under the category '{category}'!")
 
                 while True:
-                    term = input("Enter a term (or type 'done' to finish adding terms): ").strip()
+                    term = profiling.read_input("Enter a term (or type 'done' to finish adding terms): ").strip()
                     if term.lower() == "done":
                         print(f"Finished adding terms to '{set_name}'.")
                         break
                     if term in flashcard_sets[set_name]["terms"]:
                         print(f"The term '{term}' already exists. Please enter a different term.")
                     else:
-                        definition = input(f"Enter the definition for '{term}': ").strip()
+                        definition = profiling.read_input(f"Enter the definition for '{term}': ").strip()
                         flashcard_sets[set_name]["terms"][term] = {"definition": definition, "correct": 0, "total": 0}
                         save_user_data(user_data)  # Save after adding a term
                         print(f"Added: {term} -> {definition}")
@@ -964,7 +1462,7 @@ def main_menu():
             print("\nView Flashcard Sets:")
             print("1. View all flashcard sets")
             print("2. View flashcard sets by category")
-            view_choice = input("Enter your choice (1/2): ").strip()
+            view_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if view_choice == "1":
                 print("\nAvailable Flashcard Sets:")
@@ -981,7 +1479,7 @@ def main_menu():
                 print("\nAvailable Categories:")
                 for category in categories:
                     print(f"- {category}")
-                selected_category = input("Enter the category you want to view: ").strip()
+                selected_category = profiling.read_input("Enter the category you want to view: ").strip()
 
                 print(f"\nFlashcard Sets in Category '{selected_category}':")
                 for set_name, flash_cards in flashcard_sets.items():
@@ -995,7 +1493,7 @@ def main_menu():
                 print("Invalid choice. Returning to the main menu.\n")
 
         elif choice == "3":
-            set_name = input("Enter the name of the flashcard set you want to play with: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to play with: ").strip()
             if set_name in flashcard_sets:
                 score = flash_card_game(flashcard_sets[set_name])  # Capture the score from the game
                 daily_challenge = update_daily_challenge(daily_challenge, score)  # Update daily challenge progress
@@ -1003,7 +1501,7 @@ def main_menu():
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "4":
-            set_name = input("Enter the name of the flashcard set you want to edit: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to edit: ").strip()
             if set_name in flashcard_sets:
                 edit_flashcard_set(flashcard_sets[set_name])
                 save_user_data(user_data)  # Save after editing a flashcard set
@@ -1011,7 +1509,7 @@ def main_menu():
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "5":
-            set_name = input("Enter the name of the flashcard set you want to delete: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to delete: ").strip()
             if set_name in flashcard_sets:
                 if set_name == "Python (default)":
                     print("The default flashcard set cannot be deleted.")
@@ -1029,7 +1527,7 @@ def main_menu():
             print("\nView Progress:")
             print("1. View progress for all flashcard sets")
             print("2. View progress for a specific flashcard set")
-            progress_choice = input("Enter your choice (1/2): ").strip()
+            progress_choice = profiling.read_input("Enter your choice (1/2): ").strip()
 
             if progress_choice == "1":
                 print("\nProgress for All Flashcard Sets:")
@@ -1038,7 +1536,7 @@ def main_menu():
                     track_progress(flash_cards)
 
             elif progress_choice == "2":
-                set_name = input("Enter the name of the flashcard set: ").strip()
+                set_name = profiling.read_input("Enter the name of the flashcard set: ").strip()
                 if set_name in flashcard_sets:
                     print(f"\nProgress for Flashcard Set: {set_name}")
                     track_progress(flashcard_sets[set_name])
@@ -1057,26 +1555,26 @@ def main_menu():
             calculate_leaderboard(load_user_data())  # Display the leaderboard
 
         elif choice == "11":
-            set_name = input("Enter the name of the flashcard set you want to search in: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to search in: ").strip()
             if set_name in flashcard_sets:
                 search_flashcard_set(flashcard_sets[set_name])  # Call the search function
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
 
         elif choice == "12":
-            set_name = input("Enter the name of the flashcard set you want to review: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to review: ").strip()
             if set_name in flashcard_sets:
                 revision_mode(flashcard_sets[set_name])  # Call the revision mode function
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
         elif choice == "13":
-            set_name = input("Enter the name of the flashcard set you want to quiz with: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to quiz with: ").strip()
             if set_name in flashcard_sets:
                 quiz_mode(flashcard_sets[set_name])  # Call the quiz mode function
             else:
                 print(f"No flashcard set named '{set_name}' found. Please try again.")
         elif choice == "14":
-            set_name = input("Enter the name of the flashcard set you want to use for Fill in the Blank Mode: ").strip()
+            set_name = profiling.read_input("Enter the name of the flashcard set you want to use for Fill in the Blank Mode: ").strip()
             if set_name in flashcard_sets:
                 fill_in_the_blank_mode(flashcard_sets[set_name])  # Call the Fill in the Blank Mode function
             else:
@@ -1093,4 +1591,11 @@ def main_menu():
 
 # Main program
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flash Card Program")
+    parser.add_argument("--profile", action="store_true", help="Profile each menu action with cProfile and tracemalloc")
+    parser.add_argument("--profile-dir", default=profiling.PROFILE_DIR, help="Where to write the profiling reports")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile_dir)
+    metrics.configure_from_environment()
     main_menu()
@@ -0,0 +1,122 @@
+"""Typo-tolerant name lookup backed by a trigram index."""
+import collections
+
+def edit_distance(a, b):
+    """Return the Levenshtein distance between two strings.
+
+    Uses the bit-parallel algorithm of Myers and Hyyrö, so each character of `b` costs a handful of
+    integer operations instead of a full row of the dynamic-programming table.
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    masks = {}
+    for index, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | (1 << index)
+    all_bits = (1 << len(a)) - 1
+    high_bit = 1 << (len(a) - 1)
+    positive = all_bits
+    negative = 0
+    distance = len(a)
+    for char in b:
+        match = masks.get(char, 0)
+        vertical = match | negative
+        horizontal = (((match & positive) + positive) ^ positive) | match
+        horizontal_positive = negative | ~(horizontal | positive)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & high_bit:
+            distance += 1
+        elif horizontal_negative & high_bit:
+            distance -= 1
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative <<= 1
+        positive = (horizontal_negative | ~(vertical | horizontal_positive)) & all_bits
+        negative = horizontal_positive & vertical & all_bits
+    return distance
+
+def trigrams(text):
+    """Return the set of three-letter pieces of a padded, lowercase text."""
+    padded = f"  {text.lower()} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+class NameIndex:
+    """Suggests the closest existing names (set names, terms) for a mistyped one.
+
+    Each trigram maps to the names that contain it. A name within k edits of the query shares all
+    but at most 3k of the query's trigrams, so only names passing that count are compared with
+    edit_distance. Queries too short for that count to rule anything out (a couple of letters)
+    are compared with every name of a similar length instead. The index is built on the first
+    lookup that needs it, then kept up to date by add(), remove() and rename(), so exact matches
+    never pay for building it.
+    """
+
+    def __init__(self, names=()):
+        self.names = set(names)
+        self.postings = None  # trigram -> set of names
+        self.lengths = None  # name length -> set of names, for short queries
+
+    def _build(self):
+        self.postings = {}
+        self.lengths = {}
+        for name in self.names:
+            self._index(name)
+
+    def _index(self, name):
+        for gram in trigrams(name):
+            self.postings.setdefault(gram, set()).add(name)
+        self.lengths.setdefault(len(name), set()).add(name)
+
+    def add(self, name):
+        if name in self.names:
+            return
+        self.names.add(name)
+        if self.postings is not None:
+            self._index(name)
+
+    def remove(self, name):
+        if name not in self.names:
+            return
+        self.names.discard(name)
+        if self.postings is not None:
+            for gram in trigrams(name):
+                names = self.postings.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self.postings[gram]
+            names = self.lengths[len(name)]
+            names.discard(name)
+            if not names:
+                del self.lengths[len(name)]
+
+    def rename(self, old_name, new_name):
+        self.remove(old_name)
+        self.add(new_name)
+
+    def suggest(self, query, limit=5, max_distance=None):
+        """Return up to `limit` names closest to the query, nearest first."""
+        if not self.names or not query:
+            return []
+        if self.postings is None:
+            self._build()
+        if max_distance is None:
+            max_distance = max(1, min(3, len(query) // 4))  # Allow more typos in longer names
+        query_grams = trigrams(query)
+        needed = len(query_grams) - 3 * max_distance
+        if needed > 0:
+            shared = collections.Counter()
+            for gram in query_grams:
+                shared.update(self.postings.get(gram, ()))
+        else:
+            # A name can be close without sharing a single trigram ("ab" and "xb"), so check every name of a similar length
+            shared = {name: 0 for length in range(len(query) - max_distance, len(query) + max_distance + 1) for name in self.lengths.get(length, ())}
+        lowered = query.lower()
+        matches = []
+        for name, count in shared.items():
+            if count >= needed and abs(len(name) - len(query)) <= max_distance:
+                distance = edit_distance(lowered, name.lower())
+                if distance <= max_distance:
+                    matches.append((distance, name))
+        matches.sort(key=lambda match: (match[0], match[1].lower()))
+        return [name for _, name in matches[:limit]]
@@ -0,0 +1,137 @@
+"""Generate realistic synthetic user data for load and scale testing."""
+import argparse
+import csv
+import gzip
+import json
+import math
+import random
+import sys
+
+import passwords
+from flashcards import USER_DATA_FILE
+
+WORDS = [
+    "data", "value", "function", "process", "system", "energy", "cell", "market", "language",
+    "structure", "element", "reaction", "history", "pattern", "number", "storage", "memory",
+    "object", "signal", "network", "theory", "surface", "balance", "force", "growth", "record",
+    "a", "the", "of", "and", "that", "which", "used", "to", "in", "by", "with", "for", "is",
+]
+
+GENERATED_PASSWORD_ITERATIONS = 1000  # Cheap hashes keep large stores fast to generate; logins upgrade them
+
+CATEGORIES = ["Math", "Science", "History", "Programming", "Languages", "Geography", "Art", "Music"]
+
+def _lognormal_count(rng, mean, sigma, minimum=1):
+    """Draw a positive whole number from a log-normal distribution with the given mean."""
+    if mean <= 0:
+        return 0
+    mu = math.log(mean) - sigma * sigma / 2  # Keeps the distribution's mean at `mean`
+    return max(minimum, int(round(rng.lognormvariate(mu, sigma))))
+
+def generate_definition(rng, words):
+    """Generate a sentence-like definition with the given number of words."""
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+def generate_flashcard_set(rng, terms, mean_definition_words, skill=0.7, activity=1.0, uniform=False):
+    """Generate one flashcard set with per-term counters and matching stats."""
+    flashcard_set = {"category": rng.choice(CATEGORIES), "terms": {}, "stats": {"correct": 0, "total": 0, "percentage": 0.0}}
+    for term_index in range(terms):
+        words = mean_definition_words if uniform else _lognormal_count(rng, mean_definition_words, 0.5, minimum=2)
+        # Attempts are heavy-tailed: most terms are seen a few times, some very often
+        total = int(rng.expovariate(1 / (5 * activity)))
+        # Harder terms are answered correctly less often
+        difficulty = rng.betavariate(2, 5)
+        probability = max(0.0, min(1.0, skill * (1 - difficulty) + rng.gauss(0, 0.05)))
+        correct = max(0, min(total, int(round(total * probability))))
+        term = f"{rng.choice(WORDS).title()} {term_index + 1}"
+        flashcard_set["terms"][term] = {"definition": generate_definition(rng, words), "correct": correct, "total": total}
+        flashcard_set["stats"]["correct"] += correct
+        flashcard_set["stats"]["total"] += total
+
+    if flashcard_set["stats"]["total"] > 0:  # Avoid division by zero
+        flashcard_set["stats"]["percentage"] = (flashcard_set["stats"]["correct"] / flashcard_set["stats"]["total"]) * 100
+    return flashcard_set
+
+def generate_user(index, seed=0, mean_sets=8, mean_terms=40, mean_definition_words=12, uniform=False):
+    """Generate one user; the result depends only on the seed and the user's index."""
+    rng = random.Random(f"{seed}:{index}")
+    username = f"user{index}"
+    # Accuracy is skewed towards good students, activity towards a few heavy users
+    skill = rng.betavariate(5, 2)
+    activity = 1.0 if uniform else min(rng.paretovariate(1.5), 50.0)
+    set_count = mean_sets if uniform else _lognormal_count(rng, mean_sets, 0.8)
+
+    flashcard_sets = {}
+    for set_index in range(set_count):
+        terms = mean_terms if uniform else _lognormal_count(rng, mean_terms, 0.6)
+        flashcard_set = generate_flashcard_set(rng, terms, mean_definition_words, skill, activity, uniform)
+        flashcard_sets[f"{flashcard_set['category']} set {set_index + 1}"] = flashcard_set
+
+    return username, {"password": passwords.hash_password(f"password{index}", GENERATED_PASSWORD_ITERATIONS, rng.randbytes(passwords.SALT_BYTES)), "flashcard_sets": flashcard_sets}
+
+def iter_users(users, seed=0, mean_sets=8, mean_terms=40, mean_definition_words=12, uniform=False):
+    """Yield (username, user) pairs one at a time."""
+    for index in range(users):
+        yield generate_user(index, seed, mean_sets, mean_terms, mean_definition_words, uniform)
+
+def build_user_data(users, seed=0, mean_sets=8, mean_terms=40, mean_definition_words=12, uniform=False):
+    """Generate a whole user store in memory."""
+    return dict(iter_users(users, seed, mean_sets, mean_terms, mean_definition_words, uniform))
+
+def write_user_data(file_name, users, seed=0, mean_sets=8, mean_terms=40, mean_definition_words=12, uniform=False):
+    """Stream a generated store to a compressed JSON file one user at a time."""
+    total_terms = 0
+    with gzip.open(file_name, "wt", encoding="utf-8") as file:
+        file.write("{")
+        for index, (username, user) in enumerate(iter_users(users, seed, mean_sets, mean_terms, mean_definition_words, uniform)):
+            if index > 0:
+                file.write(",")
+            file.write(f"\n{json.dumps(username)}: {json.dumps(user)}")
+            total_terms += sum(len(flashcard_set["terms"]) for flashcard_set in user["flashcard_sets"].values())
+        file.write("\n}\n")
+    return total_terms
+
+def write_deck(file_name, terms, seed=0, mean_definition_words=12):
+    """Write a single flashcard set in the JSON or CSV format import_flashcard_set reads."""
+    rng = random.Random(f"{seed}:deck")
+    flashcard_set = generate_flashcard_set(rng, terms, mean_definition_words)
+    if file_name.endswith(".json"):
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(flashcard_set, file, indent=4)
+    elif file_name.endswith(".csv"):
+        with open(file_name, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Term", "Definition", "Correct", "Total"])
+            for term, data in flashcard_set["terms"].items():
+                writer.writerow([term, data["definition"], data["correct"], data["total"]])
+    else:
+        raise ValueError("Unsupported file format. Please provide a '.json' or '.csv' file.")
+
+def main(argv=None):
+    """Generate a user store (and optionally an importable deck) from the command line."""
+    parser = argparse.ArgumentParser(description="Generate synthetic flashcard data.")
+    parser.add_argument("--users", type=int, default=100, help="Number of users to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data")
+    parser.add_argument("--mean-sets", type=int, default=8, help="Average flashcard sets per user")
+    parser.add_argument("--mean-terms", type=int, default=40, help="Average terms per set")
+    parser.add_argument("--mean-definition-words", type=int, default=12, help="Average words per definition")
+    parser.add_argument("--uniform", action="store_true", help="Use the averages exactly instead of sampling")
+    parser.add_argument("--output", default=USER_DATA_FILE, help="Compressed JSON file to write")
+    parser.add_argument("--deck", help="Also write an importable .json or .csv flashcard set")
+    parser.add_argument("--deck-terms", type=int, default=100, help="Number of terms in the --deck file")
+    args = parser.parse_args(argv)
+
+    total_terms = write_user_data(
+        args.output, args.users, args.seed, args.mean_sets, args.mean_terms, args.mean_definition_words, args.uniform
+    )
+    print(f"Wrote {args.users} users with {total_terms} terms to {args.output}")
+    print("Every generated user's password is 'password' followed by their number (user7 -> password7).")
+
+    if args.deck:
+        write_deck(args.deck, args.deck_terms, args.seed, args.mean_definition_words)
+        print(f"Wrote a {args.deck_terms}-term flashcard set to {args.deck}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Append-only answer history stored as compact columnar segment files."""
+import argparse
+import array
+import atexit
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+HISTORY_DIR = "answer_history"
+SEGMENT_ROWS = 8192  # Answers buffered in memory before a segment file is written
+MAGIC = b"FCAH"
+FORMAT_VERSION = 1
+
+VERDICTS = ["incorrect", "almost", "correct", "invalid", "revealed"]
+MODES = ["game", "quiz", "fill_in_the_blank", "revision", "review"]
+
+# Column name -> array typecode; every segment stores the columns in this order
+COLUMNS = {
+    "timestamp": "d",  # Seconds since the epoch
+    "user": "I",  # Index into the segment's user names
+    "set": "I",  # Index into the segment's set names
+    "term": "I",  # Index into the segment's term names
+    "similarity": "f",  # -1.0 when the mode does not measure similarity
+    "verdict": "B",  # Index into VERDICTS
+    "mode": "B",  # Index into MODES
+    "latency_ms": "f",  # Time from showing the card to the answer
+}
+
+class AnswerLog:
+    """Buffers graded answers in typed arrays and writes them out as segment files."""
+
+    def __init__(self, directory=HISTORY_DIR, segment_rows=SEGMENT_ROWS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.lock = threading.Lock()
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.columns = {name: array.array(typecode) for name, typecode in COLUMNS.items()}
+        # Names are stored once per segment, so segments can be read (and written) independently
+        self.names = {"user": {}, "set": {}, "term": {}}
+
+    def _name_id(self, kind, name):
+        ids = self.names[kind]
+        if name not in ids:
+            ids[name] = len(ids)
+        return ids[name]
+
+    def append(self, username, set_name, result, mode="game", timestamp=None):
+        """Record one graded answer (a verdict dict from the engine)."""
+        similarity = result.get("similarity")
+        with self.lock:
+            columns = self.columns
+            columns["timestamp"].append(timestamp if timestamp is not None else time.time())
+            columns["user"].append(self._name_id("user", username))
+            columns["set"].append(self._name_id("set", set_name))
+            columns["term"].append(self._name_id("term", result["term"]))
+            columns["similarity"].append(-1.0 if similarity is None else similarity)
+            columns["verdict"].append(VERDICTS.index(result["verdict"]))
+            columns["mode"].append(MODES.index(mode))
+            columns["latency_ms"].append(result.get("response_ms") or 0.0)
+            if len(columns["timestamp"]) >= self.segment_rows:
+                self._write_segment()
+
+    def recorder(self, username, set_name, mode):
+        """Return an engine on_answer callback that logs answers for one user and set.
+
+        Answers that name their own set (cross-set review) are logged under that set instead.
+        """
+        return lambda result: self.append(username, result.get("set", set_name), result, mode)
+
+    def flush(self):
+        """Write any buffered answers to a new segment file."""
+        with self.lock:
+            if len(self.columns["timestamp"]) > 0:
+                self._write_segment()
+
+    def _write_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        names = json.dumps({kind: list(ids) for kind, ids in self.names.items()}).encode("utf-8")
+        rows = len(self.columns["timestamp"])
+        # Time and process id keep names unique when several front ends share the directory
+        file_name = os.path.join(self.directory, f"segment-{time.time_ns():020d}-{os.getpid()}.bin")
+        temp_file_name = file_name + ".tmp"
+        with open(temp_file_name, "wb") as file:
+            file.write(MAGIC + struct.pack("<BBII", FORMAT_VERSION, sys.byteorder == "little", rows, len(names)))
+            file.write(names)
+            for name in COLUMNS:
+                self.columns[name].tofile(file)
+        os.replace(temp_file_name, file_name)  # Readers never see a half-written segment
+        self._reset()
+
+def segment_files(directory=HISTORY_DIR):
+    """Return the segment files in the order they were written."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".bin"))
+
+def read_segment(file_name):
+    """Read one segment and return (names, columns) with each column as a typed array."""
+    with open(file_name, "rb") as file:
+        if file.read(4) != MAGIC:
+            raise ValueError(f"{file_name} is not an answer history segment.")
+        version, little_endian, rows, names_length = struct.unpack("<BBII", file.read(10))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{file_name} uses unsupported format version {version}.")
+        names = json.loads(file.read(names_length).decode("utf-8"))
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            column = array.array(typecode)
+            column.fromfile(file, rows)
+            if bool(little_endian) != (sys.byteorder == "little"):
+                column.byteswap()
+            columns[name] = column
+    return names, columns
+
+def iter_segments(directory=HISTORY_DIR):
+    """Yield (names, columns) one segment at a time, so memory stays bounded by a segment."""
+    for file_name in segment_files(directory):
+        yield read_segment(file_name)
+
+def iter_answers(directory=HISTORY_DIR):
+    """Yield every logged answer as a dict with names and verdicts filled in."""
+    for names, columns in iter_segments(directory):
+        for row in range(len(columns["timestamp"])):
+            similarity = columns["similarity"][row]
+            yield {
+                "timestamp": columns["timestamp"][row],
+                "user": names["user"][columns["user"][row]],
+                "set": names["set"][columns["set"][row]],
+                "term": names["term"][columns["term"][row]],
+                "similarity": None if similarity < 0 else similarity,
+                "verdict": VERDICTS[columns["verdict"][row]],
+                "mode": MODES[columns["mode"][row]],
+                "latency_ms": columns["latency_ms"][row],
+            }
+
+def run_size_benchmark(events=1_000_000, users=100, sets=20, terms=50, seed=0):
+    """Log synthetic answers and compare the segment size and append cost with JSON lines."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as work_dir:
+        log = AnswerLog(os.path.join(work_dir, HISTORY_DIR))
+        json_bytes = 0
+        append_seconds = 0.0
+        start_time = time.time()
+        for index in range(events):
+            result = {"term": f"Term {rng.randrange(terms)}", "verdict": rng.choice(VERDICTS[:3]), "similarity": rng.random(), "response_ms": rng.uniform(500, 20000)}
+            username = f"user{rng.randrange(users)}"
+            set_name = f"Set {rng.randrange(sets)}"
+            timestamp = start_time + index
+            start = time.perf_counter()
+            log.append(username, set_name, result, "game", timestamp)
+            append_seconds += time.perf_counter() - start
+            event = {"timestamp": timestamp, "user": username, "set": set_name, "term": result["term"], "similarity": result["similarity"], "verdict": result["verdict"], "mode": "game", "latency_ms": result["response_ms"]}
+            json_bytes += len(json.dumps(event)) + 1
+        log.flush()
+        files = segment_files(log.directory)
+        segment_bytes = sum(os.path.getsize(file_name) for file_name in files)
+        start = time.perf_counter()
+        read = sum(len(columns["timestamp"]) for _, columns in iter_segments(log.directory))
+        read_seconds = time.perf_counter() - start
+    return {
+        "events": events,
+        "segments": len(files),
+        "segment_bytes": segment_bytes,
+        "json_bytes": json_bytes,
+        "ratio": segment_bytes / json_bytes,
+        "append_us": append_seconds / events * 1_000_000,
+        "read_events_per_second": read / read_seconds,
+    }
+
+def main(argv=None):
+    """Summarize the answer history or measure how compact it is."""
+    parser = argparse.ArgumentParser(description="Inspect the answer history log.")
+    parser.add_argument("--dir", default=HISTORY_DIR, help="History directory to read")
+    parser.add_argument("--benchmark", type=int, metavar="EVENTS", help="Log this many synthetic answers and compare the size with JSON")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_size_benchmark(args.benchmark)
+        print(f"{result['events']} answers in {result['segments']} segments: {result['segment_bytes'] / 1e6:.1f} MB (JSON lines: {result['json_bytes'] / 1e6:.1f} MB, {result['ratio']:.0%})")
+        print(f"Append: {result['append_us']:.2f} us per answer, read: {result['read_events_per_second']:,.0f} answers/s")
+        return 0
+
+    answers = 0
+    verdicts = dict.fromkeys(VERDICTS, 0)
+    for names, columns in iter_segments(args.dir):
+        answers += len(columns["timestamp"])
+        for code in columns["verdict"]:
+            verdicts[VERDICTS[code]] += 1
+    print(f"{answers} answers in {len(segment_files(args.dir))} segments")
+    for verdict, count in verdicts.items():
+        print(f"- {verdict}: {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
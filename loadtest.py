@@ -0,0 +1,169 @@
+"""Multi-user load test that replays the Streamlit app's flows against its data layer."""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import engine
+import flashcards
+import generate_data
+import views
+
+# How often each flow is picked after login (the rest of the time is spent on "Play Flashcards")
+FLOW_WEIGHTS = {"play": 0.75, "edit": 0.1, "leaderboard": 0.15}
+LEADERBOARD_PAGE_SIZE = 25  # The page size the Streamlit leaderboard opens with
+
+def percentile(values, fraction):
+    """Return the value at a fraction (0.0 to 1.0) of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class Learner:
+    """One simulated student clicking through the Streamlit app."""
+
+    def __init__(self, index, file_name, think_time, seed):
+        self.username = f"user{index}"
+        self.password = f"password{index}"
+        self.file_name = file_name
+        self.think_time = think_time
+        self.rng = random.Random(f"{seed}:learner:{index}")
+        self.latencies = {"login": [], "play": [], "edit": [], "leaderboard": []}
+        self.errors = 0
+        self.submitted = {}  # set name -> answers this learner saved
+        self.added_terms = {}  # set name -> terms this learner added
+
+    def rerun(self, flow, action):
+        """Time one Streamlit rerun: load the whole store, act, and maybe save it."""
+        start = time.perf_counter()
+        try:
+            user_data = flashcards.load_user_data(self.file_name)  # streamlitfc.py reloads on every rerun
+            action(user_data)
+        except (OSError, EOFError, ValueError, KeyError, zlib.error):
+            self.errors += 1  # Usually a store that another session corrupted or is half-way through writing
+            return
+        self.latencies[flow].append((time.perf_counter() - start) * 1000)
+
+    def login(self, user_data):
+        if not flashcards.verify_password(user_data[self.username]["password"], self.password):
+            raise ValueError("Login failed")
+
+    def play(self, user_data):
+        flashcard_sets = user_data[self.username]["flashcard_sets"]
+        set_name = self.rng.choice(sorted(flashcard_sets))
+        flashcard_set = flashcard_sets[set_name]
+        term = self.rng.choice(list(flashcard_set["terms"]))
+        engine.grade_answer(flashcard_set, term, generate_data.generate_definition(self.rng, 8))
+        flashcards.save_user_data(user_data, self.file_name)
+        self.submitted[set_name] = self.submitted.get(set_name, 0) + 1
+
+    def edit(self, user_data):
+        flashcard_sets = user_data[self.username]["flashcard_sets"]
+        set_name = self.rng.choice(sorted(flashcard_sets))
+        term = f"Load test term {sum(len(terms) for terms in self.added_terms.values()) + 1}"
+        flashcard_sets[set_name]["terms"][term] = {"definition": generate_data.generate_definition(self.rng, 8), "correct": 0, "total": 0}
+        flashcards.save_user_data(user_data, self.file_name)
+        self.added_terms.setdefault(set_name, []).append(term)
+
+    def leaderboard(self, user_data):
+        # Same calls as the Streamlit "Leaderboard" page: the cached view, rebuilt only after a save, then one page
+        leaderboard_view = views.cached_view("leaderboard", views.store_version(self.file_name), lambda: views.build_leaderboard_view(user_data))
+        views.get_page(leaderboard_view, next(iter(views.LEADERBOARD_SORT_KEYS)), True, 1, LEADERBOARD_PAGE_SIZE)
+
+    def run(self, deadline):
+        """Log in, then keep picking flows with think time until the deadline."""
+        self.rerun("login", self.login)
+        flows = list(FLOW_WEIGHTS)
+        weights = list(FLOW_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            time.sleep(self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0)
+            flow = self.rng.choices(flows, weights)[0]
+            self.rerun(flow, getattr(self, flow))
+
+def count_lost_updates(file_name, learners, initial_totals):
+    """Compare the final store with what every learner saved to find overwritten updates."""
+    user_data = flashcards.load_user_data(file_name)
+    lost_answers = 0
+    lost_terms = 0
+    for learner in learners:
+        flashcard_sets = user_data[learner.username]["flashcard_sets"]
+        for set_name, submitted in learner.submitted.items():
+            saved = flashcard_sets[set_name]["stats"]["total"] - initial_totals[learner.username][set_name]
+            lost_answers += max(0, submitted - saved)
+        for set_name, terms in learner.added_terms.items():
+            lost_terms += sum(1 for term in terms if term not in flashcard_sets[set_name]["terms"])
+    return lost_answers, lost_terms
+
+def run_load_test(users, duration=10.0, think_time=0.5, store_users=None, seed=0):
+    """Run `users` concurrent learners for `duration` seconds and return the measurements."""
+    store_users = max(users, store_users or users)
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_name = os.path.join(work_dir, flashcards.USER_DATA_FILE)
+        generate_data.write_user_data(file_name, store_users, seed, mean_sets=3, mean_terms=30)
+        initial = flashcards.load_user_data(file_name)
+        initial_totals = {
+            username: {set_name: flashcard_set["stats"]["total"] for set_name, flashcard_set in user["flashcard_sets"].items()}
+            for username, user in initial.items()
+        }
+        del initial
+
+        learners = [Learner(index, file_name, think_time, seed) for index in range(users)]
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=learner.run, args=(deadline,)) for learner in learners]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        lost_answers, lost_terms = count_lost_updates(file_name, learners, initial_totals)
+
+    result = {"users": users, "seconds": elapsed, "flows": {}}
+    requests = 0
+    for flow in learners[0].latencies:
+        latencies = sorted(latency for learner in learners for latency in learner.latencies[flow])
+        requests += len(latencies)
+        result["flows"][flow] = {
+            "requests": len(latencies),
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+        }
+    result["throughput_per_second"] = requests / elapsed
+    result["errors"] = sum(learner.errors for learner in learners)
+    result["lost_answers"] = lost_answers
+    result["lost_terms"] = lost_terms
+    return result
+
+def main(argv=None):
+    """Run the load test for each requested number of users and print how it scales."""
+    parser = argparse.ArgumentParser(description="Load test the Streamlit app's data layer with simulated students.")
+    parser.add_argument("--users", default="1,5,10,25", help="Comma-separated numbers of concurrent learners to try")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run each step")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Average seconds a learner waits between clicks")
+    parser.add_argument("--store-users", type=int, default=200, help="Users in the generated store (affects load/save cost)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'Users':<7} {'Req/s':<9} {'Play p50/p95/p99 (ms)':<26} {'Leaderboard p95 (ms)':<22} {'Errors':<8} {'Lost answers':<14} {'Lost terms':<10}")
+    for users in (int(value) for value in args.users.split(",")):
+        result = run_load_test(users, args.duration, args.think_time, args.store_users, args.seed)
+        results.append(result)
+        play = result["flows"]["play"]
+        latency = f"{play['p50_ms']:.1f}/{play['p95_ms']:.1f}/{play['p99_ms']:.1f}"
+        print(f"{users:<7} {result['throughput_per_second']:<9.1f} {latency:<26} {result['flows']['leaderboard']['p95_ms']:<22.1f} {result['errors']:<8} {result['lost_answers']:<14} {result['lost_terms']:<10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
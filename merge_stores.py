@@ -0,0 +1,179 @@
+"""Merge user data files from several machines without double counting answers."""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import generate_data
+import text_index
+import versions
+from flashcards import iter_user_data, save_user_stream
+
+REPLICAS_KEY = "replicas"  # Per-term {replica name: [correct, total]} counters
+CACHE_KEYS = text_index.CACHE_KEYS  # Rebuilt from the merged terms instead of being merged
+
+def term_replicas(term_data, replica):
+    """Return a term's per-replica counters, crediting answers no replica accounts for to `replica`.
+
+    Answers given on a machine after its last merge only raise the plain correct/total counters, so
+    the difference between those and the replica counters belongs to the machine's own replica.
+    """
+    if REPLICAS_KEY not in term_data:  # Never merged before: every answer was given on this replica
+        return {replica: [term_data["correct"], term_data["total"]]} if term_data["total"] else {}
+    replicas = {name: list(counters) for name, counters in term_data[REPLICAS_KEY].items()}
+    own = replicas.setdefault(replica, [0, 0])
+    own[0] += term_data["correct"] - sum(counters[0] for counters in replicas.values())
+    own[1] += term_data["total"] - sum(counters[1] for counters in replicas.values())
+    if own == [0, 0]:
+        del replicas[replica]  # Stores that were only ever merged into add no counters of their own
+    return replicas
+
+def _merge_term(target, term_data, replica):
+    replicas = term_replicas(term_data, replica)
+    merged = target.setdefault(REPLICAS_KEY, {})
+    for name, (correct, total) in replicas.items():
+        # Each replica's counters only grow, so the larger value is the newer one (a G-counter)
+        current = merged.get(name)
+        merged[name] = [max(current[0], correct), max(current[1], total)] if current else [correct, total]
+    target.update((key, value) for key, value in term_data.items() if key != REPLICAS_KEY)
+
+def merge_user(records):
+    """Merge the copies of one user from several stores, given as (replica, user) in input order.
+
+    Sets and terms are unioned. Term counters are merged per replica, and other fields (password,
+    definitions, categories) are taken from the last store that has them.
+    """
+    merged = {"flashcard_sets": {}}
+    for replica, user in records:
+        for key, value in user.items():
+            if key == "flashcard_sets":
+                continue
+            if key == "rating" and merged.get("rating", {}).get("answers", -1) > value["answers"]:
+                continue  # Keep the rating that rests on more answers
+            if key == "daily_challenge" and (merged.get(key) or {}).get("last_day") is not None and (value["last_day"] is None or value["last_day"] < merged[key]["last_day"]):
+                continue  # Keep the most recent daily challenge record
+            merged[key] = value
+        for set_name, flashcard_set in user["flashcard_sets"].items():
+            target = merged["flashcard_sets"].setdefault(set_name, {"terms": {}})
+            # The version marker is dropped too: the merged terms need not match any one store's latest version
+            target.update((key, value) for key, value in flashcard_set.items() if key not in ("terms", "stats", versions.VERSION_KEY) and key not in CACHE_KEYS)
+            for term, term_data in flashcard_set["terms"].items():
+                _merge_term(target["terms"].setdefault(term, {}), term_data, replica)
+
+    for flashcard_set in merged["flashcard_sets"].values():
+        correct = total = 0
+        for term_data in flashcard_set["terms"].values():
+            term_data["correct"] = sum(counters[0] for counters in term_data[REPLICAS_KEY].values())
+            term_data["total"] = sum(counters[1] for counters in term_data[REPLICAS_KEY].values())
+            correct += term_data["correct"]
+            total += term_data["total"]
+        flashcard_set["stats"] = {"correct": correct, "total": total, "percentage": correct / total * 100 if total else 0.0}
+        text_index.update_keyword_index(flashcard_set)
+    return merged
+
+def _spill(file_name, spill_file):
+    """Copy a store's users to a spill file, one JSON line each; returns [(username, offset, length)]."""
+    index = []
+    for username, user in iter_user_data(file_name):
+        line = json.dumps(user).encode("utf-8") + b"\n"
+        index.append((username, spill_file.tell(), len(line)))
+        spill_file.write(line)
+    index.sort()
+    return index
+
+def _entries(index, number):
+    for username, offset, length in index:
+        yield username, number, offset, length
+
+def merge_stores(file_names, output, replicas=None, progress=None):
+    """Stream several stores into one merged store and return (users, terms) written.
+
+    Each store is first copied user by user to an uncompressed spill file, keeping only usernames
+    and file offsets in memory. The sorted offset lists are then merged with a heap, so every
+    user's copies are read, merged and written together and only one user is held at a time.
+    """
+    replicas = replicas or [os.path.splitext(os.path.splitext(os.path.basename(file_name))[0])[0] for file_name in file_names]
+    if len(set(replicas)) != len(replicas):
+        raise ValueError("Every store needs a different replica name; pass them with --replicas.")
+    with tempfile.TemporaryDirectory() as spill_directory:
+        spill_files = [open(os.path.join(spill_directory, f"{number}.jsonl"), "w+b") for number in range(len(file_names))]
+        try:
+            indexes = [_spill(file_name, spill_file) for file_name, spill_file in zip(file_names, spill_files)]
+            entries = heapq.merge(*(_entries(index, number) for number, index in enumerate(indexes)))
+            totals = {"users": 0, "terms": 0}
+
+            def merged_users():
+                for username, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+                    records = []
+                    for _, number, offset, length in group:
+                        spill_files[number].seek(offset)
+                        records.append((replicas[number], json.loads(spill_files[number].read(length))))
+                    user = merge_user(records)
+                    totals["users"] += 1
+                    totals["terms"] += sum(len(flashcard_set["terms"]) for flashcard_set in user["flashcard_sets"].values())
+                    if progress is not None:
+                        progress(totals["users"])
+                    yield username, user
+
+            save_user_stream(merged_users(), output)
+        finally:
+            for spill_file in spill_files:
+                spill_file.close()
+    return totals["users"], totals["terms"]
+
+def run_benchmark(users, stores=3):
+    """Generate `stores` overlapping stores of `users` users each, merge them and report the throughput."""
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = []
+        for number in range(stores):
+            file_name = os.path.join(directory, f"lab{number}.json.gz")
+            generate_data.write_user_data(file_name, users, seed=number)
+            file_names.append(file_name)
+        input_bytes = sum(os.path.getsize(file_name) for file_name in file_names)
+        start = time.perf_counter()
+        merged_users, merged_terms = merge_stores(file_names, os.path.join(directory, "merged.json.gz"))
+        seconds = time.perf_counter() - start
+    return {
+        "stores": stores,
+        "users": merged_users,
+        "terms": merged_terms,
+        "seconds": round(seconds, 2),
+        "users_per_second": round(merged_users / seconds, 1),
+        "input_mb_per_second": round(input_bytes / seconds / 1e6, 2),
+    }
+
+def main(argv=None):
+    """Merge store files from the command line, or benchmark the merge."""
+    parser = argparse.ArgumentParser(description="Merge user data files from several machines.")
+    parser.add_argument("stores", nargs="*", help="Compressed JSON stores to merge")
+    parser.add_argument("--output", default="merged_user_data.json.gz", help="Merged store to write")
+    parser.add_argument("--replicas", help="Comma-separated replica name per store (default: the file names)")
+    parser.add_argument("--benchmark", type=int, metavar="USERS", help="Merge generated stores of this many users each and exit")
+    parser.add_argument("--benchmark-stores", type=int, default=3, help="Number of stores to generate for --benchmark")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, args.benchmark_stores)
+        print(f"Merged {result['stores']} stores into {result['users']} users and {result['terms']} terms in {result['seconds']} s "
+              f"({result['users_per_second']} users/s, {result['input_mb_per_second']} MB/s of compressed input)")
+        return 0
+    if len(args.stores) < 2:
+        parser.error("give at least two stores to merge")
+    replicas = args.replicas.split(",") if args.replicas else None
+    if replicas is not None and len(replicas) != len(args.stores):
+        parser.error("give one replica name per store")
+
+    def report(users):
+        if users % 1000 == 0:
+            print(f"Merged {users} users...", end="\r", flush=True)
+
+    users, terms = merge_stores(args.stores, args.output, replicas, report)
+    print(f"Merged {len(args.stores)} stores into {users} users and {terms} terms in {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Lightweight in-process metrics with Prometheus text export."""
+import atexit
+import bisect
+import contextlib
+import functools
+import http.server
+import os
+import threading
+import time
+
+# Metrics are off unless FLASHCARDS_METRICS is set (or enable() is called)
+ENABLED = os.environ.get("FLASHCARDS_METRICS", "") not in {"", "0"}
+
+TIME_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000, 300000)
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+_registry = {}  # (name, labels) -> metric
+_lock = threading.Lock()
+_server = None
+_configured = False
+
+def enable():
+    """Turn metric collection on."""
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    """Turn metric collection off."""
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    """Forget every recorded metric."""
+    with _lock:
+        _registry.clear()
+
+def _get_metric(name, kind, help_text, labels, buckets=None):
+    """Return the metric for a name and label set, creating it on first use."""
+    key = (name, tuple(sorted(labels.items())) if labels else ())
+    metric = _registry.get(key)
+    if metric is None:
+        with _lock:
+            metric = _registry.setdefault(key, {
+                "kind": kind,
+                "help": help_text,
+                "value": 0,
+                "buckets": buckets,
+                "counts": [0] * (len(buckets) + 1) if buckets else None,
+                "sum": 0.0,
+            })
+    return metric
+
+def increment(name, amount=1, help_text="", labels=None):
+    """Add to a counter."""
+    if not ENABLED:
+        return
+    metric = _get_metric(name, "counter", help_text, labels)
+    with _lock:
+        metric["value"] += amount
+
+def observe(name, value, buckets=TIME_BUCKETS_MS, help_text="", labels=None):
+    """Record a value in a histogram."""
+    if not ENABLED:
+        return
+    metric = _get_metric(name, "histogram", help_text, labels, buckets)
+    index = bisect.bisect_left(metric["buckets"], value)
+    with _lock:
+        metric["counts"][index] += 1
+        metric["sum"] += value
+        metric["value"] += 1
+
+def timed(name, help_text="", labels=None):
+    """Decorator that records how long each call takes in milliseconds."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, (time.perf_counter() - start) * 1000, help_text=help_text, labels=labels)
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def timer(name, help_text="", labels=None):
+    """Context manager that records how long its block takes in milliseconds."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000, help_text=help_text, labels=labels)
+
+def _format_labels(labels, extra=None):
+    """Format a label set the way Prometheus expects it."""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+def render_prometheus():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    seen = set()
+    with _lock:
+        items = sorted(_registry.items(), key=lambda item: item[0])
+    for (name, labels), metric in items:
+        if name not in seen:
+            seen.add(name)
+            if metric["help"]:
+                lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+        if metric["kind"] == "counter":
+            lines.append(f"{name}{_format_labels(labels)} {metric['value']}")
+            continue
+        cumulative = 0
+        for bound, count in zip(metric["buckets"], metric["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {metric['value']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {metric['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {metric['value']}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(file_name):
+    """Write the current metrics to a file in Prometheus text format."""
+    with open(file_name, "w", encoding="utf-8") as file:
+        file.write(render_prometheus())
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the registry at /metrics."""
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the program's output
+
+def start_metrics_server(port=9100, host="127.0.0.1"):
+    """Serve metrics over HTTP from a background thread (only starts once)."""
+    global _server
+    if _server is None:
+        _server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+def configure_from_environment():
+    """Set up exporting from FLASHCARDS_METRICS_FILE and FLASHCARDS_METRICS_PORT."""
+    global _configured
+    if not ENABLED or _configured:
+        return
+    _configured = True
+    file_name = os.environ.get("FLASHCARDS_METRICS_FILE")
+    if file_name:
+        atexit.register(write_metrics, file_name)
+    port = os.environ.get("FLASHCARDS_METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
@@ -0,0 +1,162 @@
+"""Salted PBKDF2 password hashing with a cost calibrated to the host, and a login benchmark."""
+import argparse
+import concurrent.futures
+import hashlib
+import hmac
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+
+ALGORITHM = "pbkdf2_sha256"
+TARGET_MS = float(os.environ.get("FLASHCARDS_PASSWORD_MS", "100"))  # Time one hash should take on this host
+MIN_ITERATIONS = 100_000  # Never weaker than this, however slow the host
+CALIBRATION_ITERATIONS = 20_000
+SALT_BYTES = 16
+LOGIN_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # Leaves cores free for everything else during a login rush
+
+_iterations = None
+_calibration_lock = threading.Lock()
+
+def calibrate(target_ms=TARGET_MS):
+    """Return the PBKDF2 iteration count that takes about `target_ms` on this host."""
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration", b"0" * SALT_BYTES, CALIBRATION_ITERATIONS)
+    seconds = time.perf_counter() - start
+    iterations = int(CALIBRATION_ITERATIONS * target_ms / 1000 / seconds)
+    return max(MIN_ITERATIONS, iterations // 1000 * 1000)
+
+def current_iterations():
+    """Return the calibrated iteration count, measuring it the first time it is needed."""
+    global _iterations
+    if _iterations is None:
+        with _calibration_lock:
+            if _iterations is None:
+                _iterations = calibrate()
+    return _iterations
+
+def hash_password(password, iterations=None, salt=None):
+    """Return a salted hash as "pbkdf2_sha256$iterations$salt$hash", using the calibrated cost by default."""
+    iterations = iterations or current_iterations()
+    salt = salt if salt is not None else secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+def is_legacy(stored_password):
+    """Return True for an old unsalted SHA-256 hex digest."""
+    return "$" not in stored_password
+
+def parse_hash(stored_password):
+    """Return (iterations, salt, digest) of a hash in the current format, or None if it is malformed."""
+    fields = stored_password.split("$")
+    if len(fields) != 4 or fields[0] != ALGORITHM:
+        return None
+    try:
+        iterations = int(fields[1])
+        salt = bytes.fromhex(fields[2])
+        digest = bytes.fromhex(fields[3])
+    except ValueError:
+        return None
+    if iterations < 1 or not digest:
+        return None
+    return iterations, salt, digest
+
+def verify_password(stored_password, provided_password):
+    """Check a password against a stored hash in the new or the legacy format, in constant time.
+
+    Malformed hashes never match.
+    """
+    if is_legacy(stored_password):
+        digest = hashlib.sha256(provided_password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(stored_password, digest)
+    parsed = parse_hash(stored_password)
+    if parsed is None:
+        return False
+    iterations, salt, expected = parsed
+    digest = hashlib.pbkdf2_hmac("sha256", provided_password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(expected, digest)
+
+def needs_rehash(stored_password):
+    """Return True if a hash is legacy, malformed or much cheaper than this host's calibrated cost."""
+    if is_legacy(stored_password):
+        return True
+    parsed = parse_hash(stored_password)
+    return parsed is None or parsed[0] < current_iterations() // 2
+
+def upgrade_password(user, provided_password):
+    """Re-hash a user's verified password at the current cost if needed; returns True if it changed."""
+    if not needs_rehash(user["password"]):
+        return False
+    user["password"] = hash_password(provided_password)
+    return True
+
+def run_benchmark(clients=50, logins_per_client=4, workers=None):
+    """Simulate a class logging in at once and report throughput and latency for each pool size.
+
+    Every client thread submits its logins to a verification pool, as the Streamlit app does, while
+    one more thread stands in for the other sessions and measures how late its 10 ms ticks run. A
+    pool as large as the number of clients shows what happens without a bound.
+    """
+    stored = hash_password("password")
+    results = []
+    for pool_size in sorted(set(workers or (LOGIN_WORKERS, os.cpu_count() or 1, clients))):
+        latencies = []
+        lateness = []
+        stop = threading.Event()
+
+        def other_session():
+            while not stop.is_set():
+                start = time.perf_counter()
+                time.sleep(0.01)
+                lateness.append((time.perf_counter() - start - 0.01) * 1000)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pool_size) as pool:
+            def client():
+                for _ in range(logins_per_client):
+                    start = time.perf_counter()
+                    pool.submit(verify_password, stored, "password").result()
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            ticker = threading.Thread(target=other_session)
+            ticker.start()
+            threads = [threading.Thread(target=client) for _ in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - start
+            stop.set()
+            ticker.join()
+        latencies.sort()
+        results.append({
+            "workers": pool_size,
+            "logins_per_second": round(len(latencies) / seconds, 1),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+            "other_session_p95_late_ms": round(sorted(lateness)[int(len(lateness) * 0.95) - 1], 1) if lateness else 0.0,
+        })
+    return results
+
+def main(argv=None):
+    """Show the calibrated cost, or benchmark login throughput under a login rush."""
+    parser = argparse.ArgumentParser(description="Password hashing calibration and login benchmark.")
+    parser.add_argument("--benchmark", action="store_true", help="Measure login throughput with concurrent clients")
+    parser.add_argument("--clients", type=int, default=50, help="Clients logging in at the same time")
+    parser.add_argument("--logins", type=int, default=4, help="Logins per client")
+    args = parser.parse_args(argv)
+
+    iterations = current_iterations()
+    start = time.perf_counter()
+    hash_password("password")
+    print(f"Calibrated to {iterations} PBKDF2-SHA256 iterations ({(time.perf_counter() - start) * 1000:.0f} ms per hash, target {TARGET_MS:.0f} ms)")
+    if args.benchmark:
+        print(f"{'Workers':<8} {'Logins/s':<9} {'p50 (ms)':<9} {'p95 (ms)':<9} Other sessions p95 late (ms)")
+        for result in run_benchmark(args.clients, args.logins):
+            print(f"{result['workers']:<8} {result['logins_per_second']:<9} {result['p50_ms']:<9} {result['p95_ms']:<9} {result['other_session_p95_late_ms']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Opt-in cProfile and tracemalloc profiling of menu actions."""
+import atexit
+import contextlib
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import threading
+import tracemalloc
+
+# Profiling is off unless FLASHCARDS_PROFILE is set (or enable() is called)
+ENABLED = os.environ.get("FLASHCARDS_PROFILE", "") not in {"", "0"}
+PROFILE_DIR = os.environ.get("FLASHCARDS_PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+_actions = {}  # action name -> {"calls", "stats", "allocations"}
+_lock = threading.Lock()
+_local = threading.local()  # Tracks the action being profiled on each thread
+_profiler_lock = threading.Lock()  # Held while an action is profiled; only one profiler can be enabled at a time
+_registered = False
+
+# Leave the profiler's own bookkeeping out of the allocation reports
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+def enable(directory=None):
+    """Turn profiling on and write the reports when the program exits."""
+    global ENABLED, PROFILE_DIR, _registered
+    ENABLED = True
+    if directory:
+        PROFILE_DIR = directory
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not _registered:
+        atexit.register(write_reports)
+        _registered = True
+
+def start_action(name):
+    """Start profiling an action; returns a token for stop_action (or None).
+
+    Only one action is profiled at a time: an action started while another thread holds the
+    profiler is not profiled. tracemalloc traces the whole process, so an action's allocation
+    sites also include memory allocated by other threads while it ran.
+    """
+    if not ENABLED or getattr(_local, "active", None):
+        return None  # Nested actions are already covered by the outer profile
+    if not _profiler_lock.acquire(blocking=False):
+        return None  # Another thread's action is being profiled
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _local.active = name
+    profiler = cProfile.Profile()
+    _local.profiler = profiler
+    snapshot = tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+    profiler.enable()
+    return name, profiler, snapshot
+
+def stop_action(token):
+    """Stop profiling an action and add the results to its report."""
+    if token is None:
+        return
+    name, profiler, before = token
+    profiler.disable()
+    _local.active = _local.profiler = None
+    after = tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+    _profiler_lock.release()
+    allocation_diff = after.compare_to(before, "lineno")
+
+    with _lock:
+        action = _actions.setdefault(name, {"calls": 0, "stats": None, "allocations": {}})
+        action["calls"] += 1
+        if action["stats"] is None:
+            action["stats"] = pstats.Stats(profiler)
+        else:
+            action["stats"].add(profiler)
+        for stat in allocation_diff:
+            if stat.size_diff > 0:
+                site = str(stat.traceback)
+                size, count = action["allocations"].get(site, (0, 0))
+                action["allocations"][site] = (size + stat.size_diff, count + stat.count_diff)
+
+@contextlib.contextmanager
+def profile_action(name):
+    """Context manager that profiles the enclosed block as the named action."""
+    token = start_action(name)
+    try:
+        yield
+    finally:
+        stop_action(token)
+
+@contextlib.contextmanager
+def paused():
+    """Context manager that leaves the enclosed block out of the current thread's profile."""
+    profiler = getattr(_local, "profiler", None)
+    if profiler is None:
+        yield
+        return
+    profiler.disable()
+    try:
+        yield
+    finally:
+        profiler.enable()
+
+def unprofiled(func):
+    """Decorator for functions that wait on the user, so the wait is not timed as part of an action."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with paused():
+            return func(*args, **kwargs)
+    return wrapper
+
+@unprofiled
+def read_input(prompt=""):
+    """input() that leaves the wait for the user out of the current action's profile."""
+    return input(prompt)
+
+def profiled(name=None):
+    """Decorator that profiles every call of a function as one action."""
+    def decorator(func):
+        action_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with profile_action(action_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def format_report(name):
+    """Return the text report for one action."""
+    action = _actions[name]
+    output = io.StringIO()
+    output.write(f"Action: {name}\n")
+    output.write(f"Calls: {action['calls']}\n\n")
+    output.write(f"Top {TOP_FUNCTIONS} functions by cumulative time:\n")
+    action["stats"].stream = output
+    action["stats"].sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+    output.write(f"Top {TOP_ALLOCATIONS} allocation sites (memory still held at the end of each call):\n")
+    allocations = sorted(action["allocations"].items(), key=lambda item: item[1][0], reverse=True)
+    for site, (size, count) in allocations[:TOP_ALLOCATIONS]:
+        output.write(f"- {site}: {size / 1024:.1f} KiB in {count} blocks\n")
+    return output.getvalue()
+
+def write_reports(directory=None):
+    """Write one text report (and a raw .prof file) per profiled action."""
+    directory = directory or PROFILE_DIR
+    with _lock:
+        names = list(_actions)
+    if not names:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for name in names:
+        file_stem = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", name))
+        with open(f"{file_stem}.txt", "w", encoding="utf-8") as file:
+            file.write(format_report(name))
+        _actions[name]["stats"].dump_stats(f"{file_stem}.prof")
+        written.append(f"{file_stem}.txt")
+    return written
+
+if ENABLED:
+    enable()
@@ -0,0 +1,203 @@
+"""Elo-style skill ratings for users and difficulty ratings for terms (a one-parameter IRT model)."""
+import argparse
+import math
+import sys
+import time
+
+import history
+
+DEFAULT_SKILL = 0.0
+DEFAULT_DIFFICULTY = 0.0
+STEP = 0.4  # Size of the first online update; later updates shrink as evidence accumulates
+MIN_STEP = 0.04
+STEP_DECAY = 0.05
+MIN_RATED_ANSWERS = 20  # Fewer rated answers than this are not enough to trust a skill estimate
+PRIOR = 1.0  # Pulls skills and difficulties toward 0 in the batch fit, so a few answers cannot push them far
+FIT_ITERATIONS = 30  # Most fits stop well before this, once no rating moves by more than FIT_TOLERANCE
+FIT_TOLERANCE = 1e-3
+
+# Levels by the chance of answering a term of average difficulty, matching the old accuracy bands
+LEVELS = ((0.4, "Beginner"), (0.7, "Intermediate"), (0.9, "Advanced"))
+TOP_LEVEL = "Expert"
+
+def predict(skill, difficulty):
+    """Return the modelled chance that a user with `skill` answers a term with `difficulty` correctly."""
+    return 1.0 / (1.0 + math.exp(difficulty - skill))
+
+def _step(count):
+    return max(MIN_STEP, STEP / (1 + STEP_DECAY * count))
+
+def update(user, term_data, correct):
+    """Update a user's skill and a term's difficulty after one graded answer, in constant time.
+
+    The term's difficulty is kept on the user's own copy of the term; refit_store() pools the
+    answers of every user who studies the same term.
+    """
+    user_rating = user.setdefault("rating", {"skill": DEFAULT_SKILL, "answers": 0})
+    term_answers = term_data["total"] if "difficulty" in term_data else 0  # A term's first rating starts from scratch
+    difficulty = term_data.get("difficulty", DEFAULT_DIFFICULTY)
+    surprise = (1.0 if correct else 0.0) - predict(user_rating["skill"], difficulty)
+    user_rating["skill"] += _step(user_rating["answers"]) * surprise
+    user_rating["answers"] += 1
+    term_data["difficulty"] = difficulty - _step(term_answers) * surprise
+
+def get_skill(user):
+    """Return a user's skill rating, or None if it rests on too few answers."""
+    user_rating = user.get("rating") if user is not None else None
+    if user_rating is None or user_rating["answers"] < MIN_RATED_ANSWERS:
+        return None
+    return user_rating["skill"]
+
+def estimate_skill(user, total_correct, total_attempts):
+    """Return a user's skill rating, or one implied by their accuracy if they are not rated yet."""
+    skill = get_skill(user)
+    if skill is None and total_attempts > 0:
+        accuracy = (total_correct + 1) / (total_attempts + 2)  # Smoothed, so 0% and 100% stay finite
+        skill = math.log(accuracy / (1 - accuracy))
+    return skill
+
+def skill_level(skill):
+    """Return the level name for a skill rating."""
+    if skill is None:
+        return "Unranked"
+    chance = predict(skill, DEFAULT_DIFFICULTY)
+    for limit, level in LEVELS:
+        if chance <= limit:
+            return level
+    return TOP_LEVEL
+
+def fit(users, terms, successes, trials, user_count, term_count, iterations=FIT_ITERATIONS, prior=PRIOR):
+    """Fit skills and difficulties to (user, term, correct answers, attempts) rows; returns both arrays.
+
+    Maximizes the penalized logistic likelihood with alternating per-parameter Newton steps. Every
+    step is a handful of vectorized passes over the rows, so millions of rows take a few seconds.
+    """
+    import numpy as np  # Only the batch refit needs NumPy; online updates run without it
+
+    successes = np.asarray(successes, dtype=np.float64)
+    trials = np.asarray(trials, dtype=np.float64)
+    skills = np.zeros(user_count)
+    difficulties = np.zeros(term_count)
+    for _ in range(iterations):
+        chance = 1.0 / (1.0 + np.exp(difficulties[terms] - skills[users]))
+        residual = successes - trials * chance
+        weight = trials * chance * (1.0 - chance)
+        skill_step = (np.bincount(users, residual, user_count) - prior * skills) / (np.bincount(users, weight, user_count) + prior)
+        skills += skill_step
+        chance = 1.0 / (1.0 + np.exp(difficulties[terms] - skills[users]))
+        residual = successes - trials * chance
+        weight = trials * chance * (1.0 - chance)
+        difficulty_step = (np.bincount(terms, residual, term_count) + prior * difficulties) / (np.bincount(terms, weight, term_count) + prior)
+        difficulties -= difficulty_step
+        if max(np.abs(skill_step).max(initial=0.0), np.abs(difficulty_step).max(initial=0.0)) < FIT_TOLERANCE:
+            break
+    return skills, difficulties
+
+def _history_rows(counters, directory):
+    """Return (users, terms, successes, trials) with one row per logged answer that can be rated."""
+    import numpy as np
+
+    user_ids = {username: index for index, username in enumerate(counters["usernames"])}
+    term_ids = {term: index for index, term in enumerate(counters["terms"])}
+    rated_verdicts = np.array([verdict in {"correct", "almost", "incorrect"} for verdict in history.VERDICTS])
+    correct_verdict = history.VERDICTS.index("correct")
+    parts = []
+    for names, columns in history.iter_segments(directory):
+        user_lookup = np.array([user_ids.get(name, -1) for name in names["user"]], dtype=np.int64)
+        term_lookup = np.array([term_ids.get(name.lower(), -1) for name in names["term"]], dtype=np.int64)
+        users = user_lookup[np.frombuffer(columns["user"], dtype=np.uint32)]
+        terms = term_lookup[np.frombuffer(columns["term"], dtype=np.uint32)]
+        verdicts = np.frombuffer(columns["verdict"], dtype=np.uint8)
+        keep = (users >= 0) & (terms >= 0) & rated_verdicts[verdicts]
+        parts.append((users[keep], terms[keep], (verdicts[keep] == correct_verdict).astype(np.int64)))
+    if not parts:
+        return None
+    users, terms, successes = (np.concatenate(column) for column in zip(*parts))
+    return users, terms, successes, np.ones(len(users), dtype=np.int64)
+
+def refit_store(user_data, history_dir=None, iterations=FIT_ITERATIONS):
+    """Refit every rating from scratch and write the skills and difficulties back into the user data.
+
+    Rows come from each term's correct/total counters, or from the answer history when `history_dir`
+    is given. Terms are pooled across users by their lowercase text. Returns (users, rows) fitted.
+    """
+    import numpy as np
+    import analytics  # Imported here because analytics imports flashcards, which imports this module
+
+    counters = analytics.load_counters(user_data)
+    rows = _history_rows(counters, history_dir) if history_dir is not None else None
+    if rows is None:
+        rows = (counters["set_user"][counters["term_set"]], counters["term_id"], counters["term_correct"], counters["term_total"])
+    users, terms, successes, trials = rows
+    attempted = trials > 0
+    users, terms, successes, trials = users[attempted], terms[attempted], successes[attempted], trials[attempted]
+    user_count = len(counters["usernames"])
+    term_count = len(counters["terms"])
+    skills, difficulties = fit(users, terms, successes, trials, user_count, term_count, iterations)
+
+    user_answers = np.bincount(users, trials, user_count).astype(int).tolist()
+    term_answers = np.bincount(terms, trials, term_count).tolist()
+    skills = skills.tolist()
+    difficulties = difficulties.tolist()
+    term_ids = iter(counters["term_id"].tolist())
+    for username, skill, answers in zip(counters["usernames"], skills, user_answers):
+        user = user_data[username]
+        if answers:
+            user["rating"] = {"skill": round(skill, 4), "answers": answers}
+        else:
+            user.pop("rating", None)
+        # load_counters() flattened the terms in this same order
+        for flashcard_set in user["flashcard_sets"].values():
+            for term_data in flashcard_set["terms"].values():
+                term_id = next(term_ids)
+                if term_answers[term_id]:
+                    term_data["difficulty"] = round(difficulties[term_id], 4)
+                else:
+                    term_data.pop("difficulty", None)
+    return sum(answers > 0 for answers in user_answers), len(trials)
+
+def run_benchmark(answers, users=10000, terms=50000, seed=0):
+    """Fit synthetic answers drawn from known ratings and report the time and the recovered accuracy."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    true_skills = rng.normal(0.0, 1.0, users)
+    true_difficulties = rng.normal(0.0, 1.0, terms)
+    user_rows = rng.integers(0, users, answers)
+    term_rows = rng.integers(0, terms, answers)
+    successes = (rng.random(answers) < 1.0 / (1.0 + np.exp(true_difficulties[term_rows] - true_skills[user_rows]))).astype(np.int64)
+    start = time.perf_counter()
+    skills, difficulties = fit(user_rows, term_rows, successes, np.ones(answers, dtype=np.int64), users, terms)
+    seconds = time.perf_counter() - start
+    return {
+        "answers": answers,
+        "seconds": round(seconds, 2),
+        "skill_correlation": round(float(np.corrcoef(skills, true_skills)[0, 1]), 3),
+        "difficulty_correlation": round(float(np.corrcoef(difficulties, true_difficulties)[0, 1]), 3),
+    }
+
+def main(argv=None):
+    """Refit all ratings in a user data file, or benchmark the batch fit."""
+    from flashcards import USER_DATA_FILE, load_user_data, save_user_data
+    parser = argparse.ArgumentParser(description="Refit user skill and term difficulty ratings.")
+    parser.add_argument("--data", default=USER_DATA_FILE, help="User data file to refit and save")
+    parser.add_argument("--history", nargs="?", const=history.HISTORY_DIR, help="Fit on the logged answers in this directory instead of the counters")
+    parser.add_argument("--iterations", type=int, default=FIT_ITERATIONS, help="Newton iterations of the batch fit")
+    parser.add_argument("--benchmark", type=int, metavar="ANSWERS", help="Time the batch fit on this many synthetic answers and exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark)
+        print(f"Fitted {result['answers']} answers in {result['seconds']} s "
+              f"(correlation with the true skills {result['skill_correlation']}, difficulties {result['difficulty_correlation']})")
+        return 0
+
+    user_data = load_user_data(args.data)
+    start = time.perf_counter()
+    rated_users, rows = refit_store(user_data, args.history, args.iterations)
+    print(f"Rated {rated_users} of {len(user_data)} users from {rows} rows in {time.perf_counter() - start:.1f} s")
+    save_user_data(user_data, args.data)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Rebuild every user's set stats, level and achievements, and the leaderboard, on a process pool."""
+import argparse
+import collections
+import concurrent.futures
+import heapq
+import gzip
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import generate_data
+from flashcards import (
+    USER_DATA_FILE, build_leaderboard, calculate_achievements, calculate_user_level, iter_user_data,
+    leaderboard_key, load_user_data, replace_store, save_user_stream,
+)
+
+CHUNK_USERS = 100  # Users sent to a worker at a time
+COMPRESS_LEVEL = 6  # Matches save_user_stream
+LEADERBOARD_FILE = "leaderboard.json"
+
+def rebuild_user(user):
+    """Recompute a user's set stats from the term counters, then their level and achievements.
+
+    The level and achievements are stored on the user as a snapshot of the rebuild.
+    """
+    flashcard_sets = user["flashcard_sets"]
+    for flashcard_set in flashcard_sets.values():
+        correct = total = 0
+        for term_data in flashcard_set["terms"].values():
+            correct += term_data["correct"]
+            total += term_data["total"]
+        flashcard_set["stats"] = {"correct": correct, "total": total, "percentage": correct / total * 100 if total else 0.0}
+    user["level"] = calculate_user_level(flashcard_sets, user)
+    user["achievements"] = calculate_achievements(flashcard_sets)
+    return user
+
+def _rebuild_chunk(lines, first):
+    """Worker: rebuild a chunk of users given as '"name": {...}' JSON lines.
+
+    Returns the rebuilt users as one compressed gzip member, their count and a sorted partial
+    leaderboard. Compressing here keeps the main process down to reading and writing bytes.
+    """
+    users = json.loads("{" + ",".join(lines) + "}")
+    for user in users.values():
+        rebuild_user(user)
+    text = ",".join(f"\n{json.dumps(username)}: {json.dumps(user)}" for username, user in users.items())
+    member = gzip.compress(("" if first else ",").encode("utf-8") + text.encode("utf-8"), COMPRESS_LEVEL)
+    return member, len(users), build_leaderboard(users)
+
+def _user_lines(file_name):
+    """Yield each user of a store as '"name": {...}' JSON text.
+
+    Stores written one user per line (save_user_stream, generate_data) are split into lines without
+    being decoded, so all parsing happens in the workers. Other stores, such as the indented files
+    written by save_user_data, are decoded and re-encoded here.
+    """
+    with gzip.open(file_name, "rt", encoding="utf-8") as file:
+        first_line = file.readline()
+        second_line = file.readline()
+        if first_line.strip() == "{" and second_line.startswith('"'):
+            for line in itertools.chain([second_line], file):
+                line = line.strip().rstrip(",")
+                if line and line != "}":
+                    yield line
+            return
+    for username, user in iter_user_data(file_name):
+        yield f"{json.dumps(username)}: {json.dumps(user)}"
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _show_progress(users, start):
+    elapsed = time.perf_counter() - start
+    print(f"\rRebuilt {users} users ({users / elapsed if elapsed else 0:.0f} users/s)", end="", flush=True)
+
+def rebuild_store(file_name=USER_DATA_FILE, output=None, leaderboard_file=LEADERBOARD_FILE, workers=None, chunk_users=CHUNK_USERS, progress=True):
+    """Rebuild a whole store on a process pool and return the number of users.
+
+    Map: the main process streams users to the workers in chunks, with at most two chunks per
+    worker in flight, and each worker rebuilds its chunk into a compressed gzip member and a partial
+    leaderboard. Reduce: the members are written in order as one multi-member gzip file (which
+    load_user_data reads like any other), and the sorted partial leaderboards are merged.
+    """
+    workers = workers or os.cpu_count() or 1
+    output = output or file_name
+    partials = []
+    users = 0
+    start = time.perf_counter()
+    file_descriptor, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        with os.fdopen(file_descriptor, "wb") as file, concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            file.write(gzip.compress(b"{", COMPRESS_LEVEL))
+            pending = collections.deque()
+            for number, chunk in enumerate(_chunks(_user_lines(file_name), chunk_users)):
+                pending.append(executor.submit(_rebuild_chunk, chunk, number == 0))
+                while pending and (len(pending) >= 2 * workers or pending[0].done()):
+                    member, count, partial = pending.popleft().result()
+                    file.write(member)
+                    partials.append(partial)
+                    users += count
+                    if progress:
+                        _show_progress(users, start)
+            while pending:
+                member, count, partial = pending.popleft().result()
+                file.write(member)
+                partials.append(partial)
+                users += count
+                if progress:
+                    _show_progress(users, start)
+            file.write(gzip.compress(b"\n}\n", COMPRESS_LEVEL))
+        replace_store(temp_file_name, output)
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
+    if progress:
+        print()
+    # Each partial leaderboard is already sorted, so merging them is a single pass
+    leaderboard = list(heapq.merge(*partials, key=leaderboard_key, reverse=True))
+    if leaderboard_file:
+        with open(leaderboard_file, "w", encoding="utf-8") as file:
+            json.dump(leaderboard, file, indent=4)
+    return users
+
+def rebuild_store_serially(file_name=USER_DATA_FILE, output=None, leaderboard_file=LEADERBOARD_FILE):
+    """Rebuild a whole store in one process, loading it into memory; returns the number of users."""
+    user_data = load_user_data(file_name)
+    for user in user_data.values():
+        rebuild_user(user)
+    leaderboard = build_leaderboard(user_data)
+    save_user_stream(user_data.items(), output or file_name)  # Same writer as the pool, so the benchmark compares like with like
+    if leaderboard_file:
+        with open(leaderboard_file, "w", encoding="utf-8") as file:
+            json.dump(leaderboard, file, indent=4)
+    return len(user_data)
+
+def run_benchmark(users, workers=None):
+    """Rebuild a generated store serially and on the pool, and report both times and the speedup."""
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "user_data.json.gz")
+        generate_data.write_user_data(file_name, users)
+        leaderboards = [os.path.join(directory, "serial.json"), os.path.join(directory, "parallel.json")]
+        start = time.perf_counter()
+        rebuild_store_serially(file_name, os.path.join(directory, "serial.json.gz"), leaderboards[0])
+        serial_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        rebuild_store(file_name, os.path.join(directory, "parallel.json.gz"), leaderboards[1], workers, progress=False)
+        parallel_seconds = time.perf_counter() - start
+        matching = [json.load(open(leaderboard, encoding="utf-8")) for leaderboard in leaderboards]
+    return {
+        "users": users,
+        "workers": workers or os.cpu_count() or 1,
+        "serial_seconds": round(serial_seconds, 2),
+        "parallel_seconds": round(parallel_seconds, 2),
+        "speedup": round(serial_seconds / parallel_seconds, 2),
+        "leaderboards_match": matching[0] == matching[1],
+    }
+
+def main(argv=None):
+    """Rebuild a store from the command line, or benchmark the rebuild."""
+    parser = argparse.ArgumentParser(description="Recompute stats, levels, achievements and the leaderboard for every user.")
+    parser.add_argument("--data", default=USER_DATA_FILE, help="User data file to rebuild")
+    parser.add_argument("--output", help="Where to write the rebuilt store (default: overwrite --data)")
+    parser.add_argument("--leaderboard", default=LEADERBOARD_FILE, help="Where to write the leaderboard (JSON)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--serial", action="store_true", help="Rebuild in this process without a pool")
+    parser.add_argument("--benchmark", type=int, metavar="USERS", help="Compare the serial and parallel rebuild on a generated store and exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark, args.workers)
+        print(f"{result['users']} users: serial {result['serial_seconds']} s, {result['workers']} workers {result['parallel_seconds']} s "
+              f"({result['speedup']}x); leaderboards match: {result['leaderboards_match']}")
+        return 0
+    start = time.perf_counter()
+    if args.serial:
+        users = rebuild_store_serially(args.data, args.output, args.leaderboard)
+    else:
+        users = rebuild_store(args.data, args.output, args.leaderboard, args.workers)
+    print(f"Rebuilt {users} users in {time.perf_counter() - start:.1f} s; leaderboard written to {args.leaderboard}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,204 @@
 import streamlit as st
-import hashlib
+import concurrent.futures
+import io
 import json
-import os
-import gzip
 import csv
-import datetime
-import random
-import difflib
-
-# Helper functions
-def hash_password(password):
-    """Hash a password using SHA-256."""
-    return hashlib.sha256(password.encode("utf-8")).hexdigest()
-
-def verify_password(stored_password, provided_password):
-    """Verify a provided password against the stored hashed password."""
-    return stored_password == hash_password(provided_password)
-
-def load_user_data():
-    """Load user data from a compressed JSON file."""
-    if os.path.exists("user_data.json.gz"):
-        with gzip.open("user_data.json.gz", "rt", encoding="utf-8") as file:
-            return json.load(file)
-    return {}
-
-def save_user_data(user_data):
-    """Save user data to a compressed JSON file."""
-    with gzip.open("user_data.json.gz", "wt", encoding="utf-8") as file:
-        json.dump(user_data, file, indent=4)
+import daily_challenge
+import sys
+import engine
+import history
+import text_index
+import metrics
+import passwords
+import profiling
+import rating
+import versions
+import views
+
+# Helper functions (shared with the command-line program)
+from flashcards import hash_password, verify_password, load_user_data, save_user_data, parse_bulk_terms, diff_bulk_terms, apply_bulk_edit, strip_local_keys
+
+PLAY_SAVE_EVERY = 10  # Graded answers kept in the session before they are saved
+
+PICKER_LIMIT = 100  # Most set names a selectbox shows at once
+PAGE_SIZES = [25, 50, 100]
+BULK_PREVIEW_ROWS = 500  # Changes listed in the bulk edit preview; the counts cover all of them
+
+def pick_flashcard_set(set_view):
+    """Select a set, filtering by name first when there are too many to list."""
+    if len(set_view["sorted_names"]) <= PICKER_LIMIT:
+        return st.selectbox("Select a Flashcard Set", set_view["sorted_names"])
+    query = st.text_input("Filter sets by name")
+    return st.selectbox("Select a Flashcard Set", views.matching_names(set_view, query, PICKER_LIMIT))
+
+def show_page(view, key, sort_keys, category=None, query="", descending_default=False):
+    """Render sorting and paging controls and return the rows of the current page."""
+    sort_column, order_column, size_column = st.columns(3)
+    sort_key = sort_column.selectbox("Sort by", list(sort_keys), key=f"{key}_sort")
+    descending = order_column.checkbox("Descending", value=descending_default, key=f"{key}_descending")
+    page_size = size_column.selectbox("Per page", PAGE_SIZES, key=f"{key}_page_size")
+    page_key = f"{key}_page"
+    rows, page_count, matching = views.get_page(view, sort_key, descending, st.session_state.get(page_key, 1), page_size, category, query)
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    st.number_input(f"Page (of {page_count}, {matching} rows)", min_value=1, max_value=page_count, key=page_key)
+    return rows
+
+@st.cache_resource
+def get_password_pool():
+    """Return the bounded thread pool that checks passwords for every browser session.
+
+    PBKDF2 releases the GIL, so a class logging in at once is verified a few at a time on
+    LOGIN_WORKERS threads while other sessions keep running.
+    """
+    return concurrent.futures.ThreadPoolExecutor(max_workers=passwords.LOGIN_WORKERS, thread_name_prefix="password")
+
+@st.cache_resource
+def get_answer_log():
+    """Return the answer history log shared by every browser session."""
+    return history.AnswerLog()
+
+def load_dedup():
+    """Return the dedup module, or None when NumPy is not installed."""
+    try:
+        import dedup  # Needs NumPy; imported here so the rest of the app runs without it
+    except ImportError:
+        return None
+    return dedup
+
+def review_duplicates(flashcard_set, uploaded_file, flashcard_sets):
+    """Show near-duplicate terms of a set being imported; return the report if they should be merged.
+
+    The report is kept in the session for this upload and store version, so typing a set name
+    does not run the detection again.
+    """
+    dedup = load_dedup()
+    if dedup is None:
+        st.info("Install NumPy to check imported sets for near-duplicate terms.")
+        return None
+    cache_key = (getattr(uploaded_file, "file_id", uploaded_file.name), uploaded_file.size, views.store_version())
+    cached = st.session_state.get("duplicate_report")
+    if cached is None or cached[0] != cache_key:
+        cached = (cache_key, dedup.dedup_report(flashcard_set, flashcard_sets))
+        st.session_state.duplicate_report = cached
+    report = cached[1]
+    duplicates = [row for row in report if row["action"] == "merge" and row["source"] == "import"]
+    if not duplicates:
+        return None
+    st.warning(f"{len(duplicates)} terms look like duplicates of other terms.")
+    st.dataframe([{"Term": row["term"], "Looks like": row["kept_term"], "In set": row["kept_set"], "Similarity": row["similarity"]} for row in duplicates])
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(report[0]))
+    writer.writeheader()
+    writer.writerows(report)
+    st.download_button("Download Duplicate Report", output.getvalue(), file_name="duplicates.csv", mime="text/csv")
+    return report if st.checkbox("Merge duplicates on import", value=True) else None
+
+def bulk_edit(flashcard_set, set_history, user_data):
+    """Preview pasted or uploaded "term<TAB>definition" lines against a set and apply them with one save."""
+    with st.expander("Bulk Edit"):
+        uploaded_file = st.file_uploader("Upload term<TAB>definition lines", type=["txt", "tsv"], key="bulk_file")
+        text = uploaded_file.getvalue().decode("utf-8") if uploaded_file else st.text_area("Or paste one term<TAB>definition per line", key="bulk_text")
+        if not text.strip():
+            return
+        new_terms, problems = parse_bulk_terms(text)
+        if problems:
+            st.warning("\n".join(problems[:10]) + (f"\n...and {len(problems) - 10} more problems." if len(problems) > 10 else ""))
+        changes = diff_bulk_terms(flashcard_set, new_terms)
+        added_column, changed_column, removed_column, unchanged_column = st.columns(4)
+        added_column.metric("Added", len(changes["added"]))
+        changed_column.metric("Changed", len(changes["changed"]))
+        removed_column.metric("Removed", len(changes["removed"]))
+        unchanged_column.metric("Unchanged", changes["unchanged"])
+        preview = [{"Change": "Added", "Term": term, "Old Definition": "", "New Definition": definition} for term, definition in changes["added"].items()][:BULK_PREVIEW_ROWS]
+        preview += [{"Change": "Changed", "Term": term, "Old Definition": old, "New Definition": new} for term, (old, new) in changes["changed"].items()][:BULK_PREVIEW_ROWS - len(preview)]
+        preview += [{"Change": "Removed", "Term": term, "Old Definition": flashcard_set["terms"][term]["definition"], "New Definition": ""} for term in changes["removed"][:BULK_PREVIEW_ROWS - len(preview)]]
+        if not preview:
+            st.info("The flashcard set already matches these terms.")
+            return
+        st.dataframe(preview)
+        remove = st.checkbox("Remove terms that are not in the list", value=False, disabled=not changes["removed"])
+        if st.button("Apply Bulk Edit"):
+            set_history.snapshot(flashcard_set, "Before editing")
+            touched = apply_bulk_edit(flashcard_set, changes, remove)
+            set_history.snapshot(flashcard_set, "Bulk edit", touched)
+            save_user_data(user_data)
+            st.success(f"Updated {len(touched)} terms.")
+
+def show_versions(flashcard_set, set_history, user_data):
+    """List a set's saved versions and let the user compare two of them or roll back."""
+    with st.expander("Versions"):
+        if not set_history.versions:
+            st.write("No versions have been saved yet.")
+            return
+        st.table([
+            {"Version": version["number"], "Saved": version["time"].replace("T", " "), "Change": version["label"], "Terms": version["terms"],
+             "Added": version["added"], "Changed": version["changed"], "Removed": version["removed"]}
+            for version in reversed(set_history.versions)
+        ])
+        numbers = [version["number"] for version in set_history.versions]
+        old_column, new_column = st.columns(2)
+        old_number = old_column.selectbox("Compare version", numbers, index=max(0, len(numbers) - 2))
+        new_number = new_column.selectbox("With version", numbers, index=len(numbers) - 1)
+        summary = set_history.diff(old_number, new_number)
+        for kind, terms in summary.items():
+            st.write(f"{kind.capitalize()}: {len(terms)}" + (f" ({', '.join(terms[:20])}{', ...' if len(terms) > 20 else ''})" if terms else ""))
+        if st.button(f"Roll Back to Version {old_number}"):
+            set_history.rollback(flashcard_set, old_number)
+            text_index.update_keyword_index(flashcard_set)
+            save_user_data(user_data)
+            st.success(f"Rolled back to version {old_number}. The terms before the rollback were kept as a version.")
+
+def import_with_versions(user_flashcard_sets, set_name, flashcard_set):
+    """Store an imported set, keeping the set it replaces as a version that can be rolled back to."""
+    set_history = versions.SetHistory(st.session_state.username, set_name)
+    if set_name in user_flashcard_sets:
+        set_history.snapshot(user_flashcard_sets[set_name], "Before import")
+    set_history.snapshot(flashcard_set, "Imported")
+    user_flashcard_sets[set_name] = flashcard_set
+
+def start_play_session(set_name, flashcard_set, user, username):
+    """Start a GameSession for a set, kept in st.session_state across reruns.
+
+    The session grades a private copy of the set's counters, since every rerun loads the store
+    again. Its on_answer callback logs each answer and queues it for save_pending_results, which
+    applies the queued answers to the freshly loaded store in one write.
+    """
+    session_set = {**flashcard_set, "terms": {term: dict(term_data) for term, term_data in flashcard_set["terms"].items()}, "stats": dict(flashcard_set["stats"])}
+    play = {
+        "set_name": set_name,
+        "pending": [],  # Graded (term, correct) pairs not saved yet
+        "last_result": None,
+    }
+    log_answer = get_answer_log().recorder(username, set_name, engine.GameSession.mode)
+
+    def on_answer(verdict):
+        log_answer(verdict)
+        play["pending"].append((verdict["term"], verdict["correct"]))
+
+    # The ratings and daily challenge are updated on save, so the session gets the user's skill but not the user
+    order = engine.prioritize_terms(session_set, rating.get_skill(user))
+    play["session"] = engine.GameSession(session_set, order, on_answer=on_answer)
+    return play
+
+def save_pending_results(play, user_data, username):
+    """Add the session's graded answers to the set's counters and ratings and save them in one write."""
+    if not play["pending"]:
+        return
+    flashcard_set = user_data[username]["flashcard_sets"].get(play["set_name"])
+    if flashcard_set is not None:
+        for term, correct in play["pending"]:
+            if term in flashcard_set["terms"]:  # The term may have been deleted meanwhile
+                engine.record_result(flashcard_set, term, correct)
+                rating.update(user_data[username], flashcard_set["terms"][term], correct)  # After the counters move, as in StudySession.submit
+        daily_challenge.record_correct_answers(user_data[username], sum(correct for _, correct in play["pending"]))
+        save_user_data(user_data)
+    play["pending"] = []
 
 # Streamlit app
+metrics.configure_from_environment()
+if "--profile" in sys.argv[1:]:  # streamlit run streamlitfc.py -- --profile
+    profiling.enable()
 st.title("Flashcards Application")
 
 # Authentication
@@ -42,7 +211,9 @@ if st.session_state.username is None:
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
-        if username in user_data and verify_password(user_data[username]["password"], password):
+        if username in user_data and get_password_pool().submit(verify_password, user_data[username]["password"], password).result():
+            if get_password_pool().submit(passwords.upgrade_password, user_data[username], password).result():
+                save_user_data(user_data)  # Replace an old or cheaper hash now that the password is known
             st.session_state.username = username
             st.success(f"Welcome back, {username}!")
         else:
@@ -51,7 +222,7 @@ if st.session_state.username is None:
         if username in user_data:
             st.error("Username already exists.")
         else:
-            hashed_password = hash_password(password)
+            hashed_password = get_password_pool().submit(hash_password, password).result()
             user_data[username] = {"password": hashed_password, "flashcard_sets": {}}
             save_user_data(user_data)
             st.session_state.username = username
@@ -60,110 +231,172 @@ if st.session_state.username is None:
 if st.session_state.username:
     st.sidebar.title(f"Welcome, {st.session_state.username}")
     user_flashcard_sets = user_data[st.session_state.username]["flashcard_sets"]
+    # Sorted views are rebuilt only after the store has been saved
+    set_view = views.cached_view(f"sets:{st.session_state.username}", views.store_version(), lambda: views.build_set_view(user_flashcard_sets))
 
     # Sidebar navigation
     menu = st.sidebar.radio("Menu", ["Create Flashcard Set", "View Flashcard Sets", "Play Flashcards", "Edit Flashcard Set", "Delete Flashcard Set", "Account Management", "Daily Challenge", "Leaderboard", "Import/Export Flashcards"])
 
-    if menu == "Create Flashcard Set":
-        st.subheader("Create a New Flashcard Set")
-        set_name = st.text_input("Flashcard Set Name")
-        category = st.text_input("Category")
-        if st.button("Create Set"):
-            if set_name in user_flashcard_sets:
-                st.error("Flashcard set already exists.")
-            else:
-                user_flashcard_sets[set_name] = {"category": category, "terms": {}, "stats": {"correct": 0, "total": 0, "percentage": 0.0}}
-                save_user_data(user_data)
-                st.success(f"Flashcard set '{set_name}' created successfully!")
-
-    elif menu == "View Flashcard Sets":
-        st.subheader("View Flashcard Sets")
-        for set_name, flashcard_set in user_flashcard_sets.items():
-            st.write(f"Set: {set_name}, Category: {flashcard_set.get('category', 'Uncategorized')}, Correct: {flashcard_set['stats']['correct']}, Total: {flashcard_set['stats']['total']}")
-
-    elif menu == "Play Flashcards":
-        st.subheader("Play Flashcards")
-        set_name = st.selectbox("Select a Flashcard Set", list(user_flashcard_sets.keys()))
-        if set_name:
-            flashcard_set = user_flashcard_sets[set_name]
-            terms = list(flashcard_set["terms"].keys())
-            random.shuffle(terms)
-            for term in terms:
-                st.write(f"Term: {term}")
-                user_answer = st.text_input("Your Answer")
-                if st.button("Submit"):
-                    correct_answer = flashcard_set["terms"][term]["definition"]
-                    similarity = difflib.SequenceMatcher(None, user_answer.lower(), correct_answer.lower()).ratio()
-                    flashcard_set["terms"][term]["total"] += 1
-                    flashcard_set["stats"]["total"] += 1
-                    if similarity > 0.7:
-                        flashcard_set["terms"][term]["correct"] += 1
-                        flashcard_set["stats"]["correct"] += 1
-                        st.success("Correct!")
-                    else:
-                        st.error(f"Incorrect. Correct answer: {correct_answer}")
+    # Save answers still held by the play queue when leaving the page
+    if menu != "Play Flashcards" and "play" in st.session_state:
+        save_pending_results(st.session_state.play, user_data, st.session_state.username)
+
+    with profiling.profile_action(f"streamlit {menu}"):
+        if menu == "Create Flashcard Set":
+            st.subheader("Create a New Flashcard Set")
+            set_name = st.text_input("Flashcard Set Name")
+            category = st.text_input("Category")
+            grading = st.selectbox("Grading", list(engine.GRADING_MODES), format_func=engine.GRADING_MODES.get)
+            if st.button("Create Set"):
+                if set_name in user_flashcard_sets:
+                    st.error("Flashcard set already exists.")
+                else:
+                    user_flashcard_sets[set_name] = {"category": category, "grading": grading, "terms": {}, "stats": {"correct": 0, "total": 0, "percentage": 0.0}}
                     save_user_data(user_data)
+                    st.success(f"Flashcard set '{set_name}' created successfully!")
 
-    elif menu == "Edit Flashcard Set":
-        st.subheader("Edit Flashcard Set")
-        set_name = st.selectbox("Select a Flashcard Set", list(user_flashcard_sets.keys()))
-        if set_name:
-            flashcard_set = user_flashcard_sets[set_name]
-            term = st.text_input("Term")
-            definition = st.text_input("Definition")
-            if st.button("Add Term"):
-                flashcard_set["terms"][term] = {"definition": definition, "correct": 0, "total": 0}
-                save_user_data(user_data)
-                st.success(f"Term '{term}' added successfully!")
+        elif menu == "View Flashcard Sets":
+            st.subheader("View Flashcard Sets")
+            filter_column, category_column = st.columns(2)
+            query = filter_column.text_input("Filter by name")
+            category = category_column.selectbox("Category", ["All"] + sorted(set_view["categories"]))
+            if category != "All":
+                category_stats = set_view["category_index"].stats(category)
+                st.caption(f"{category_stats['sets']} sets, {category_stats['terms']} terms, {category_stats['correct']}/{category_stats['total']} correct ({category_stats['percentage']:.2f}%)")
+            rows = show_page(set_view, "view_sets", views.SET_SORT_KEYS, None if category == "All" else category, query)
+            st.table([
+                {"Set": row["name"], "Category": row["category"], "Terms": row["terms"], "Correct": row["correct"], "Total": row["total"], "Accuracy (%)": round(row["percentage"], 2)}
+                for row in rows
+            ])
 
-    elif menu == "Delete Flashcard Set":
-        st.subheader("Delete Flashcard Set")
-        set_name = st.selectbox("Select a Flashcard Set", list(user_flashcard_sets.keys()))
-        if st.button("Delete Set"):
-            del user_flashcard_sets[set_name]
-            save_user_data(user_data)
-            st.success(f"Flashcard set '{set_name}' deleted successfully!")
+        elif menu == "Play Flashcards":
+            st.subheader("Play Flashcards")
+            set_name = pick_flashcard_set(set_view)
+            if set_name:
+                flashcard_set = user_flashcard_sets[set_name]
+                play = st.session_state.get("play")
+                if play is None or play["set_name"] != set_name:
+                    if play is not None:
+                        save_pending_results(play, user_data, st.session_state.username)
+                    play = st.session_state.play = start_play_session(set_name, flashcard_set, user_data[st.session_state.username], st.session_state.username)
+                session = play["session"]
 
-    elif menu == "Account Management":
-        st.subheader("Account Management")
-        new_password = st.text_input("New Password", type="password")
-        if st.button("Change Password"):
-            user_data[st.session_state.username]["password"] = hash_password(new_password)
-            save_user_data(user_data)
-            st.success("Password updated successfully!")
-
-    elif menu == "Daily Challenge":
-        st.subheader("Daily Challenge")
-        today = datetime.date.today()
-        daily_challenge = {"date": today.isoformat(), "goal": 10, "progress": 0, "completed": False}
-        st.write(f"Date: {daily_challenge['date']}")
-        st.write(f"Goal: {daily_challenge['goal']}, Progress: {daily_challenge['progress']}, Completed: {daily_challenge['completed']}")
-
-    elif menu == "Leaderboard":
-        st.subheader("Leaderboard")
-        leaderboard = [{"username": username, "correct": sum(set["stats"]["correct"] for set in user_data[username]["flashcard_sets"].values())} for username in user_data]
-        leaderboard.sort(key=lambda x: x["correct"], reverse=True)
-        for rank, entry in enumerate(leaderboard, start=1):
-            st.write(f"{rank}. {entry['username']} - Correct Answers: {entry['correct']}")
-
-    elif menu == "Import/Export Flashcards":
-        st.subheader("Import/Export Flashcards")
-        uploaded_file = st.file_uploader("Upload a Flashcard Set (JSON or CSV)")
-        if uploaded_file:
-            if uploaded_file.name.endswith(".json"):
-                flashcard_set = json.load(uploaded_file)
-                set_name = st.text_input("Set Name")
-                if st.button("Import"):
-                    user_flashcard_sets[set_name] = flashcard_set
+                result = play["last_result"]
+                if result is not None:
+                    if result["verdict"] == "correct":
+                        st.success(f"{result['term']}: Correct!")
+                    elif result["verdict"] == "almost":
+                        st.warning(f"{result['term']}: Almost correct! Here's a hint: {result['hint']}...")
+                    else:
+                        st.error(f"{result['term']}: Incorrect. Correct answer: {result['correct_answer']}")
+
+                card = session.next_card()
+                if card is not None:
+                    st.write(f"Term: {card['term']}")
+                    st.caption(f"Card {card['number']} of {card['total']}")
+                    with st.form("play_card", clear_on_submit=True):
+                        user_answer = st.text_input("Your Answer")
+                        submitted = st.form_submit_button("Submit")
+                    if submitted:
+                        play["last_result"] = session.submit(user_answer)
+                        if len(play["pending"]) >= PLAY_SAVE_EVERY:
+                            save_pending_results(play, user_data, st.session_state.username)
+                        st.rerun()
+                    if play["pending"] and st.button("Save Progress"):
+                        save_pending_results(play, user_data, st.session_state.username)
+                        st.success("Progress saved!")
+                else:
+                    save_pending_results(play, user_data, st.session_state.username)
+                    st.write(f"You answered {session.score} out of {session.answered} questions correctly!")
+                    if st.button("Play Again"):
+                        del st.session_state.play
+                        st.rerun()
+
+        elif menu == "Edit Flashcard Set":
+            st.subheader("Edit Flashcard Set")
+            set_name = pick_flashcard_set(set_view)
+            if set_name:
+                flashcard_set = user_flashcard_sets[set_name]
+                modes = list(engine.GRADING_MODES)
+                grading = st.selectbox("Grading", modes, index=modes.index(flashcard_set.get("grading", "similarity")), format_func=engine.GRADING_MODES.get)
+                if grading != flashcard_set.get("grading", "similarity") and st.button("Change Grading"):
+                    flashcard_set["grading"] = grading
+                    text_index.update_keyword_index(flashcard_set)
                     save_user_data(user_data)
-                    st.success(f"Flashcard set '{set_name}' imported successfully!")
-            elif uploaded_file.name.endswith(".csv"):
-                flashcard_set = {"terms": {}, "stats": {"correct": 0, "total": 0, "percentage": 0.0}}
-                reader = csv.DictReader(uploaded_file)
-                for row in reader:
-                    flashcard_set["terms"][row["Term"]] = {"definition": row["Definition"], "correct": int(row["Correct"]), "total": int(row["Total"])}
-                set_name = st.text_input("Set Name")
-                if st.button("Import"):
-                    user_flashcard_sets[set_name] = flashcard_set
+                    st.success(f"'{set_name}' is now graded by {engine.GRADING_MODES[grading].lower()}.")
+                term = st.text_input("Term")
+                definition = st.text_input("Definition")
+                set_history = versions.SetHistory(st.session_state.username, set_name)
+                if st.button("Add Term"):
+                    set_history.snapshot(flashcard_set, "Before editing")
+                    flashcard_set["terms"][term] = {"definition": definition, "correct": 0, "total": 0}
+                    set_history.snapshot(flashcard_set, f"Added '{term}'", [term])
+                    text_index.update_keyword_index(flashcard_set)
                     save_user_data(user_data)
-                    st.success(f"Flashcard set '{set_name}' imported successfully!")
+                    st.success(f"Term '{term}' added successfully!")
+                bulk_edit(flashcard_set, set_history, user_data)
+                show_versions(flashcard_set, set_history, user_data)
+
+        elif menu == "Delete Flashcard Set":
+            st.subheader("Delete Flashcard Set")
+            set_name = pick_flashcard_set(set_view)
+            if set_name and st.button("Delete Set"):
+                del user_flashcard_sets[set_name]
+                save_user_data(user_data)
+                st.success(f"Flashcard set '{set_name}' deleted successfully!")
+
+        elif menu == "Account Management":
+            st.subheader("Account Management")
+            new_password = st.text_input("New Password", type="password")
+            if st.button("Change Password"):
+                user_data[st.session_state.username]["password"] = hash_password(new_password)
+                save_user_data(user_data)
+                st.success("Password updated successfully!")
+
+        elif menu == "Daily Challenge":
+            st.subheader("Daily Challenge")
+            user = user_data[st.session_state.username]
+            challenge = daily_challenge.get_challenge(user)
+            st.write(f"Date: {challenge['date']}")
+            st.write(f"Goal: {challenge['goal']}, Progress: {challenge['progress']}, Completed: {challenge['completed']}")
+            st.write(f"Current streak: {challenge['streak']} day(s)")
+            st.table([{"Date": day.isoformat(), "Correct Answers": count} for day, count in daily_challenge.get_history(user, 14)])
+
+        elif menu == "Leaderboard":
+            st.subheader("Leaderboard")
+            leaderboard_view = views.cached_view("leaderboard", views.store_version(), lambda: views.build_leaderboard_view(user_data))
+            query = st.text_input("Find a user")
+            rows = show_page(leaderboard_view, "leaderboard", views.LEADERBOARD_SORT_KEYS, query=query, descending_default=True)  # Best first
+            st.table([
+                {"Rank": row["rank"], "Username": row["username"], "Level": row["level"], "Skill": row["skill"], "Correct Answers": row["total_correct"], "Attempts": row["total_attempts"], "Accuracy (%)": round(row["accuracy"], 2)}
+                for row in rows
+            ])
+
+        elif menu == "Import/Export Flashcards":
+            st.subheader("Import/Export Flashcards")
+            uploaded_file = st.file_uploader("Upload a Flashcard Set (JSON or CSV)")
+            if uploaded_file:
+                if uploaded_file.name.endswith(".json"):
+                    flashcard_set = strip_local_keys(json.load(uploaded_file))
+                    set_name = st.text_input("Set Name")
+                    merge_report = review_duplicates(flashcard_set, uploaded_file, user_flashcard_sets)
+                    if st.button("Import"):
+                        if merge_report:
+                            load_dedup().merge_duplicates(flashcard_set, merge_report)
+                        text_index.update_keyword_index(flashcard_set)
+                        import_with_versions(user_flashcard_sets, set_name, flashcard_set)
+                        save_user_data(user_data)
+                        st.success(f"Flashcard set '{set_name}' imported successfully!")
+                elif uploaded_file.name.endswith(".csv"):
+                    flashcard_set = {"terms": {}, "stats": {"correct": 0, "total": 0, "percentage": 0.0}}
+                    reader = csv.DictReader(uploaded_file)
+                    for row in reader:
+                        flashcard_set["terms"][row["Term"]] = {"definition": row["Definition"], "correct": int(row["Correct"]), "total": int(row["Total"])}
+                    set_name = st.text_input("Set Name")
+                    merge_report = review_duplicates(flashcard_set, uploaded_file, user_flashcard_sets)
+                    if st.button("Import"):
+                        if merge_report:
+                            load_dedup().merge_duplicates(flashcard_set, merge_report)
+                        import_with_versions(user_flashcard_sets, set_name, flashcard_set)
+                        save_user_data(user_data)
+                        st.success(f"Flashcard set '{set_name}' imported successfully!")
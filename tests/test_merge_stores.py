@@ -0,0 +1,73 @@
+import itertools
+import json
+
+import generate_data
+import merge_stores
+from flashcards import load_user_data, save_user_data
+
+def write_store(path, users, seed):
+    generate_data.write_user_data(str(path), users, seed=seed, mean_sets=3, mean_terms=10)
+    return str(path)
+
+def merge(tmp_path, stores, replicas, name="merged.json.gz"):
+    output = str(tmp_path / name)
+    merge_stores.merge_stores(stores, output, replicas)
+    return output
+
+def answer(user_data, times):
+    """Record `times` more answers (half of them correct) on the first term of every set."""
+    for user in user_data.values():
+        for flashcard_set in user["flashcard_sets"].values():
+            term_data = next(iter(flashcard_set["terms"].values()))
+            term_data["correct"] += times // 2
+            term_data["total"] += times
+
+def test_merging_again_is_idempotent(tmp_path):
+    lab = write_store(tmp_path / "lab.json.gz", 6, seed=0)
+    home = write_store(tmp_path / "home.json.gz", 4, seed=1)
+    merged = merge(tmp_path, [lab, home], ["lab", "home"])
+    expected = load_user_data(merged)
+
+    # Fields other than counters come from the last store, so the merged store goes last
+    assert load_user_data(merge(tmp_path, [lab, merged], ["lab", "merged"], "again.json.gz")) == expected
+    assert load_user_data(merge(tmp_path, [merged, merged], ["merged", "copy"], "twice.json.gz")) == expected
+
+def test_machines_grown_from_a_merged_store_keep_the_max_per_replica(tmp_path):
+    lab = write_store(tmp_path / "lab.json.gz", 5, seed=0)
+    home = write_store(tmp_path / "home.json.gz", 5, seed=1)
+    merged = load_user_data(merge(tmp_path, [lab, home], ["lab", "home"]))
+
+    # Both machines take the merged store and keep studying on their own
+    grown = {}
+    for replica, times in (("lab", 4), ("home", 6)):
+        user_data = json.loads(json.dumps(merged))
+        answer(user_data, times)
+        grown[replica] = str(tmp_path / f"{replica}2.json.gz")
+        save_user_data(user_data, grown[replica])
+    remerged = load_user_data(merge(tmp_path, [grown["lab"], grown["home"]], ["lab", "home"], "remerged.json.gz"))
+
+    for username, user in merged.items():
+        for set_name, flashcard_set in user["flashcard_sets"].items():
+            for position, (term, term_data) in enumerate(flashcard_set["terms"].items()):
+                result = remerged[username]["flashcard_sets"][set_name]["terms"][term]
+                expected = {name: list(counters) for name, counters in term_data[merge_stores.REPLICAS_KEY].items()}
+                if position == 0:
+                    for replica, times in (("lab", 4), ("home", 6)):
+                        counters = expected.setdefault(replica, [0, 0])
+                        counters[0] += times // 2
+                        counters[1] += times
+                assert result[merge_stores.REPLICAS_KEY] == expected
+                assert result["total"] == sum(counters[1] for counters in expected.values())
+                assert result["correct"] == sum(counters[0] for counters in expected.values())
+
+def test_spilled_merge_matches_an_in_memory_merge(tmp_path):
+    replicas = ["lab", "home", "laptop"]
+    stores = [write_store(tmp_path / f"{replica}.json.gz", users, seed) for seed, (replica, users) in enumerate(zip(replicas, (7, 3, 5)))]
+    merged = load_user_data(merge(tmp_path, stores, replicas))
+
+    loaded = [load_user_data(store) for store in stores]
+    usernames = sorted(set(itertools.chain.from_iterable(loaded)))
+    expected = {username: merge_stores.merge_user([(replica, user_data[username]) for replica, user_data in zip(replicas, loaded) if username in user_data])
+                for username in usernames}
+    assert list(merged) == usernames
+    assert merged == json.loads(json.dumps(expected))
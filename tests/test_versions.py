@@ -0,0 +1,134 @@
+import datetime
+import random
+
+import versions
+
+def make_set(count, seed=0):
+    rng = random.Random(seed)
+    return {"terms": {f"term {index}": {"definition": f"definition {rng.random()}", "correct": 0, "total": 0} for index in range(count)}}
+
+def definitions(flashcard_set):
+    return {term: term_data["definition"] for term, term_data in flashcard_set["terms"].items()}
+
+def random_edit(flashcard_set, rng, next_term):
+    """Change, add or remove one term at random and return the term touched."""
+    terms = flashcard_set["terms"]
+    action = rng.random()
+    if action < 0.4 and terms:
+        term = rng.choice(sorted(terms))
+        terms[term]["definition"] = f"edited {rng.random()}"
+    elif action < 0.7 and terms:
+        term = rng.choice(sorted(terms))
+        del terms[term]
+    else:
+        term = f"new term {next_term}"
+        terms[term] = {"definition": f"added {rng.random()}", "correct": 0, "total": 0}
+    return term
+
+def test_assoc_dissoc_match_a_dict_across_bucket_splits():
+    rng = random.Random(1)
+    expected = {f"term {index}": f"definition {index}" for index in range(200)}
+    node = versions._build(dict(expected), 0)
+    assert node.children is not None  # 200 terms do not fit in one leaf
+    for step in range(600):
+        previous = node
+        if rng.random() < 0.45 and expected:
+            term = rng.choice(sorted(expected))
+            old_definition = expected.pop(term)
+            node = versions.dissoc(node, term)
+            assert list(versions.diff(previous, node)) == [(term, old_definition, None)]
+        else:
+            term = f"term {rng.randrange(300)}"
+            definition = f"definition {step}"
+            old_definition = expected.get(term)
+            expected[term] = definition
+            node = versions.assoc(node, term, definition)
+            assert list(versions.diff(previous, node)) == [(term, old_definition, definition)]
+        assert dict(versions.items(node)) == expected
+        assert node.size == len(expected)
+        assert versions.get(node, term) == expected.get(term)
+        # The trie is canonical: the same terms give the same root however they were reached
+        assert node.id == versions._build(dict(expected), 0).id
+
+def test_dissoc_collapses_back_to_a_leaf():
+    entries = {f"term {index}": str(index) for index in range(versions.BUCKET_SIZE * 3)}
+    node = versions._build(dict(entries), 0)
+    for term in sorted(entries)[versions.BUCKET_SIZE:]:
+        node = versions.dissoc(node, term)
+    assert node.children is None
+    assert node.size == versions.BUCKET_SIZE
+
+def test_diff_between_maps_lists_every_change():
+    old = versions._build({f"term {index}": str(index) for index in range(100)}, 0)
+    new = versions.assoc(versions.dissoc(old, "term 3"), "term 5", "changed")
+    new = versions.assoc(new, "term 500", "added")
+    assert versions.summarize(versions.diff(old, new)) == {"added": ["term 500"], "changed": ["term 5"], "removed": ["term 3"]}
+    assert list(versions.diff(new, new)) == []
+
+def test_snapshot_matches_the_live_set_after_edits(tmp_path):
+    rng = random.Random(2)
+    flashcard_set = make_set(150)
+    history = versions.SetHistory("alice", "Biology", tmp_path)
+    assert history.snapshot(flashcard_set, "Created") == 1
+    for step in range(60):
+        term = random_edit(flashcard_set, rng, step)
+        history.snapshot(flashcard_set, f"Edit {step}", [term])
+        assert dict(versions.items(history.root(history.head()))) == definitions(flashcard_set)
+        assert flashcard_set[versions.VERSION_KEY] == history.head()["number"]
+    reloaded = versions.SetHistory("alice", "Biology", tmp_path)
+    assert [version["number"] for version in reloaded.versions] == [version["number"] for version in history.versions]
+    assert dict(versions.items(reloaded.root(reloaded.head()))) == definitions(flashcard_set)
+
+def test_snapshot_without_changes_reuses_the_latest_version(tmp_path):
+    flashcard_set = make_set(40)
+    history = versions.SetHistory("alice", "Biology", tmp_path)
+    history.snapshot(flashcard_set, "Created")
+    del flashcard_set[versions.VERSION_KEY]  # Forces the full comparison
+    assert history.snapshot(flashcard_set, "Again") == 1
+    assert len(history.versions) == 1
+
+def test_rollback_restores_terms_and_keeps_counters(tmp_path):
+    flashcard_set = make_set(50)
+    history = versions.SetHistory("alice", "Biology", tmp_path)
+    history.snapshot(flashcard_set, "Created")
+    original = definitions(flashcard_set)
+    flashcard_set["terms"]["term 1"]["definition"] = "edited"
+    flashcard_set["terms"]["term 1"]["correct"] = flashcard_set["terms"]["term 1"]["total"] = 3
+    del flashcard_set["terms"]["term 2"]
+    flashcard_set["terms"]["extra"] = {"definition": "extra", "correct": 0, "total": 0}
+    history.snapshot(flashcard_set, "Edited", ["term 1", "term 2", "extra"])
+
+    summary = history.rollback(flashcard_set, 1)
+    assert summary == {"added": ["term 2"], "changed": ["term 1"], "removed": ["extra"]}
+    assert definitions(flashcard_set) == original
+    assert flashcard_set["terms"]["term 1"]["total"] == 3
+    assert flashcard_set["terms"]["term 2"]["total"] == 0
+    assert history.head()["number"] == 3
+    assert history.diff(1, 3) == {"added": [], "changed": [], "removed": []}
+    assert history.rollback(flashcard_set, 99) is None
+
+def test_collect_keeps_every_retained_version_readable(tmp_path):
+    rng = random.Random(3)
+    flashcard_set = make_set(120)
+    history = versions.SetHistory("alice", "Biology", tmp_path)
+    expected = {}
+    for step in range(40):
+        if step:
+            term = random_edit(flashcard_set, rng, step)
+            number = history.snapshot(flashcard_set, f"Edit {step}", [term])
+        else:
+            number = history.snapshot(flashcard_set, "Created")
+        expected[number] = definitions(flashcard_set)
+
+    later = datetime.datetime.now() + datetime.timedelta(days=versions.KEEP_DAYS * 2)
+    kept = [version["number"] for version in history.retained(keep=5, now=later)]
+    assert history.collect(keep=5, now=later) == len(expected) - 5
+    assert [version["number"] for version in history.versions] == kept
+    for loaded in (history, versions.SetHistory("alice", "Biology", tmp_path)):
+        assert [version["number"] for version in loaded.versions] == kept
+        for number in kept:
+            assert dict(versions.items(loaded.root(loaded.find(number)))) == expected[number]
+        assert loaded.find(1) is None
+    # Nodes no longer reachable from a kept version are gone from the file
+    reloaded = versions.SetHistory("alice", "Biology", tmp_path)
+    assert len(reloaded.nodes) == len(history.nodes)
@@ -0,0 +1,162 @@
+"""Tokenized definitions, blank-candidate indexes and keyword vectors cached on flashcard sets."""
+import math
+import re
+import zlib
+
+TOKEN_PATTERN = re.compile(r"\w+(?:['-]\w+)*")  # Words with inner apostrophes or hyphens; punctuation is dropped
+MIN_BLANK_TOKENS = 3  # Definitions with fewer words give too little context for a blank
+BLANK_CANDIDATES = 5  # Highest-IDF words kept per definition
+KEYWORD_GRADING = "keywords"  # Set "grading" value that selects keyword-overlap grading
+CACHE_KEYS = ("blank_index", "keyword_index")  # Set keys holding indexes that can be rebuilt from the terms
+
+# Suffixes removed by stem(), longest first; a stem keeps at least three letters
+STEM_SUFFIXES = ("ational", "ization", "fulness", "iveness", "ations", "ation", "ments", "ment", "ness", "ings", "ing", "ies", "ied", "ers", "er", "ed", "ly", "es", "s")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each etc few for from further had has have having he her here hers him
+his how i if in into is it its itself just me more most my no nor not of off on once only or other our out over own same
+she should so some such than that the their them then there these they this those through to too under until up us
+very was we were what when where which while who whom why will with would you your
+""".split())
+
+def tokenize(text):
+    """Return the lowercase words of a text with punctuation stripped."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _token_spans(text):
+    """Return (start, end, word) for every word in a text."""
+    return [(match.start(), match.end(), match.group().lower()) for match in TOKEN_PATTERN.finditer(text)]
+
+def _content_words(spans):
+    return sorted({word for _, _, word in spans if word not in STOPWORDS and not word.isdigit() and len(word) > 1})
+
+def _definition_key(definition):
+    """Return a short checksum of a definition, so an edited definition is noticed without storing a copy."""
+    return zlib.crc32(definition.encode("utf-8"))
+
+def document_frequencies(library):
+    """Count how many definitions in a library of sets contain each content word.
+
+    The definitions are tokenized on the fly; nothing is cached on the sets.
+    """
+    frequencies = {}
+    count = 0
+    for flashcard_set in library:
+        for data in flashcard_set["terms"].values():
+            count += 1
+            for word in _content_words(_token_spans(data["definition"])):
+                frequencies[word] = frequencies.get(word, 0) + 1
+    return frequencies, count
+
+def idf(word, frequencies, document_count):
+    """Smoothed inverse document frequency of a word."""
+    return math.log((document_count + 1) / (frequencies.get(word, 0) + 1)) + 1
+
+def get_blank_index(flashcard_set, library=None):
+    """Return {term: entry} for a set, where entry["blanks"] lists (start, end, word) spans to blank.
+
+    Blanks are content words ranked by IDF across the library (the user's sets), so rare, meaningful
+    words are blanked instead of "a" or "the". The index lives on the set under "blank_index" and
+    holds only the ranked blanks and a checksum of each definition; only new or edited definitions
+    are ranked, and the library is only read, never written to.
+    """
+    index = flashcard_set.setdefault("blank_index", {})
+    stale = []
+    for term, data in flashcard_set["terms"].items():
+        entry = index.get(term)
+        key = _definition_key(data["definition"])
+        if entry is None or entry.get("key") != key:
+            stale.append((term, key))
+    for term in [term for term in index if term not in flashcard_set["terms"]]:
+        del index[term]
+    if stale:
+        frequencies, document_count = document_frequencies(library if library is not None else [flashcard_set])
+        for term, key in stale:
+            spans = _token_spans(flashcard_set["terms"][term]["definition"])
+            blanks = []
+            if len(spans) >= MIN_BLANK_TOKENS:
+                words = set(_content_words(spans))
+                blanks = [span for span in spans if span[2] in words]
+                blanks.sort(key=lambda span: idf(span[2], frequencies, document_count), reverse=True)
+            index[term] = {"key": key, "blanks": blanks[:BLANK_CANDIDATES]}
+    return index
+
+def stem(word):
+    """Strip common English suffixes so "stores", "stored" and "storing" share a stem."""
+    if word.endswith(("ss", "us", "is")):
+        return word  # "class", "status" and "analysis" are not plurals
+    for suffix in STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix in {"ies", "ied"}:
+                word += "y"
+            elif word[-1] == word[-2] and word[-1] not in "aeioulsz":
+                word = word[:-1]  # "programming" -> "program"
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]  # "store" and "stor(ed)" meet at "stor"
+    return word
+
+def keyword_terms(text):
+    """Return the stemmed words of a text without stopwords."""
+    return [stem(word) for word in tokenize(text) if word not in STOPWORDS]
+
+def build_keyword_index(flashcard_set):
+    """Compute TF-IDF keyword vectors for every definition in a set and cache them on it.
+
+    IDF is taken over the set's own definitions. Each vector is normalized, so grading an answer only
+    needs the answer's own words.
+    """
+    documents = {term: keyword_terms(data["definition"]) for term, data in flashcard_set["terms"].items()}
+    frequencies = {}
+    for words in documents.values():
+        for word in set(words):
+            frequencies[word] = frequencies.get(word, 0) + 1
+    document_count = len(documents)
+    idfs = {word: idf(word, frequencies, document_count) for word in frequencies}
+    vectors = {}
+    for term, words in documents.items():
+        weights = {}
+        for word in words:
+            weights[word] = weights.get(word, 0) + idfs[word]
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        vectors[term] = {"definition": flashcard_set["terms"][term]["definition"], "weights": {word: weight / norm for word, weight in weights.items()}}
+    flashcard_set["keyword_index"] = {"idf": idfs, "unseen_idf": idf("", {}, document_count), "vectors": vectors}
+    return flashcard_set["keyword_index"]
+
+def update_keyword_index(flashcard_set):
+    """Rebuild a set's keyword vectors after an edit or import, if the set uses keyword grading."""
+    if flashcard_set.get("grading") == KEYWORD_GRADING:
+        build_keyword_index(flashcard_set)
+    else:
+        flashcard_set.pop("keyword_index", None)
+
+def get_keyword_vector(flashcard_set, term):
+    """Return (weights, index) for grading a term by keywords, or None if the set grades by similarity.
+
+    The index is rebuilt only if the term's definition changed without going through an edit hook.
+    """
+    if flashcard_set.get("grading") != KEYWORD_GRADING:
+        return None
+    index = flashcard_set.get("keyword_index")
+    entry = index["vectors"].get(term) if index else None
+    if entry is None or entry["definition"] != flashcard_set["terms"][term]["definition"]:
+        index = build_keyword_index(flashcard_set)
+        entry = index["vectors"][term]
+    return entry["weights"], index
+
+def keyword_similarity(user_answer, keywords):
+    """Return the cosine similarity (0.0 to 1.0) between an answer and a definition's keyword vector.
+
+    Runs in time linear in the answer's length.
+    """
+    weights, index = keywords
+    idfs = index["idf"]
+    answer = {}
+    for word in keyword_terms(user_answer):
+        answer[word] = answer.get(word, 0) + idfs.get(word, index["unseen_idf"])
+    norm = math.sqrt(sum(weight * weight for weight in answer.values()))
+    if not norm:
+        return 0.0
+    return sum(weight * weights.get(word, 0.0) for word, weight in answer.items()) / norm
@@ -0,0 +1,403 @@
+"""Versioned flashcard sets: each version is a persistent map that shares unchanged terms with the others."""
+import argparse
+import copy
+import datetime
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+VERSIONS_DIR = "set_versions"
+VERSION_KEY = "version"  # Stored on a set: the number of the version its terms match
+BITS = 5  # Hash bits used per trie level
+MASK = (1 << BITS) - 1
+BUCKET_SIZE = 16  # Terms a leaf holds before it is split into children
+MAX_DEPTH = 6  # Leaves at this depth are never split (30 of the 32 hash bits are used by then)
+KEEP_VERSIONS = 20  # Retention: the newest versions are always kept...
+KEEP_DAYS = 30  # ...and so is every version younger than this
+GC_BATCH = 10  # Versions past the retention policy before the history file is compacted
+
+class Node:
+    """An immutable trie node: a leaf of {term: definition}, or children by hash bits.
+
+    A node's id is a hash of its contents, so identical subtrees have the same id in every version
+    and are stored once.
+    """
+    __slots__ = ("entries", "children", "size", "id")
+
+    def __init__(self, entries=None, children=None, node_id=None):
+        self.entries = entries
+        self.children = children
+        self.size = len(entries) if entries is not None else sum(child.size for child in children.values())
+        self.id = node_id or hashlib.sha1(json.dumps(self.record(), sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+    def record(self):
+        """Return the node as JSON-ready data, with children referred to by id."""
+        if self.entries is not None:
+            return {"entries": self.entries}
+        return {"children": {str(index): child.id for index, child in self.children.items()}}
+
+EMPTY = Node(entries={})
+
+def _hash(term):
+    return zlib.crc32(term.encode("utf-8"))
+
+def _build(entries, depth):
+    # Leaves split exactly when they outgrow BUCKET_SIZE, so the same terms always give the same trie
+    if len(entries) <= BUCKET_SIZE or depth >= MAX_DEPTH:
+        return Node(entries=entries)
+    groups = {}
+    for term, definition in entries.items():
+        groups.setdefault((_hash(term) >> (BITS * depth)) & MASK, {})[term] = definition
+    return Node(children={index: _build(group, depth + 1) for index, group in groups.items()})
+
+def from_terms(terms):
+    """Build a map of {term: definition} from a set's terms."""
+    return _build({term: term_data["definition"] for term, term_data in terms.items()}, 0)
+
+def get(node, term):
+    """Return a term's definition in a map, or None."""
+    term_hash = _hash(term)
+    depth = 0
+    while node.children is not None:
+        node = node.children.get((term_hash >> (BITS * depth)) & MASK)
+        if node is None:
+            return None
+        depth += 1
+    return node.entries.get(term)
+
+def assoc(node, term, definition, depth=0):
+    """Return a map with `term` set to `definition`, copying only the path to its leaf."""
+    if node.children is None:
+        if term in node.entries and node.entries[term] == definition:
+            return node
+        return _build({**node.entries, term: definition}, depth)
+    index = (_hash(term) >> (BITS * depth)) & MASK
+    child = node.children.get(index, EMPTY)
+    new_child = assoc(child, term, definition, depth + 1)
+    if new_child is child:
+        return node
+    return Node(children={**node.children, index: new_child})
+
+def dissoc(node, term, depth=0):
+    """Return a map without `term`, copying only the path to its leaf."""
+    if node.children is None:
+        if term not in node.entries:
+            return node
+        return Node(entries={key: value for key, value in node.entries.items() if key != term})
+    index = (_hash(term) >> (BITS * depth)) & MASK
+    child = node.children.get(index)
+    if child is None:
+        return node
+    new_child = dissoc(child, term, depth + 1)
+    if new_child is child:
+        return node
+    children = {key: value for key, value in node.children.items() if key != index}
+    if new_child.size:
+        children[index] = new_child
+    if sum(value.size for value in children.values()) <= BUCKET_SIZE:
+        return Node(entries=dict(item for value in children.values() for item in items(value)))
+    return Node(children=children)
+
+def items(node):
+    """Yield every (term, definition) in a map."""
+    if node.entries is not None:
+        yield from node.entries.items()
+    else:
+        for child in node.children.values():
+            yield from items(child)
+
+def diff(old, new):
+    """Yield (term, old definition, new definition) for each term that differs between two maps.
+
+    Subtrees with the same id are skipped without being visited, so the work follows the number of
+    changes rather than the size of the set. A missing term has the definition None.
+    """
+    if old.id == new.id:
+        return
+    if old.children is None or new.children is None:
+        old_entries = dict(items(old))
+        new_entries = dict(items(new))
+        for term, definition in old_entries.items():
+            if new_entries.get(term) != definition:
+                yield term, definition, new_entries.get(term)
+        for term, definition in new_entries.items():
+            if term not in old_entries:
+                yield term, None, definition
+        return
+    for index in old.children.keys() | new.children.keys():
+        yield from diff(old.children.get(index, EMPTY), new.children.get(index, EMPTY))
+
+def summarize(changes):
+    """Sort diff() output into {"added": [...], "changed": [...], "removed": [...]} lists of terms."""
+    summary = {"added": [], "changed": [], "removed": []}
+    for term, old_definition, new_definition in changes:
+        if old_definition is None:
+            summary["added"].append(term)
+        elif new_definition is None:
+            summary["removed"].append(term)
+        else:
+            summary["changed"].append(term)
+    for terms in summary.values():
+        terms.sort()
+    return summary
+
+def history_file_name(username, set_name, directory=VERSIONS_DIR):
+    """Return the history file of one user's set; names are hashed so any set name is a safe file name."""
+    key = hashlib.sha1(f"{username}\n{set_name}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(directory, f"{key}.jsonl")
+
+class SetHistory:
+    """The saved versions of one user's flashcard set.
+
+    The history is an append-only JSON lines file: a header naming the user and set, then the trie
+    nodes each version added (children before parents) and one line per version. A snapshot appends
+    only the nodes on the paths to the terms that changed.
+    """
+
+    def __init__(self, username, set_name, directory=VERSIONS_DIR):
+        self.username = username
+        self.set_name = set_name
+        self.file_name = history_file_name(username, set_name, directory)
+        self.nodes = {EMPTY.id: EMPTY}
+        self.versions = []
+        if os.path.exists(self.file_name):
+            with open(self.file_name, "r", encoding="utf-8") as file:
+                for line in file:
+                    record = json.loads(line)
+                    if "node" in record:
+                        if "entries" in record:
+                            self.nodes[record["node"]] = Node(entries=record["entries"], node_id=record["node"])
+                        else:
+                            children = {int(index): self.nodes[child_id] for index, child_id in record["children"].items()}
+                            self.nodes[record["node"]] = Node(children=children, node_id=record["node"])
+                    elif "number" in record:
+                        self.versions.append(record)
+
+    def head(self):
+        """Return the latest version record, or None if the set has no versions yet."""
+        return self.versions[-1] if self.versions else None
+
+    def find(self, number):
+        """Return the version record with this number, or None if it does not exist (or was collected)."""
+        for version in self.versions:
+            if version["number"] == number:
+                return version
+        return None
+
+    def root(self, version):
+        """Return the map of a version record."""
+        return self.nodes[version["root"]] if version is not None else EMPTY
+
+    def snapshot(self, flashcard_set, label, changed=None):
+        """Record the set's terms as a new version unless they match the latest one; returns its number.
+
+        When the set's VERSION_KEY says it matches the latest version, only the terms in `changed` are
+        compared, which makes a snapshot O(changes). Otherwise (a new, imported or otherwise edited
+        set) every term is compared once; unchanged terms are still shared rather than copied.
+        """
+        head = self.head()
+        root = self.root(head)
+        terms = flashcard_set["terms"]
+        if head is not None and flashcard_set.get(VERSION_KEY) == head["number"]:
+            new_root = root
+            for term in changed or ():
+                new_root = assoc(new_root, term, terms[term]["definition"]) if term in terms else dissoc(new_root, term)
+        elif head is None:
+            new_root = from_terms(terms)
+        else:
+            new_root = root
+            for term, term_data in terms.items():
+                if get(root, term) != term_data["definition"]:
+                    new_root = assoc(new_root, term, term_data["definition"])
+            for term, _ in items(root):
+                if term not in terms:
+                    new_root = dissoc(new_root, term)
+        if head is not None and new_root.id == root.id:
+            flashcard_set[VERSION_KEY] = head["number"]
+            return head["number"]
+
+        summary = summarize(diff(root, new_root))
+        version = {
+            "number": head["number"] + 1 if head is not None else 1,
+            "root": new_root.id,
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "label": label,
+            "terms": new_root.size,
+            "added": len(summary["added"]),
+            "changed": len(summary["changed"]),
+            "removed": len(summary["removed"]),
+        }
+        new_nodes = []
+        self._collect_new_nodes(new_root, new_nodes)
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.file_name, "a", encoding="utf-8") as file:
+            if not self.versions and file.tell() == 0:
+                file.write(json.dumps({"username": self.username, "set_name": self.set_name}) + "\n")
+            for node in new_nodes:
+                file.write(json.dumps({"node": node.id, **node.record()}) + "\n")
+            file.write(json.dumps(version) + "\n")
+        self.versions.append(version)
+        flashcard_set[VERSION_KEY] = version["number"]
+        if len(self.versions) - len(self.retained()) >= GC_BATCH:
+            self.collect()
+        return version["number"]
+
+    def _collect_new_nodes(self, node, new_nodes):
+        # Post-order, so a node's children are always written (and loaded) before it
+        if node.id in self.nodes:
+            return
+        for child in (node.children or {}).values():
+            self._collect_new_nodes(child, new_nodes)
+        self.nodes[node.id] = node
+        new_nodes.append(node)
+
+    def diff(self, old_number, new_number):
+        """Return what changed from one version to another as a summarize() dict."""
+        return summarize(diff(self.root(self.find(old_number)), self.root(self.find(new_number))))
+
+    def rollback(self, flashcard_set, number):
+        """Bring a set's terms back to an earlier version and record that as a new version.
+
+        Terms that are kept keep their counters; terms that come back start from zero. Returns the
+        summarize() dict of what changed, or None if the version does not exist.
+        """
+        target = self.find(number)
+        if target is None:
+            return None
+        self.snapshot(flashcard_set, "Before rollback")
+        changes = list(diff(self.root(self.head()), self.root(target)))
+        terms = flashcard_set["terms"]
+        for term, _, definition in changes:
+            if definition is None:
+                del terms[term]
+            elif term in terms:
+                terms[term]["definition"] = definition
+            else:
+                terms[term] = {"definition": definition, "correct": 0, "total": 0}
+        self.snapshot(flashcard_set, f"Rolled back to version {number}", [term for term, _, _ in changes])
+        return summarize(changes)
+
+    def retained(self, keep=KEEP_VERSIONS, keep_days=KEEP_DAYS, now=None):
+        """Return the versions the retention policy keeps: the newest `keep` and any younger than `keep_days`."""
+        now = now or datetime.datetime.now()
+        cutoff = (now - datetime.timedelta(days=keep_days)).isoformat(timespec="seconds")
+        newest = len(self.versions) - keep
+        return [version for position, version in enumerate(self.versions) if position >= newest or version["time"] >= cutoff]
+
+    def collect(self, keep=KEEP_VERSIONS, keep_days=KEEP_DAYS, now=None):
+        """Drop versions past the retention policy and rewrite the file with only the nodes still in use.
+
+        Returns the number of versions dropped.
+        """
+        kept = self.retained(keep, keep_days, now)
+        dropped = len(self.versions) - len(kept)
+        live = {EMPTY.id: EMPTY}
+        ordered = []
+        for version in kept:
+            self._mark(self.nodes[version["root"]], live, ordered)
+        file_descriptor, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.file_name)))
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"username": self.username, "set_name": self.set_name}) + "\n")
+            for node in ordered:
+                file.write(json.dumps({"node": node.id, **node.record()}) + "\n")
+            for version in kept:
+                file.write(json.dumps(version) + "\n")
+        os.replace(temp_file_name, self.file_name)
+        self.nodes = live
+        self.versions = kept
+        return dropped
+
+    def _mark(self, node, live, ordered):
+        if node.id in live:
+            return
+        for child in (node.children or {}).values():
+            self._mark(child, live, ordered)
+        live[node.id] = node
+        ordered.append(node)
+
+def collect_all(directory=VERSIONS_DIR, user_data=None):
+    """Apply the retention policy to every history in a directory; returns (versions dropped, files removed).
+
+    With `user_data`, histories of sets (or users) that no longer exist are removed.
+    """
+    dropped = removed = 0
+    if not os.path.isdir(directory):
+        return dropped, removed
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(".jsonl"):
+            continue
+        path = os.path.join(directory, file_name)
+        with open(path, "r", encoding="utf-8") as file:
+            header = json.loads(file.readline())
+        if user_data is not None and header["set_name"] not in user_data.get(header["username"], {}).get("flashcard_sets", {}):
+            os.remove(path)
+            removed += 1
+            continue
+        dropped += SetHistory(header["username"], header["set_name"], directory).collect()
+    return dropped, removed
+
+def run_benchmark(terms, edits=10, directory=None):
+    """Compare snapshotting a large set after a few edits with deep-copying it, and report both."""
+    flashcard_set = {"terms": {f"term {number}": {"definition": f"definition {number}", "correct": 0, "total": 0} for number in range(terms)}}
+    with tempfile.TemporaryDirectory() as temp_directory:
+        set_history = SetHistory("benchmark", "benchmark", directory or temp_directory)
+        start = time.perf_counter()
+        set_history.snapshot(flashcard_set, "Initial")
+        initial_seconds = time.perf_counter() - start
+        initial_bytes = os.path.getsize(set_history.file_name)
+
+        changed = [f"term {number}" for number in range(0, terms, max(1, terms // edits))][:edits]
+        for term in changed:
+            flashcard_set["terms"][term]["definition"] += " (edited)"
+        start = time.perf_counter()
+        set_history.snapshot(flashcard_set, "Edited", changed)
+        snapshot_seconds = time.perf_counter() - start
+        snapshot_bytes = os.path.getsize(set_history.file_name) - initial_bytes
+
+        start = time.perf_counter()
+        copy.deepcopy(flashcard_set)
+        copy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        set_history.rollback(flashcard_set, 1)
+        rollback_seconds = time.perf_counter() - start
+    return {
+        "terms": terms,
+        "edits": edits,
+        "initial_ms": round(initial_seconds * 1000, 1),
+        "initial_bytes": initial_bytes,
+        "snapshot_ms": round(snapshot_seconds * 1000, 2),
+        "snapshot_bytes": snapshot_bytes,
+        "deepcopy_ms": round(copy_seconds * 1000, 1),
+        "rollback_ms": round(rollback_seconds * 1000, 2),
+    }
+
+def main(argv=None):
+    """Apply the retention policy to every set history, or benchmark snapshots."""
+    parser = argparse.ArgumentParser(description="Garbage-collect flashcard set versions.")
+    parser.add_argument("--dir", default=VERSIONS_DIR, help="Directory of set histories")
+    parser.add_argument("--data", help="User data file; histories of deleted sets are removed")
+    parser.add_argument("--benchmark", type=int, metavar="TERMS", help="Time a snapshot of a set of this many terms and exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        result = run_benchmark(args.benchmark)
+        print(f"{result['terms']} terms: first snapshot {result['initial_ms']} ms ({result['initial_bytes']} bytes); "
+              f"snapshot after {result['edits']} edits {result['snapshot_ms']} ms ({result['snapshot_bytes']} bytes); "
+              f"deep copy {result['deepcopy_ms']} ms; rollback {result['rollback_ms']} ms")
+        return 0
+    user_data = None
+    if args.data:
+        from flashcards import load_user_data  # Imported here because flashcards imports this module
+        user_data = load_user_data(args.data)
+    dropped, removed = collect_all(args.dir, user_data)
+    print(f"Dropped {dropped} old versions and removed {removed} histories of deleted sets")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
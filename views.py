@@ -0,0 +1,118 @@
+"""Precomputed sorted views and pagination for large set lists and leaderboards."""
+import os
+
+import fuzzy
+from categories import CategoryIndex
+from flashcards import USER_DATA_FILE, build_leaderboard, leaderboard_key
+
+SET_SORT_KEYS = {
+    "Name": lambda row: row["name"].lower(),
+    "Category": lambda row: (row["category"].lower(), row["name"].lower()),
+    "Accuracy": lambda row: row["percentage"],
+    "Attempts": lambda row: row["total"],
+    "Terms": lambda row: row["terms"],
+}
+
+LEADERBOARD_SORT_KEYS = {
+    "Skill": leaderboard_key,
+    "Correct Answers": lambda row: row["total_correct"],
+    "Accuracy": lambda row: row["accuracy"],
+    "Attempts": lambda row: row["total_attempts"],
+    "Username": lambda row: row["username"].lower(),
+}
+
+_cache = {}  # view name -> (version, view)
+
+def store_version(file_name=USER_DATA_FILE):
+    """Return a token that changes every time the store is saved."""
+    try:
+        return os.stat(file_name).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def cached_view(name, version, builder):
+    """Return a view built by `builder`, rebuilding it only when the version changes."""
+    cached = _cache.get(name)
+    if cached is None or cached[0] != version or version is None:
+        cached = (version, builder())
+        _cache[name] = cached
+    return cached[1]
+
+def _sorted_orders(rows, sort_keys):
+    """Return the row indexes sorted ascending by each sort key."""
+    return {key_name: sorted(range(len(rows)), key=lambda index: key(rows[index])) for key_name, key in sort_keys.items()}
+
+def build_set_view(flashcard_sets):
+    """Precompute set rows, their sort orders, per-category sort orders and category totals."""
+    category_index = CategoryIndex(flashcard_sets)
+    rows = []
+    for set_name, flashcard_set in flashcard_sets.items():
+        rows.append({
+            "name": set_name,
+            "category": category_index.find(flashcard_set.get("category")),  # One spelling per category, whatever the case
+            "terms": len(flashcard_set["terms"]),
+            "correct": flashcard_set["stats"]["correct"],
+            "total": flashcard_set["stats"]["total"],
+            "percentage": flashcard_set["stats"]["percentage"],
+        })
+    orders = _sorted_orders(rows, SET_SORT_KEYS)
+    # Category filters reuse the global orders, so each category list is already sorted
+    categories = {}
+    for key_name, order in orders.items():
+        for index in order:
+            categories.setdefault(rows[index]["category"], {}).setdefault(key_name, []).append(index)
+    sorted_names = [rows[index]["name"] for index in orders["Name"]]
+    # The name index only builds its trigram postings the first time a typo needs suggestions
+    return {"rows": rows, "orders": orders, "categories": categories, "sorted_names": sorted_names, "name_index": fuzzy.NameIndex(sorted_names), "category_index": category_index}
+
+def build_leaderboard_view(user_data):
+    """Precompute leaderboard rows, ranked best first, and their sort orders."""
+    rows = build_leaderboard(user_data)  # Already in leaderboard_key order, best first
+    for position, row in enumerate(rows, 1):
+        row["rank"] = position
+    return {"rows": rows, "orders": _sorted_orders(rows, LEADERBOARD_SORT_KEYS)}
+
+def get_page(view, sort_key, descending=False, page=1, page_size=50, category=None, query=""):
+    """Return (rows, page count, matching rows) for one page of a view.
+
+    Leaderboard rows keep their "rank" whatever the sort order, and when a query filters the list.
+    """
+    if category is not None:
+        order = view["categories"].get(category, {}).get(sort_key, [])
+    else:
+        order = view["orders"][sort_key]
+    rows = view["rows"]
+    if query and rows:
+        query = query.lower()
+        field = "name" if "name" in rows[0] else "username"
+        order = [index for index in order if query in rows[index][field].lower()]
+
+    matching = len(order)
+    page_count = max(1, -(-matching // page_size))
+    page = min(max(1, page), page_count)
+    if descending:
+        # Walk the ascending order backwards instead of sorting again
+        end = matching - (page - 1) * page_size
+        indexes = order[max(0, end - page_size):end][::-1]
+    else:
+        indexes = order[(page - 1) * page_size:page * page_size]
+    return [rows[index] for index in indexes], page_count, matching
+
+def matching_names(view, query="", limit=100):
+    """Return up to `limit` set names (in name order) containing the query.
+
+    When no name contains it, returns the closest names instead, so a typo still finds the set.
+    """
+    names = view["sorted_names"]
+    if not query:
+        return names[:limit]
+    query = query.lower()
+    matches = []
+    for name in names:
+        if query in name.lower():
+            matches.append(name)
+            if len(matches) >= limit:
+                break
+    if not matches:
+        matches = view["name_index"].suggest(query, limit)
+    return matches